@@ -1,22 +1,32 @@
 # backend/app/api/appeals.py
 
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, BackgroundTasks, Query, Request, Response
 import time
 from app.models.schemas import (
     NoticeAnalyzeRequest,
     NoticeAnalyzeResponse,
+    NoticeFileAnalyzeResponse,
     AppealCreate,
     ChatRequest,
-    ChatResponse
+    ChatResponse,
+    EvidenceUploadUrlRequest,
+    EvidenceUploadComplete
 )
-from app.core.auth_middleware import get_current_user
+from app.core.auth_middleware import get_admin_user, get_current_user
 from app.core.firebase import save_appeal, get_user_appeals, delete_appeal, get_user_data, upload_evidence_file
 from app.services.ai_service import ai_service
+from app.services.chat_history import ChatHistoryManager, estimate_tokens
+from app.services.chat_sessions import chat_session_store
 from app.services.knowledge_base import knowledge_base_service
+from app.services.evidence_previews import evidence_preview_service
+from app.services.notice_extraction import notice_extraction_service
 from typing import Optional
 
 router = APIRouter(prefix="/api", tags=["appeals"])
 
+# Browser cache lifetime for the knowledge base filter lists (revalidated by ETag)
+FACET_CACHE_MAX_AGE_SECONDS = 300
+
 
 @router.get("/health")
 async def health_check():
@@ -75,6 +85,69 @@ async def analyze_notice(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/analyze-notice-file", response_model=NoticeFileAnalyzeResponse)
+async def analyze_notice_file(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Analyze an uploaded deactivation notice (PDF or image).
+    Text is extracted server-side (PDF text layer, OCR fallback) and then
+    analyzed with Claude. The file is not stored.
+    Requires authentication.
+    """
+    try:
+        from app.core.firebase import ALLOWED_EVIDENCE_TYPES, MAX_EVIDENCE_SIZE
+        
+        print(f" Analyzing notice file for user: {current_user['email']}")
+        
+        if file.content_type not in ALLOWED_EVIDENCE_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail="File type not allowed. Only images (JPEG, PNG, WebP) and PDFs are accepted."
+            )
+        
+        file_bytes = await file.read()
+        if len(file_bytes) > MAX_EVIDENCE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail="File too large. Maximum size is 10MB"
+            )
+        
+        extraction = await notice_extraction_service.extract_text(file_bytes, file.content_type)
+        
+        if not extraction['text'].strip():
+            raise HTTPException(
+                status_code=422,
+                detail="No text could be extracted from this file. Please paste the notice text manually."
+            )
+        
+        result = await ai_service.analyze_notice(extraction['text'])
+        
+        print(f"AI Analysis complete: Platform={result.get('platform')}, Reason={result.get('reason')}")
+        
+        return NoticeFileAnalyzeResponse(
+            platform=result.get("platform", "Unknown"),
+            reason=result.get("reason", "Unable to determine"),
+            urgency_level=result.get("urgency_level", "MODERATE"),
+            deadline_days=result.get("deadline_days"),
+            risk_level=result.get("risk_level", "Medium"),
+            missing_info=result.get("missing_info", []),
+            recommendations=result.get("recommendations", []),
+            extracted_text=extraction['text'],
+            extraction_method=extraction['method'],
+            page_count=extraction['pageCount']
+        )
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error analyzing notice file: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/generate-appeal")
 async def generate_appeal(
     request: AppealCreate,
@@ -107,14 +180,15 @@ async def generate_appeal(
             }
         
         # Get relevant knowledge base context for RAG
-        knowledge_context = knowledge_base_service.get_relevant_context(
+        knowledge_context = await knowledge_base_service.aget_relevant_context(
             platform=request.platform,
             state=request.user_state or 'California',
             reason=request.deactivation_reason,
-            top_k=3
+            top_k=3,
+            purpose='appeal'
         )
         
-        print(f"Retrieved {len(knowledge_context)} chars of knowledge context")
+        print(f"Retrieved {len(knowledge_context)} chars (~{estimate_tokens(knowledge_context)} tokens) of knowledge context")
         
         # Prepare account details
         account_details = {
@@ -198,6 +272,44 @@ async def get_my_appeals(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/sessions")
+async def create_chat_session_endpoint(
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Start a server-side chat session.
+    Subsequent /api/chat requests only need the session_id and the new message.
+    """
+    try:
+        session_id = await chat_session_store.create(current_user['uid'])
+        return {"session_id": session_id}
+        
+    except Exception as e:
+        print(f"❌ Error creating chat session: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/chat/sessions/{session_id}")
+async def get_chat_session_endpoint(
+    session_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the turn history of a chat session"""
+    try:
+        turns = await chat_session_store.get_turns(session_id, current_user['uid'])
+        return {
+            "session_id": session_id,
+            "turns": turns,
+            "count": len(turns)
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error fetching chat session: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
@@ -205,22 +317,58 @@ async def chat(
 ):
     """
     Chat endpoint for the rights chatbot using Claude AI.
+    With a session_id (or no conversation_history), history is kept server-side
+    and the request only carries the new message. Clients that still send
+    conversation_history are supported without a session.
     Requires authentication.
     """
     try:
         print(f"✓ Chat message from: {current_user['email']}")
         
-        # Use AI service for chat
-        result = await ai_service.chat(
-            message=request.message,
-            conversation_history=request.conversation_history
-        )
+        session_id = request.session_id
+        if not session_id and not request.conversation_history:
+            session_id = await chat_session_store.create(current_user['uid'])
+        
+        if session_id:
+            async with chat_session_store.lock(session_id, current_user['uid']):
+                history = await chat_session_store.get_turns(session_id, current_user['uid'])
+                
+                result = await ai_service.chat(
+                    message=request.message,
+                    conversation_history=list(history),
+                    conversation_id=session_id,
+                    user_id=current_user['uid']
+                )
+                
+                if not result.get("failed"):
+                    await chat_session_store.append(session_id, current_user['uid'], [
+                        {"role": "user", "content": request.message},
+                        {"role": "assistant", "content": result["response"]}
+                    ])
+        else:
+            # Legacy: client resends the full transcript
+            result = await ai_service.chat(
+                message=request.message,
+                conversation_history=request.conversation_history,
+                # Client-chosen ids are scoped to the caller, so they can't
+                # reach another user's cached summary
+                conversation_id=(
+                    f"{current_user['uid']}:{request.conversation_id}" if request.conversation_id
+                    else ChatHistoryManager.conversation_key(
+                        current_user['uid'], request.conversation_history or [], request.message
+                    )
+                ),
+                user_id=current_user['uid']
+            )
         
         return ChatResponse(
             response=result["response"],
-            suggested_actions=result.get("suggested_actions", [])
+            suggested_actions=result.get("suggested_actions", []),
+            session_id=session_id
         )
         
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         print(f"❌ Error in chat: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -257,28 +405,33 @@ async def search_knowledge_base(
     category: Optional[str] = None,
     state: Optional[str] = None,
     platform: Optional[str] = None,
-    top_k: int = 5
+    top_k: int = Query(5, ge=1, le=50),
+    offset: int = Query(0, ge=0)
 ):
     """
     Search the knowledge base for relevant articles.
+    Filters are applied inside retrieval, so each page holds up to top_k
+    matching articles; use offset to page through results.
     Public endpoint - no authentication required.
     """
     try:
-        # Get search results
-        results = knowledge_base_service.search(query, top_k=top_k)
-        
-        # Apply additional filters if provided
-        if category:
-            results = [r for r in results if r['category'] == category]
-        if state:
-            results = [r for r in results if r['state'] == state or r['state'] == 'All']
-        if platform:
-            results = [r for r in results if platform in r['platform'] or r['platform'] == 'All']
+        # Fetch one extra result to know whether another page exists
+        results = await knowledge_base_service.asearch(
+            query,
+            top_k=top_k + 1,
+            filters={'category': category, 'state': state, 'platform': platform},
+            offset=offset
+        )
+        has_more = len(results) > top_k
+        results = results[:top_k]
         
         return {
             "query": query,
             "results": results,
-            "total": len(results)
+            "total": len(results),
+            "offset": offset,
+            "has_more": has_more,
+            "next_offset": offset + top_k if has_more else None
         }
         
     except Exception as e:
@@ -286,41 +439,64 @@ async def search_knowledge_base(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/knowledge-base/stats")
+async def get_knowledge_base_stats(admin: dict = Depends(get_admin_user)):
+    """
+    Retrieval cache hit rates and embedding batch-size / queue-latency metrics.
+    Admin only.
+    """
+    try:
+        return knowledge_base_service.stats()
+    except Exception as e:
+        print(f"❌ Error getting knowledge base stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _facet_response(request: Request, facet: str) -> Response:
+    """
+    Serve a precomputed facet list with its ETag. Browsers revalidate with
+    If-None-Match and get a bodyless 304 until the knowledge base changes.
+    """
+    catalog = knowledge_base_service.get_facet_catalog(facet)
+    headers = {
+        "ETag": catalog['etag'],
+        "Cache-Control": f"public, max-age={FACET_CACHE_MAX_AGE_SECONDS}"
+    }
+    if request.headers.get("if-none-match") == catalog['etag']:
+        return Response(status_code=304, headers=headers)
+    return Response(content=catalog['body'], media_type="application/json", headers=headers)
+
+
 @router.get("/knowledge-base/categories")
-async def get_categories():
-    """Get all available categories in the knowledge base"""
+async def get_categories(request: Request):
+    """Get all available categories in the knowledge base (with document counts)"""
     try:
-        return {
-            "categories": knowledge_base_service.get_all_categories()
-        }
+        return _facet_response(request, 'category')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/knowledge-base/states")
-async def get_states():
-    """Get all available states in the knowledge base"""
+async def get_states(request: Request):
+    """Get all available states in the knowledge base (with document counts)"""
     try:
-        return {
-            "states": knowledge_base_service.get_all_states()
-        }
+        return _facet_response(request, 'state')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/knowledge-base/platforms")
-async def get_platforms():
-    """Get all available platforms in the knowledge base"""
+async def get_platforms(request: Request):
+    """Get all available platforms in the knowledge base (with document counts)"""
     try:
-        return {
-            "platforms": knowledge_base_service.get_all_platforms()
-        }
+        return _facet_response(request, 'platform')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/upload-evidence")
 async def upload_evidence(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     case_id: str = Form(None),  # Make optional
     current_user: dict = Depends(get_current_user)
@@ -354,25 +530,29 @@ async def upload_evidence(
                 raise HTTPException(status_code=403, detail="Not authorized to upload evidence for this case")
         
         # Validate file type - STRICT: Images and PDFs only
-        allowed_types = [
-            'image/jpeg', 'image/png', 'image/jpg', 'image/webp',
-            'application/pdf'
-        ]
+        from app.core.firebase import ALLOWED_EVIDENCE_TYPES, MAX_EVIDENCE_SIZE
         
-        if file.content_type not in allowed_types:
+        if file.content_type not in ALLOWED_EVIDENCE_TYPES:
             raise HTTPException(
                 status_code=400,
                 detail=f"File type not allowed. Only images (JPEG, PNG, WebP) and PDFs are accepted."
             )
         
-        # Validate file size (max 10MB)
-        file_bytes = await file.read()
-        max_size = 10 * 1024 * 1024  # 10MB
-        if len(file_bytes) > max_size:
-            raise HTTPException(
-                status_code=400,
-                detail="File too large. Maximum size is 10MB"
-            )
+        # Read in chunks, hashing as we go, and validate file size (max 10MB)
+        import hashlib
+        hasher = hashlib.sha256()
+        chunks = []
+        total_size = 0
+        while chunk := await file.read(1024 * 1024):
+            total_size += len(chunk)
+            if total_size > MAX_EVIDENCE_SIZE:
+                raise HTTPException(
+                    status_code=400,
+                    detail="File too large. Maximum size is 10MB"
+                )
+            hasher.update(chunk)
+            chunks.append(chunk)
+        file_bytes = b''.join(chunks)
         
         # Upload to Firebase Storage (private)
         from app.core.firebase import upload_evidence_file, save_evidence_metadata
@@ -385,7 +565,10 @@ async def upload_evidence(
             filename=file.filename,
             user_id=current_user['uid'],
             case_id=temp_case_id,
-            content_type=file.content_type
+            content_type=file.content_type,
+            content_hash=hasher.hexdigest(),
+            # Temp uploads get no evidence record to release a shared reference
+            take_ref=bool(case_id)
         )
         
         # Only save metadata to Firestore if case_id is provided
@@ -397,6 +580,19 @@ async def upload_evidence(
                 metadata=file_metadata
             )
         
+        # Generate thumbnail/preview after the response is sent
+        # (deduplicated files reuse the previews of the stored copy)
+        if not file_metadata.get('deduplicated'):
+            background_tasks.add_task(
+                evidence_preview_service.process_upload,
+                storage_path=file_metadata['storagePath'],
+                user_id=current_user['uid'],
+                content_type=file.content_type,
+                file_bytes=file_bytes,
+                evidence_id=evidence_id,
+                content_hash=file_metadata.get('contentHash')
+            )
+        
         print(f"✓ Evidence uploaded for user: {current_user['email']}, case: {temp_case_id}")
         
         return {
@@ -406,6 +602,7 @@ async def upload_evidence(
             "contentType": file.content_type,
             "size": len(file_bytes),
             "url": file_metadata.get('storagePath'),  # Return storage path
+            "deduplicated": file_metadata.get('deduplicated', False),
             "message": "Evidence uploaded successfully. File is stored privately and requires authentication to access."
         }
         
@@ -416,6 +613,157 @@ async def upload_evidence(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/evidence/upload-url")
+async def create_evidence_upload_url_endpoint(
+    request: EvidenceUploadUrlRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Issue a short-lived signed URL for uploading evidence directly to Storage.
+    The client PUTs the file to uploadUrl with the returned headers, then calls
+    /api/evidence/complete-upload so the object is validated and recorded.
+    Same constraints as /api/upload-evidence (images and PDFs, max 10MB).
+    """
+    try:
+        from app.core.firebase import db, create_evidence_upload_url, MAX_EVIDENCE_SIZE
+        
+        # If case_id is provided, verify it exists and belongs to user
+        if request.case_id:
+            case_doc = db.collection('appeals').document(request.case_id).get()
+            
+            if not case_doc.exists:
+                raise HTTPException(status_code=404, detail="Case not found")
+            
+            if case_doc.to_dict().get('userId') != current_user['uid']:
+                raise HTTPException(status_code=403, detail="Not authorized to upload evidence for this case")
+        
+        # Reject oversized files early; the signed URL enforces the limit as well
+        if request.size is not None and request.size > MAX_EVIDENCE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail="File too large. Maximum size is 10MB"
+            )
+        
+        # Use temporary case_id if not provided
+        temp_case_id = request.case_id or f"temp_{current_user['uid']}_{int(time.time())}"
+        
+        upload = await create_evidence_upload_url(
+            filename=request.filename,
+            user_id=current_user['uid'],
+            case_id=temp_case_id,
+            content_type=request.content_type
+        )
+        
+        return {
+            **upload,
+            "caseId": request.case_id
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error creating upload URL: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/evidence/complete-upload")
+async def complete_evidence_upload(
+    request: EvidenceUploadComplete,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Completion callback for direct-to-storage uploads.
+    Validates and deduplicates the uploaded object and, if case_id is
+    provided, saves its metadata.
+    Idempotent: the evidence record is keyed by storage path, so a retry
+    returns the same evidenceId (even if the object was deduplicated away).
+    """
+    try:
+        from app.core.firebase import db, direct_upload_evidence_id, finalize_evidence_upload, save_evidence_metadata
+        
+        evidence_id = None
+        if request.case_id:
+            case_doc = db.collection('appeals').document(request.case_id).get()
+            
+            if not case_doc.exists:
+                raise HTTPException(status_code=404, detail="Case not found")
+            
+            if case_doc.to_dict().get('userId') != current_user['uid']:
+                raise HTTPException(status_code=403, detail="Not authorized to upload evidence for this case")
+            
+            # The object must live under this case's folder
+            if not request.storage_path.startswith(f"evidence/{current_user['uid']}/{request.case_id}/"):
+                raise HTTPException(status_code=400, detail="Storage path does not belong to this case")
+            
+            # Retried completion: the record already exists
+            existing_doc = db.collection('evidence').document(direct_upload_evidence_id(request.storage_path)).get()
+            if existing_doc.exists and existing_doc.to_dict().get('userId') == current_user['uid']:
+                existing = existing_doc.to_dict()
+                return {
+                    "success": True,
+                    "evidenceId": existing_doc.id,
+                    "filename": existing.get('filename'),
+                    "contentType": existing.get('contentType'),
+                    "size": existing.get('size'),
+                    "url": existing.get('storagePath'),
+                    "deduplicated": existing.get('deduplicated', False),
+                    "message": "Evidence uploaded successfully. File is stored privately and requires authentication to access."
+                }
+        
+        file_metadata = await finalize_evidence_upload(
+            storage_path=request.storage_path,
+            filename=request.filename,
+            user_id=current_user['uid'],
+            # Temp uploads get no evidence record to release a shared reference
+            take_ref=bool(request.case_id)
+        )
+        
+        # Only save metadata to Firestore if case_id is provided
+        if request.case_id:
+            evidence_id = await save_evidence_metadata(
+                user_id=current_user['uid'],
+                case_id=request.case_id,
+                metadata=file_metadata,
+                evidence_id=direct_upload_evidence_id(request.storage_path)
+            )
+        
+        # Generate thumbnail/preview after the response is sent
+        # (deduplicated files reuse the previews of the stored copy)
+        if not file_metadata.get('deduplicated'):
+            background_tasks.add_task(
+                evidence_preview_service.process_upload,
+                storage_path=file_metadata['storagePath'],
+                user_id=current_user['uid'],
+                content_type=file_metadata['contentType'],
+                evidence_id=evidence_id,
+                content_hash=file_metadata.get('contentHash')
+            )
+        
+        print(f"✓ Direct evidence upload completed for user: {current_user['email']}")
+        
+        return {
+            "success": True,
+            "evidenceId": evidence_id,
+            "filename": request.filename,
+            "contentType": file_metadata.get('contentType'),
+            "size": file_metadata.get('size'),
+            "url": file_metadata.get('storagePath'),
+            "deduplicated": file_metadata.get('deduplicated', False),
+            "message": "Evidence uploaded successfully. File is stored privately and requires authentication to access."
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error completing evidence upload: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/cases/{case_id}/evidence")
 async def get_case_evidence_list(
     case_id: str,
@@ -455,6 +803,46 @@ async def get_case_evidence_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cases/{case_id}/evidence/download-urls")
+async def get_case_evidence_download_urls_endpoint(
+    case_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get all evidence for a case together with signed download URLs.
+    Lets the evidence gallery render with a single request.
+    URLs are valid for at least 15 minutes.
+    """
+    try:
+        from app.core.firebase import get_case_evidence_download_urls, db
+        
+        # Verify case belongs to user
+        case_ref = db.collection('appeals').document(case_id)
+        case_doc = case_ref.get()
+        
+        if not case_doc.exists:
+            raise HTTPException(status_code=404, detail="Case not found")
+        
+        case_data = case_doc.to_dict()
+        if case_data.get('userId') != current_user['uid']:
+            raise HTTPException(status_code=403, detail="Not authorized to view this case")
+        
+        evidence_list = await get_case_evidence_download_urls(case_id, current_user['uid'])
+        
+        return {
+            "caseId": case_id,
+            "evidence": evidence_list,
+            "count": len(evidence_list),
+            "expiresIn": "15 minutes"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error generating download URLs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/evidence/{evidence_id}/download")
 async def download_evidence(
     evidence_id: str,
@@ -462,7 +850,7 @@ async def download_evidence(
 ):
     """
     Get time-limited download URL for evidence file.
-    URL expires after 1 hour.
+    URL expires after 1 hour (cached URLs have at least 15 minutes left).
     """
     try:
         from app.core.firebase import db, get_evidence_download_url
@@ -488,7 +876,7 @@ async def download_evidence(
             "evidenceId": evidence_id,
             "downloadUrl": download_url,
             "filename": evidence_data.get('filename'),
-            "expiresIn": "1 hour"
+            "expiresIn": "15-60 minutes"
         }
         
     except HTTPException:
@@ -525,7 +913,15 @@ async def delete_evidence_endpoint(
         
         # Delete file from Storage
         storage_path = evidence_data.get('storagePath')
-        await delete_evidence_file(storage_path, current_user['uid'])
+        content_hash = evidence_data.get('contentHash')
+        file_released = await delete_evidence_file(storage_path, current_user['uid'], content_hash=content_hash)
+        
+        # Delete generated thumbnail/preview, unless the file is still shared
+        # (also when the file itself was already gone)
+        if file_released:
+            for preview_key in ('thumbnailPath', 'previewPath'):
+                if evidence_data.get(preview_key):
+                    await delete_evidence_file(evidence_data[preview_key], current_user['uid'])
         
         # Delete metadata from Firestore
         await delete_evidence_metadata(evidence_id, current_user['uid'])
@@ -0,0 +1,104 @@
+# backend/app/api/diagnostics.py
+
+import asyncio
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+
+from app.core.auth_middleware import get_admin_user
+from app.core.loop_watchdog import loop_watchdog
+from app.core.profiler import ProfilerBusyError, profiler
+from app.core.telemetry import metrics
+
+router = APIRouter(tags=["diagnostics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+async def require_metrics_token(authorization: Optional[str] = Header(None)):
+    """Callers must send METRICS_TOKEN as a bearer token; without one the endpoint is off"""
+    token = os.getenv("METRICS_TOKEN", "")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(authorization or "", f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def prometheus_metrics():
+    """
+    Prometheus scrape endpoint: per-route latency histograms, span
+    durations (Firestore, Storage, embedding, Pinecone, Claude), Claude
+    token counters, knowledge base cache counters and event-loop lag.
+    """
+    return Response(content=metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/diagnostics/event-loop", include_in_schema=False)
+async def event_loop_report(top: int = 10, reset: bool = False, admin: dict = Depends(get_admin_user)):
+    """
+    Blocking-call report from the event-loop watchdog (LOOP_WATCHDOG_ENABLED):
+    routes ordered by estimated time they held the loop, each with the app
+    call sites and library frames seen on the stack while it was stalled.
+    Pass reset=true to start a fresh measurement window.
+    """
+    report = loop_watchdog.report(top=max(1, min(top, 50)))
+    if reset:
+        loop_watchdog.reset()
+    return report
+
+
+def _profile_response(profile, format: str):
+    if format == "json":
+        return profile.summary()
+    return PlainTextResponse(profile.collapsed())
+
+
+@router.post("/diagnostics/profile", include_in_schema=False)
+async def profile_worker(
+    seconds: float = 10,
+    mode: str = "wall",
+    interval_ms: Optional[float] = None,
+    format: str = "collapsed",
+    admin: dict = Depends(get_admin_user)
+):
+    """
+    Sample this worker for `seconds` (capped at PROFILER_MAX_SECONDS) and
+    return collapsed stacks for flamegraph.pl / speedscope, or with
+    format=json the top functions by self and total time.
+    mode=wall counts waiting threads too; mode=cpu weights by CPU time.
+    """
+    if seconds <= 0:
+        raise HTTPException(status_code=400, detail="seconds must be positive")
+    try:
+        profile = profiler.start(mode, seconds=seconds, interval_ms=interval_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    try:
+        await asyncio.sleep(profile.max_seconds)
+    finally:
+        await asyncio.to_thread(profiler.stop, profile)
+    
+    print(f"✓ Profiled worker for {profile.duration:.1f}s ({mode}) for {admin.get('email') or admin['uid']}")
+    return _profile_response(profile, format)
+
+
+@router.get("/diagnostics/profiles", include_in_schema=False)
+async def list_request_profiles(admin: dict = Depends(get_admin_user)):
+    """Recent per-request profiles (requests sent with an X-Profile header)"""
+    return {"profiles": profiler.recent()}
+
+
+@router.get("/diagnostics/profiles/{request_id}", include_in_schema=False)
+async def get_request_profile(request_id: str, format: str = "collapsed", admin: dict = Depends(get_admin_user)):
+    """Profile of one request, looked up by its X-Request-ID"""
+    profile = profiler.get(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return _profile_response(profile, format)
@@ -1,12 +1,20 @@
 # backend/app/core/auth_middleware.py
 # CREATE THIS NEW FILE
 
+import os
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.firebase import verify_token
 
 security = HTTPBearer()
 
+def is_admin(decoded_token: dict) -> bool:
+    """Admins have the custom claim admin=true or a uid listed in ADMIN_UIDS (comma-separated)"""
+    admin_uids = {uid.strip() for uid in os.getenv("ADMIN_UIDS", "").split(",") if uid.strip()}
+    return decoded_token.get('admin') is True or decoded_token.get('uid') in admin_uids
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
@@ -28,11 +36,31 @@ async def get_current_user(
         return {
             'uid': decoded_token['uid'],
             'email': decoded_token.get('email'),
-            'name': decoded_token.get('name')
+            'name': decoded_token.get('name'),
+            'admin': is_admin(decoded_token)
         }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid authentication credentials: {str(e)}",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+
+async def get_admin_user(user: dict = Depends(get_current_user)) -> dict:
+    """Dependency for operator-only routes (profiling, diagnostics)"""
+    if not user.get('admin'):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user
+
+async def is_admin_request(authorization: Optional[str]) -> bool:
+    """Admin check for middleware, where dependencies don't run"""
+    if not authorization or not authorization.startswith("Bearer "):
+        return False
+    try:
+        decoded_token = await verify_token(authorization[len("Bearer "):])
+    except ValueError:
+        return False
+    return is_admin(decoded_token)
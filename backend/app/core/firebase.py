@@ -5,6 +5,8 @@ import os
 import firebase_admin
 from firebase_admin import credentials, auth, firestore, storage
 from dotenv import load_dotenv
+# Relative so the scripts that import this module as core.firebase still work
+from .telemetry import traced
 
 load_dotenv()
 
@@ -43,7 +45,24 @@ db = firestore.client()
 # Storage bucket
 bucket = storage.bucket()
 
+# Evidence upload constraints (mirrored in storage.rules)
+ALLOWED_EVIDENCE_TYPES = [
+    'image/jpeg', 'image/png', 'image/jpg', 'image/webp',
+    'application/pdf'
+]
+MAX_EVIDENCE_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_URL_EXPIRATION_MINUTES = 15
+CONTENT_CLAIM_ATTEMPTS = 3
+
+# Signed download URLs are valid for 1 hour; cached copies are reused for at
+# most 45 minutes so every URL handed out has at least 15 minutes left.
+DOWNLOAD_URL_EXPIRATION_MINUTES = 60
+DOWNLOAD_URL_CACHE_TTL_MINUTES = 45
+DOWNLOAD_URL_CACHE_MAX_ENTRIES = 5000
+_download_url_cache = {}  # storage_path -> (url, cached_until)
+
 # Helper Functions
+@traced('auth.verify_token')
 async def verify_token(id_token: str) -> dict:
     """
     Verify Firebase ID token from frontend
@@ -55,6 +74,7 @@ async def verify_token(id_token: str) -> dict:
     except Exception as e:
         raise ValueError(f"Invalid token: {str(e)}")
 
+@traced('firestore.get_user_data')
 async def get_user_data(uid: str) -> dict:
     """Get user data from Firestore"""
     user_ref = db.collection('users').document(uid)
@@ -64,6 +84,7 @@ async def get_user_data(uid: str) -> dict:
         return user_doc.to_dict()
     return None
 
+@traced('firestore.save_appeal')
 async def save_appeal(user_id: str, appeal_data: dict) -> str:
     """Save appeal to Firestore"""
     from datetime import datetime
@@ -80,6 +101,7 @@ async def save_appeal(user_id: str, appeal_data: dict) -> str:
     print(f"✓ Appeal saved: {appeal_ref.id}")
     return appeal_ref.id
 
+@traced('firestore.get_user_appeals')
 async def get_user_appeals(user_id: str) -> list:
     """Get all appeals for a user"""
     appeals_ref = db.collection('appeals').where('userId', '==', user_id)
@@ -93,6 +115,7 @@ async def get_user_appeals(user_id: str) -> list:
         for appeal in appeals
     ]
 
+@traced('firestore.delete_appeal')
 async def delete_appeal(appeal_id: str, user_id: str) -> bool:
     """Delete an appeal from Firestore"""
     appeal_ref = db.collection('appeals').document(appeal_id)
@@ -110,21 +133,155 @@ async def delete_appeal(appeal_id: str, user_id: str) -> bool:
     print(f"✓ Appeal deleted: {appeal_id}")
     return True
 
-async def upload_evidence_file(file_bytes: bytes, filename: str, user_id: str, case_id: str, content_type: str) -> dict:
+def _evidence_storage_path(filename: str, user_id: str, case_id: str) -> str:
+    """Build a unique storage path: evidence/{userId}/{caseId}/{timestamp}_{uuid}.{ext}"""
+    from datetime import datetime
+    import uuid
+    
+    file_extension = filename.split('.')[-1] if '.' in filename else 'jpg'
+    unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.{file_extension}"
+    return f"evidence/{user_id}/{case_id}/{unique_filename}"
+
+def _content_index_ref(user_id: str, content_hash: str):
+    """Per-user content index entry: evidence_content/{userId}_{sha256}"""
+    return db.collection('evidence_content').document(f"{user_id}_{content_hash}")
+
+def _acquire_content_ref(user_id: str, content_hash: str):
+    """
+    Take a reference on already-stored content.
+    Returns the index entry if the bytes are already stored, else None.
+    """
+    index_ref = _content_index_ref(user_id, content_hash)
+    
+    @firestore.transactional
+    def acquire(transaction):
+        snapshot = index_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return None
+        transaction.update(index_ref, {'refCount': firestore.Increment(1)})
+        return snapshot.to_dict()
+    
+    return acquire(db.transaction())
+
+def _claim_content(user_id: str, content_hash: str, entry: dict, take_ref: bool = True):
+    """
+    Index freshly uploaded bytes, unless the same bytes were indexed meanwhile.
+    Returns None if this upload's entry was created (or already indexes this
+    very object, e.g. a retried completion), else the existing entry (with a
+    reference taken on it when take_ref is set).
+    """
+    from google.api_core.exceptions import AlreadyExists
+    
+    index_ref = _content_index_ref(user_id, content_hash)
+    
+    @firestore.transactional
+    def claim(transaction):
+        snapshot = index_ref.get(transaction=transaction)
+        if snapshot.exists and snapshot.to_dict().get('storagePath') == entry['storagePath']:
+            return None
+        if snapshot.exists:
+            if take_ref:
+                transaction.update(index_ref, {'refCount': firestore.Increment(1)})
+            return snapshot.to_dict()
+        transaction.create(index_ref, entry)
+        return None
+    
+    # A concurrent create can still win between read and commit - retry,
+    # the next attempt then sees (and references) its entry
+    for attempt in range(CONTENT_CLAIM_ATTEMPTS):
+        try:
+            return claim(db.transaction())
+        except AlreadyExists:
+            if attempt == CONTENT_CLAIM_ATTEMPTS - 1:
+                raise
+
+def _release_content_ref(user_id: str, content_hash: str) -> bool:
+    """
+    Drop a reference on stored content.
+    Returns True when this was the last reference (the caller deletes the bytes).
+    """
+    index_ref = _content_index_ref(user_id, content_hash)
+    
+    @firestore.transactional
+    def release(transaction):
+        snapshot = index_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return True
+        if snapshot.to_dict().get('refCount', 1) <= 1:
+            transaction.delete(index_ref)
+            return True
+        transaction.update(index_ref, {'refCount': firestore.Increment(-1)})
+        return False
+    
+    return release(db.transaction())
+
+def _content_path_in_use(user_id: str, storage_path: str) -> bool:
+    """
+    True if a referenced content index entry points at this object or uses
+    it as a preview. A deduplicated record's path can be in another case's
+    folder, so deleting by path alone could remove bytes others still share.
+    """
+    for field in ('storagePath', 'thumbnailPath', 'previewPath'):
+        entries = db.collection('evidence_content') \
+            .where('userId', '==', user_id) \
+            .where(field, '==', storage_path) \
+            .stream()
+        if any(entry.to_dict().get('refCount', 1) > 0 for entry in entries):
+            return True
+    return False
+
+@traced('firestore.update_content_index')
+async def update_content_index(user_id: str, content_hash: str, updates: dict) -> None:
+    """Record extra fields (e.g. preview paths) on a content index entry"""
+    try:
+        _content_index_ref(user_id, content_hash).update(updates)
+    except Exception as e:
+        print(f"⚠ Could not update content index {content_hash[:12]}: {e}")
+
+@traced('storage.upload_evidence_file')
+async def upload_evidence_file(
+    file_bytes: bytes,
+    filename: str,
+    user_id: str,
+    case_id: str,
+    content_type: str,
+    content_hash: str = None,
+    take_ref: bool = True
+) -> dict:
     """
     Upload evidence file to Firebase Storage with proper security.
     Path structure: evidence/{userId}/{caseId}/{fileName}
+    If content_hash (SHA-256) is given and the user already stored the same
+    bytes, the existing object is referenced instead of uploading again.
+    take_ref=False is for uploads no evidence record will be saved for
+    (temp uploads): they never take a reference on existing content, so
+    they always store their own copy, and index it only if the bytes are new.
     Returns: dict with file metadata (no public URL)
     """
     from datetime import datetime
-    import uuid
     
-    # Generate unique filename
-    file_extension = filename.split('.')[-1] if '.' in filename else 'jpg'
-    unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.{file_extension}"
+    metadata = {
+        'filename': filename,
+        'originalFilename': filename,
+        'size': len(file_bytes),
+        'contentType': content_type,
+        'uploadedAt': datetime.utcnow().isoformat()
+    }
+    
+    if content_hash:
+        metadata['contentHash'] = content_hash
+        existing = _acquire_content_ref(user_id, content_hash) if take_ref else None
+        if existing:
+            print(f"✓ Duplicate evidence, reusing: {existing['storagePath']}")
+            return {
+                **metadata,
+                'storagePath': existing['storagePath'],
+                'deduplicated': True,
+                **{key: existing[key] for key in ('thumbnailPath', 'previewPath') if existing.get(key)}
+            }
     
     # Path following security rules: evidence/{userId}/{caseId}/{fileName}
-    storage_path = f"evidence/{user_id}/{case_id}/{unique_filename}"
+    storage_path = _evidence_storage_path(filename, user_id, case_id)
     
     # Upload to Firebase Storage (private by default)
     blob = bucket.blob(storage_path)
@@ -134,64 +291,279 @@ async def upload_evidence_file(file_bytes: bytes, filename: str, user_id: str, c
     
     print(f"✓ File uploaded privately: {storage_path}")
     
+    if content_hash:
+        existing = _claim_content(user_id, content_hash, {
+            'userId': user_id,
+            'contentHash': content_hash,
+            'storagePath': storage_path,
+            'contentType': content_type,
+            'size': len(file_bytes),
+            'refCount': 1,
+            'createdAt': datetime.utcnow().isoformat()
+        }, take_ref=take_ref)
+        if existing and take_ref:
+            # A concurrent upload of the same bytes won the race - use its copy
+            blob.delete()
+            return {**metadata, 'storagePath': existing['storagePath'], 'deduplicated': True}
+        if existing:
+            # Not indexed under this hash - previews must not update the existing entry
+            del metadata['contentHash']
+    
     # Return metadata (not public URL)
     return {
+        **metadata,
+        'storagePath': storage_path
+    }
+
+@traced('storage.download_evidence_file')
+async def download_evidence_file(storage_path: str, user_id: str) -> bytes:
+    """Download evidence file bytes (server-side processing only)"""
+    # Verify user owns this file
+    if not storage_path.startswith(f"evidence/{user_id}/"):
+        raise ValueError("Unauthorized access to evidence file")
+    
+    return bucket.blob(storage_path).download_as_bytes()
+
+@traced('storage.upload_evidence_preview')
+async def upload_evidence_preview(jpeg_bytes: bytes, storage_path: str, user_id: str, kind: str) -> str:
+    """
+    Store a generated thumbnail/preview next to its original.
+    e.g. evidence/{userId}/{caseId}/20250101_120000_ab12cd34.thumbnail.jpg
+    """
+    # Verify user owns this file
+    if not storage_path.startswith(f"evidence/{user_id}/"):
+        raise ValueError("Unauthorized access to evidence file")
+    
+    base_path = storage_path.rsplit('.', 1)[0]
+    preview_path = f"{base_path}.{kind}.jpg"
+    
+    blob = bucket.blob(preview_path)
+    blob.cache_control = "private, max-age=86400"
+    blob.upload_from_string(jpeg_bytes, content_type='image/jpeg')
+    
+    print(f"✓ Evidence {kind} stored: {preview_path} ({len(jpeg_bytes)} bytes)")
+    return preview_path
+
+@traced('storage.create_evidence_upload_url')
+async def create_evidence_upload_url(filename: str, user_id: str, case_id: str, content_type: str) -> dict:
+    """
+    Generate a short-lived V4 signed URL so the browser can PUT the file
+    straight to Storage without the bytes passing through the API.
+    The signed headers pin the content type and cap the size at 10MB.
+    """
+    from datetime import timedelta
+    
+    if content_type not in ALLOWED_EVIDENCE_TYPES:
+        raise ValueError("File type not allowed. Only images (JPEG, PNG, WebP) and PDFs are accepted.")
+    
+    storage_path = _evidence_storage_path(filename, user_id, case_id)
+    blob = bucket.blob(storage_path)
+    
+    # The client must send exactly these headers with the PUT request
+    required_headers = {
+        'Content-Type': content_type,
+        'x-goog-content-length-range': f"0,{MAX_EVIDENCE_SIZE}"
+    }
+    
+    upload_url = blob.generate_signed_url(
+        version="v4",
+        expiration=timedelta(minutes=UPLOAD_URL_EXPIRATION_MINUTES),
+        method="PUT",
+        content_type=content_type,
+        headers={'x-goog-content-length-range': required_headers['x-goog-content-length-range']}
+    )
+    
+    print(f"✓ Signed upload URL issued: {storage_path}")
+    
+    return {
+        'uploadUrl': upload_url,
         'storagePath': storage_path,
+        'method': 'PUT',
+        'headers': required_headers,
+        'expiresIn': UPLOAD_URL_EXPIRATION_MINUTES * 60
+    }
+
+@traced('storage.finalize_evidence_upload')
+async def finalize_evidence_upload(storage_path: str, filename: str, user_id: str, take_ref: bool = True) -> dict:
+    """
+    Validate an object uploaded through a signed upload URL.
+    Objects that are missing, too large or of the wrong type are deleted.
+    The object is hashed (SHA-256, streamed) and deduplicated like
+    upload_evidence_file: if the user already stored the same bytes, the new
+    object is deleted and the stored one referenced (take_ref as there).
+    Returns: dict with file metadata (same shape as upload_evidence_file)
+    """
+    from datetime import datetime
+    import hashlib
+    
+    # Verify user owns this path (path must start with evidence/{userId}/)
+    if not storage_path.startswith(f"evidence/{user_id}/"):
+        raise ValueError("Unauthorized access to evidence file")
+    
+    blob = bucket.get_blob(storage_path)
+    if blob is None:
+        raise ValueError("Uploaded file not found")
+    
+    if blob.content_type not in ALLOWED_EVIDENCE_TYPES or (blob.size or 0) > MAX_EVIDENCE_SIZE:
+        blob.delete()
+        print(f"❌ Rejected direct upload: {storage_path} ({blob.content_type}, {blob.size} bytes)")
+        raise ValueError("Uploaded file failed validation. Only images and PDFs up to 10MB are accepted.")
+    
+    print(f"✓ Direct upload verified: {storage_path}")
+    
+    hasher = hashlib.sha256()
+    with blob.open('rb', chunk_size=1024 * 1024) as reader:
+        while chunk := reader.read(1024 * 1024):
+            hasher.update(chunk)
+    content_hash = hasher.hexdigest()
+    
+    metadata = {
         'filename': filename,
         'originalFilename': filename,
-        'size': len(file_bytes),
-        'contentType': content_type,
+        'size': blob.size,
+        'contentType': blob.content_type,
+        'contentHash': content_hash,
         'uploadedAt': datetime.utcnow().isoformat()
     }
+    
+    existing = _claim_content(user_id, content_hash, {
+        'userId': user_id,
+        'contentHash': content_hash,
+        'storagePath': storage_path,
+        'contentType': blob.content_type,
+        'size': blob.size,
+        'refCount': 1,
+        'createdAt': datetime.utcnow().isoformat()
+    }, take_ref=take_ref)
+    if existing and take_ref:
+        print(f"✓ Duplicate evidence, reusing: {existing['storagePath']}")
+        blob.delete()
+        return {
+            **metadata,
+            'storagePath': existing['storagePath'],
+            'deduplicated': True,
+            **{key: existing[key] for key in ('thumbnailPath', 'previewPath') if existing.get(key)}
+        }
+    if existing:
+        # Not indexed under this hash - previews must not update the existing entry
+        del metadata['contentHash']
+    
+    return {**metadata, 'storagePath': storage_path}
+
+def _prune_download_url_cache(now) -> None:
+    """Drop expired entries, then the oldest ones if the cache is still full"""
+    for path in [p for p, (_, until) in _download_url_cache.items() if until <= now]:
+        del _download_url_cache[path]
+    
+    overflow = len(_download_url_cache) - DOWNLOAD_URL_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        for path in sorted(_download_url_cache, key=lambda p: _download_url_cache[p][1])[:overflow]:
+            del _download_url_cache[path]
 
+def invalidate_evidence_download_url(storage_path: str) -> None:
+    """Forget any cached signed URL for this storage path"""
+    _download_url_cache.pop(storage_path, None)
+
+@traced('storage.get_evidence_download_url')
 async def get_evidence_download_url(storage_path: str, user_id: str) -> str:
     """
     Generate time-limited signed URL for evidence download.
     URL expires after 1 hour for security.
+    Signed URLs are cached per storage path and reused while they still
+    have at least 15 minutes of validity left.
     """
-    from datetime import timedelta
+    from datetime import datetime, timedelta
     
     # Verify user owns this file (path must start with evidence/{userId}/)
     if not storage_path.startswith(f"evidence/{user_id}/"):
         raise ValueError("Unauthorized access to evidence file")
     
+    now = datetime.utcnow()
+    cached = _download_url_cache.get(storage_path)
+    if cached and cached[1] > now:
+        return cached[0]
+    
     blob = bucket.blob(storage_path)
     
     # Generate signed URL valid for 1 hour
     url = blob.generate_signed_url(
         version="v4",
-        expiration=timedelta(hours=1),
+        expiration=timedelta(minutes=DOWNLOAD_URL_EXPIRATION_MINUTES),
         method="GET"
     )
     
+    if len(_download_url_cache) >= DOWNLOAD_URL_CACHE_MAX_ENTRIES:
+        _prune_download_url_cache(now)
+    _download_url_cache[storage_path] = (url, now + timedelta(minutes=DOWNLOAD_URL_CACHE_TTL_MINUTES))
+    
     return url
 
-async def delete_evidence_file(storage_path: str, user_id: str) -> bool:
+@traced('storage.get_case_evidence_download_urls')
+async def get_case_evidence_download_urls(case_id: str, user_id: str) -> list:
+    """
+    Get all evidence for a case with a signed download URL for each file.
+    Uses the signed URL cache, so repeat gallery loads don't re-sign.
+    """
+    evidence_list = await get_case_evidence(case_id, user_id)
+    
+    for evidence in evidence_list:
+        storage_path = evidence.get('storagePath')
+        evidence['downloadUrl'] = (
+            await get_evidence_download_url(storage_path, user_id) if storage_path else None
+        )
+        
+        # Small JPEGs for the gallery grid, when they have been generated
+        if evidence.get('thumbnailPath'):
+            evidence['thumbnailUrl'] = await get_evidence_download_url(evidence['thumbnailPath'], user_id)
+        if evidence.get('previewPath'):
+            evidence['previewUrl'] = await get_evidence_download_url(evidence['previewPath'], user_id)
+    
+    return evidence_list
+
+@traced('storage.delete_evidence_file')
+async def delete_evidence_file(storage_path: str, user_id: str, content_hash: str = None) -> bool:
     """
     Delete evidence file from Storage.
     Verifies user owns the file before deletion.
+    Deduplicated files (content_hash given) are only removed once the last
+    evidence record referencing them is deleted; without a content_hash the
+    object is kept while a referenced content index entry still uses it.
+    Returns False while the file is still referenced, True once it is gone
+    (deleted now, or already missing).
     """
     # Verify user owns this file
     if not storage_path.startswith(f"evidence/{user_id}/"):
         raise ValueError("Unauthorized to delete this file")
     
+    if content_hash:
+        if not _release_content_ref(user_id, content_hash):
+            print(f"✓ Evidence file still referenced, kept: {storage_path}")
+            return False
+    elif _content_path_in_use(user_id, storage_path):
+        print(f"✓ Evidence file shared by deduplicated evidence, kept: {storage_path}")
+        return False
+    
+    invalidate_evidence_download_url(storage_path)
     blob = bucket.blob(storage_path)
     
     if blob.exists():
         blob.delete()
         print(f"✓ Evidence file deleted: {storage_path}")
-        return True
     
-    return False
+    return True
 
-async def save_evidence_metadata(user_id: str, case_id: str, metadata: dict) -> str:
+@traced('firestore.save_evidence_metadata')
+async def save_evidence_metadata(user_id: str, case_id: str, metadata: dict, evidence_id: str = None) -> str:
     """
     Save evidence metadata to Firestore.
+    With evidence_id the record is created at most once, so a retried
+    request returns the existing record's ID instead of a duplicate.
     Returns evidence document ID.
     """
     from datetime import datetime
+    from google.api_core.exceptions import AlreadyExists
     
-    evidence_ref = db.collection('evidence').document()
+    evidence_ref = db.collection('evidence').document(evidence_id) if evidence_id else db.collection('evidence').document()
     
     evidence_doc = {
         **metadata,
@@ -200,10 +572,42 @@ async def save_evidence_metadata(user_id: str, case_id: str, metadata: dict) ->
         'createdAt': datetime.utcnow().isoformat()
     }
     
-    evidence_ref.set(evidence_doc)
+    if evidence_id:
+        try:
+            evidence_ref.create(evidence_doc)
+        except AlreadyExists:
+            print(f"✓ Evidence metadata already saved: {evidence_ref.id}")
+            return evidence_ref.id
+    else:
+        evidence_ref.set(evidence_doc)
     print(f"✓ Evidence metadata saved: {evidence_ref.id}")
     return evidence_ref.id
 
+def direct_upload_evidence_id(storage_path: str) -> str:
+    """Evidence ID for a direct upload, keyed by its storage path (one record per object)"""
+    import hashlib
+    return f"direct_{hashlib.sha256(storage_path.encode()).hexdigest()[:40]}"
+
+@traced('firestore.update_evidence_metadata')
+async def update_evidence_metadata(evidence_id: str, user_id: str, updates: dict) -> bool:
+    """
+    Update server-generated fields on an evidence document
+    (e.g. thumbnail/preview paths). Verifies user owns the evidence.
+    """
+    evidence_ref = db.collection('evidence').document(evidence_id)
+    evidence_doc = evidence_ref.get()
+    
+    if not evidence_doc.exists:
+        raise ValueError("Evidence not found")
+    
+    # Verify ownership
+    if evidence_doc.to_dict().get('userId') != user_id:
+        raise ValueError("Unauthorized to update this evidence")
+    
+    evidence_ref.update(updates)
+    return True
+
+@traced('firestore.get_case_evidence')
 async def get_case_evidence(case_id: str, user_id: str) -> list:
     """
     Get all evidence for a specific case.
@@ -220,6 +624,7 @@ async def get_case_evidence(case_id: str, user_id: str) -> list:
         for doc in evidence_docs
     ]
 
+@traced('firestore.delete_evidence_metadata')
 async def delete_evidence_metadata(evidence_id: str, user_id: str) -> bool:
     """
     Delete evidence metadata from Firestore.
@@ -238,4 +643,98 @@ async def delete_evidence_metadata(evidence_id: str, user_id: str) -> bool:
     
     evidence_ref.delete()
     print(f"✓ Evidence metadata deleted: {evidence_id}")
-    return True
\ No newline at end of file
+    return True
+
+@traced('firestore.create_chat_session')
+async def create_chat_session(user_id: str) -> str:
+    """Create a chat session. Returns session ID."""
+    from datetime import datetime
+    
+    session_ref = db.collection('chat_sessions').document()
+    now = datetime.utcnow().isoformat()
+    session_ref.set({
+        'userId': user_id,
+        'turnCount': 0,
+        'createdAt': now,
+        'updatedAt': now
+    })
+    
+    print(f"✓ Chat session created: {session_ref.id}")
+    return session_ref.id
+
+@traced('firestore.get_chat_session_turns')
+async def get_chat_session_turns(session_id: str, user_id: str) -> list:
+    """
+    Get the turn log of a chat session, oldest first.
+    Verifies user owns the session.
+    """
+    session_ref = db.collection('chat_sessions').document(session_id)
+    session_doc = session_ref.get()
+    
+    if not session_doc.exists:
+        raise ValueError("Chat session not found")
+    
+    if session_doc.to_dict().get('userId') != user_id:
+        raise ValueError("Unauthorized to access this chat session")
+    
+    turns = session_ref.collection('turns').order_by('index').stream()
+    return [turn.to_dict() for turn in turns]
+
+@traced('firestore.append_chat_turns')
+async def append_chat_turns(session_id: str, turns: list) -> int:
+    """
+    Append turns to a session's log in one transaction.
+    Indices are allocated from the session's turnCount inside the
+    transaction and turn documents are created (never overwritten), so the
+    log stays append-only and ordered across workers.
+    Returns the index of the first appended turn.
+    """
+    from datetime import datetime
+    
+    session_ref = db.collection('chat_sessions').document(session_id)
+    now = datetime.utcnow().isoformat()
+    
+    @firestore.transactional
+    def append(transaction):
+        snapshot = session_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            raise ValueError("Chat session not found")
+        start_index = snapshot.to_dict().get('turnCount', 0)
+        for offset, turn in enumerate(turns):
+            index = start_index + offset
+            transaction.create(session_ref.collection('turns').document(f"{index:06d}"), {
+                'index': index,
+                'role': turn['role'],
+                'content': turn['content'],
+                'createdAt': now
+            })
+        transaction.update(session_ref, {
+            'turnCount': start_index + len(turns),
+            'updatedAt': now
+        })
+        return start_index
+    
+    return append(db.transaction())
+
+def acquire_lease(name: str, holder: str, ttl_seconds: float) -> bool:
+    """
+    Take (or renew) a cluster-wide lease: leases/{name}.
+    Used so only one worker runs a maintenance job at a time.
+    Returns False while another holder's lease has not expired.
+    """
+    import time
+    
+    lease_ref = db.collection('leases').document(name)
+    
+    @firestore.transactional
+    def acquire(transaction):
+        now = time.time()
+        snapshot = lease_ref.get(transaction=transaction)
+        if snapshot.exists:
+            lease = snapshot.to_dict()
+            if lease.get('holder') != holder and lease.get('expiresAt', 0) > now:
+                return False
+        transaction.set(lease_ref, {'holder': holder, 'acquiredAt': now, 'expiresAt': now + ttl_seconds})
+        return True
+    
+    return acquire(db.transaction())
@@ -0,0 +1,221 @@
+# backend/app/core/loop_watchdog.py
+
+"""
+Event-loop lag and blocking-call detector (diagnostic mode).
+
+A heartbeat task on the event loop wakes every LOOP_WATCHDOG_INTERVAL_MS and
+records how late it ran (gigshield_event_loop_lag_seconds). A monitor thread
+watches the heartbeat: while it is more than LOOP_LAG_THRESHOLD_MS overdue,
+something is holding the loop, so the thread samples the loop thread's stack
+(sys._current_frames) every LOOP_WATCHDOG_SAMPLE_MS. Each sample is
+attributed to the route whose endpoint (or dependency) is on the stack and
+to the innermost app frame - the call site to move off the loop, e.g. a
+firebase.py helper, encoder.encode or messages.create.
+
+Enable with LOOP_WATCHDOG_ENABLED=true; report at GET /diagnostics/event-loop (admins).
+"""
+
+import asyncio
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Any, Optional
+
+from .telemetry import metrics
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.dirname(APP_DIR)
+
+# Our own frames never explain a stall
+_SKIP_FILES = {os.path.abspath(__file__), os.path.join(APP_DIR, 'core', 'telemetry.py')}
+
+# Distinct call sites kept per route; further ones are counted under "other"
+MAX_SITES_PER_ROUTE = 200
+# Frames kept in each example stack (outermost first)
+STACK_DEPTH = 15
+
+loop_lag = metrics.histogram(
+    'gigshield_event_loop_lag_seconds', 'How late the event loop ran the watchdog heartbeat',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+
+def _frame_label(frame) -> str:
+    filename = frame.f_code.co_filename
+    if filename.startswith(BACKEND_DIR + os.sep):
+        filename = os.path.relpath(filename, BACKEND_DIR)
+    else:
+        # Library frames: keep package/module.py
+        filename = os.path.join(*filename.split(os.sep)[-2:])
+    return f"{filename}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def _dependencies(dependant):
+    for dependency in getattr(dependant, 'dependencies', []):
+        yield dependency
+        yield from _dependencies(dependency)
+
+
+def _route_codes(app) -> Dict[Any, str]:
+    """Code object of each endpoint and dependency function -> route label"""
+    codes: Dict[Any, str] = {}
+    dependency_codes: Dict[Any, str] = {}
+    for route in getattr(app, 'routes', []):
+        endpoint = getattr(route, 'endpoint', None)
+        if not inspect.isfunction(endpoint):
+            continue
+        methods = ','.join(sorted(getattr(route, 'methods', None) or []))
+        codes[inspect.unwrap(endpoint).__code__] = f"{methods} {route.path}".strip()
+        for dependency in _dependencies(getattr(route, 'dependant', None)):
+            if inspect.isfunction(dependency.call):
+                dependency_codes[inspect.unwrap(dependency.call).__code__] = f"Depends({dependency.call.__name__})"
+    # A function used both ways is labelled as the endpoint
+    return {**dependency_codes, **codes}
+
+
+class LoopWatchdog:
+    def __init__(self):
+        """Measures event-loop lag and samples whatever blocks the loop"""
+        self.enabled = os.getenv("LOOP_WATCHDOG_ENABLED", "false").lower() == "true"
+        self.threshold = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100")) / 1000
+        self.interval = float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "20")) / 1000
+        self.sample_interval = float(os.getenv("LOOP_WATCHDOG_SAMPLE_MS", "10")) / 1000
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+        self._route_codes: Dict[Any, str] = {}
+        self._last_beat = time.monotonic()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._started_at = time.time()
+            self._stalls = 0
+            self._max_lag = 0.0
+            # route -> {'stalls', 'samples', 'blockedMs', 'sites': Counter(site key -> ms),
+            #           'siteSamples': Counter, 'stacks': site key -> example stack}
+            self._routes: Dict[str, Dict[str, Any]] = {}
+
+    def start(self, app=None) -> None:
+        """Start on the running loop (call from the app lifespan)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._route_codes = _route_codes(app) if app is not None else {}
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        print(f"✓ Event loop watchdog on (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._stop.set()
+        self._thread.join(timeout=1)
+        self._task = self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            loop_lag.observe(lag)
+            if lag >= self.threshold:
+                with self._lock:
+                    self._stalls += 1
+                    self._max_lag = max(self._max_lag, lag)
+
+    def _monitor(self) -> None:
+        stalled = False
+        last_sample = 0.0
+        while not self._stop.wait(self.sample_interval):
+            now = time.monotonic()
+            overdue = now - self._last_beat - self.interval
+            if overdue < self.threshold:
+                stalled = False
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            # The first sample of a stall stands for the time already blocked,
+            # later ones for the time since the previous sample
+            weight = overdue if not stalled else now - last_sample
+            self._record(frame, weight, new_stall=not stalled)
+            stalled = True
+            last_sample = now
+
+    def _record(self, frame, weight: float, new_stall: bool) -> None:
+        route = site = None
+        leaf = _frame_label(frame)
+        stack: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            if route is None and code in self._route_codes:
+                route = self._route_codes[code]
+            if site is None and code.co_filename.startswith(APP_DIR) and code.co_filename not in _SKIP_FILES:
+                site = _frame_label(frame)
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        route = route or "(no route)"
+        key = (site or leaf, leaf)
+
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                'stalls': 0, 'samples': 0, 'blockedMs': 0.0,
+                'sites': Counter(), 'siteSamples': Counter(), 'stacks': {}
+            })
+            if key not in stats['sites'] and len(stats['sites']) >= MAX_SITES_PER_ROUTE:
+                key = ('other', 'other')
+            stats['stalls'] += int(new_stall)
+            stats['samples'] += 1
+            stats['blockedMs'] += weight * 1000
+            stats['sites'][key] += weight * 1000
+            stats['siteSamples'][key] += 1
+            stats['stacks'].setdefault(key, list(reversed(stack[:STACK_DEPTH])))
+
+    def report(self, top: int = 10) -> Dict[str, Any]:
+        """Routes by estimated blocked time, each with its worst call sites"""
+        with self._lock:
+            routes = []
+            for route, stats in sorted(self._routes.items(), key=lambda item: -item[1]['blockedMs']):
+                sites = [
+                    {
+                        'site': site,
+                        'blockedIn': leaf,
+                        'samples': stats['siteSamples'][(site, leaf)],
+                        'blockedMs': round(ms, 1),
+                        'stack': stats['stacks'].get((site, leaf), [])
+                    }
+                    for (site, leaf), ms in stats['sites'].most_common(top)
+                ]
+                routes.append({
+                    'route': route,
+                    'stalls': stats['stalls'],
+                    'samples': stats['samples'],
+                    'blockedMs': round(stats['blockedMs'], 1),
+                    'sites': sites
+                })
+            return {
+                'enabled': self.enabled,
+                'running': self._task is not None,
+                'thresholdMs': self.threshold * 1000,
+                'since': self._started_at,
+                'stalls': self._stalls,
+                'maxLagMs': round(self._max_lag * 1000, 1),
+                'routes': routes
+            }
+
+
+# Create singleton instance
+loop_watchdog = LoopWatchdog()
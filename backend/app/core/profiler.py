@@ -0,0 +1,205 @@
+# backend/app/core/profiler.py
+
+"""
+Sampling profiler for a live worker.
+
+While a profile runs, a sampler thread reads every thread's stack
+(sys._current_frames) each PROFILER_INTERVAL_MS and aggregates them into
+collapsed stacks ("thread:name;outer;...;inner weight"), the input format
+of flamegraph.pl, speedscope and inferno. Nothing is hooked into the
+interpreter, so the cost is one stack walk per thread per tick and only
+while a profile is running.
+
+- wall: every sample counts, including threads waiting on I/O or locks -
+  where the time goes.
+- cpu: samples are weighted by the CPU time (microseconds) each thread used
+  since the previous tick, so idle and waiting threads drop out - what keeps
+  the CPU busy (_keyword_search, analytics aggregation, JSON serialisation).
+  Needs per-thread CPU clocks (Linux).
+
+One profile runs at a time and none runs longer than PROFILER_MAX_SECONDS.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Any, Optional
+
+MODES = ('wall', 'cpu')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Distinct stacks kept per profile; the rest are folded into one per thread
+MAX_STACKS = 20000
+
+
+class ProfilerBusyError(RuntimeError):
+    """Another profile is already running in this worker"""
+
+
+def _function_name(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(BACKEND_DIR + os.sep):
+        filename = os.path.relpath(filename, BACKEND_DIR)
+    else:
+        # Library frames: keep package/module.py
+        filename = os.path.join(*filename.split(os.sep)[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+def _thread_cpu_time(thread_id: int) -> Optional[float]:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError):
+        return None
+
+
+class Profile:
+    def __init__(self, mode: str, interval: float, max_seconds: float):
+        """One profiling run; sampled on its own thread between start() and stop()"""
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (expected one of {', '.join(MODES)})")
+        if mode == 'cpu' and _thread_cpu_time(threading.get_ident()) is None:
+            raise ValueError("CPU profiles need per-thread CPU clocks, which this platform lacks")
+        self.mode = mode
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.duration = 0.0
+        self._cpu_times: Dict[int, float] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        started = time.monotonic()
+        deadline = started + self.max_seconds
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            self._sample(own_thread)
+        self.duration = time.monotonic() - started
+
+    def _sample(self, own_thread: int) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            if self.mode == 'cpu':
+                now = _thread_cpu_time(thread_id)
+                previous = self._cpu_times.get(thread_id)
+                if now is None:
+                    continue
+                self._cpu_times[thread_id] = now
+                weight = round((now - previous) * 1e6) if previous is not None else 0
+                if weight <= 0:
+                    continue
+            else:
+                weight = 1
+
+            stack: List[str] = []
+            while frame is not None:
+                stack.append(_function_name(frame.f_code))
+                frame = frame.f_back
+            stack.append(f"thread:{names.get(thread_id, thread_id)}")
+            key = ';'.join(reversed(stack))
+            if key not in self.stacks and len(self.stacks) >= MAX_STACKS:
+                key = f"{stack[-1]};(other stacks)"
+            self.stacks[key] += weight
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        """Flamegraph input: one "frame;frame;frame weight" line per distinct stack"""
+        return ''.join(f"{stack} {weight}\n" for stack, weight in self.stacks.most_common())
+
+    def summary(self, top: int = 20) -> Dict[str, Any]:
+        """Functions by self and total weight (a quick read without a flamegraph)"""
+        self_weight: Counter = Counter()
+        total_weight: Counter = Counter()
+        for stack, weight in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if frames:
+                self_weight[frames[-1]] += weight
+            for frame in set(frames):
+                total_weight[frame] += weight
+        grand_total = sum(self.stacks.values()) or 1
+        return {
+            'mode': self.mode,
+            'unit': 'cpu_us' if self.mode == 'cpu' else 'samples',
+            'intervalMs': self.interval * 1000,
+            'startedAt': self.started_at,
+            'durationS': round(self.duration, 3),
+            'samples': self.samples,
+            'topSelf': [
+                {'function': name, 'weight': weight, 'percent': round(100 * weight / grand_total, 1)}
+                for name, weight in self_weight.most_common(top)
+            ],
+            'topTotal': [
+                {'function': name, 'weight': weight, 'percent': round(100 * weight / grand_total, 1)}
+                for name, weight in total_weight.most_common(top)
+            ]
+        }
+
+
+class Profiler:
+    def __init__(self):
+        """Runs one profile at a time and keeps recent per-request profiles"""
+        self.interval = float(os.getenv("PROFILER_INTERVAL_MS", "10")) / 1000
+        self.max_seconds = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+        self.keep = int(os.getenv("PROFILER_KEEP", "20"))
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()  # request id -> profile
+
+    def start(self, mode: str = 'wall', seconds: Optional[float] = None, interval_ms: Optional[float] = None) -> Profile:
+        """Start sampling the worker; raises ProfilerBusyError if a profile is running"""
+        interval = max(0.001, interval_ms / 1000) if interval_ms else self.interval
+        max_seconds = min(seconds, self.max_seconds) if seconds else self.max_seconds
+        profile = Profile(mode, interval, max_seconds)
+        if not self._busy.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running in this worker")
+        try:
+            profile.start()
+        except Exception:
+            self._busy.release()
+            raise
+        return profile
+
+    def stop(self, profile: Profile) -> Profile:
+        try:
+            profile.stop()
+        finally:
+            self._busy.release()
+        return profile
+
+    def store(self, request_id: str, profile: Profile) -> None:
+        with self._lock:
+            self._profiles[request_id] = profile
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(request_id)
+
+    def recent(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = list(self._profiles.items())
+        return [
+            {'requestId': request_id, 'mode': profile.mode, 'startedAt': profile.started_at,
+             'durationS': round(profile.duration, 3), 'samples': profile.samples}
+            for request_id, profile in reversed(profiles)
+        ]
+
+
+# Create singleton instance
+profiler = Profiler()
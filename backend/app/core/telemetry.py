@@ -0,0 +1,221 @@
+# backend/app/core/telemetry.py
+
+"""
+Request tracing, Prometheus-style metrics and structured request logs.
+
+- span(name) / @traced(name) time an operation (Firestore, Storage,
+  embedding, Pinecone, Claude). Every span feeds the
+  gigshield_span_duration_seconds histogram and, inside a request, that
+  request's trace (Server-Timing header and access log line).
+- The request id (X-Request-ID, generated when absent) lives in a
+  contextvar, so spans in asyncio.to_thread workers and log lines are
+  attributed to the right request.
+- metrics.render() produces the Prometheus text format for /metrics.
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+# Seconds; tuned for request latencies from a few ms to slow Claude calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Client-supplied request ids are echoed and logged, so only accept simple tokens
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_id', default=None)
+_trace_var: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar('trace', default=None)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_string(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # label values -> bucket counts + [sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values):
+                labels = _label_string(self.labels + ('le',), key + (repr(bound),))
+                lines.append(f"{self.name}_bucket{labels} {int(count)}")
+            labels = _label_string(self.labels + ('le',), key + ('+Inf',))
+            lines.append(f"{self.name}_bucket{labels} {int(values[-1])}")
+            lines.append(f"{self.name}_sum{_label_string(self.labels, key)} {values[-2]:.6f}")
+            lines.append(f"{self.name}_count{_label_string(self.labels, key)} {int(values[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Process-wide metrics; collectors add values owned by other services at scrape time"""
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def histogram(self, name: str, description: str, labels: Tuple[str, ...] = (), **kwargs) -> Histogram:
+        metric = Histogram(name, description, labels, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[str]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"⚠ Metrics collector failed: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+def counter_lines(name: str, description: str, labels: Tuple[str, ...], values: Dict[Tuple[str, ...], float]) -> List[str]:
+    """Render counter values owned elsewhere (e.g. AIService.usage_stats) at scrape time"""
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+    for key, value in sorted(values.items()):
+        lines.append(f"{name}{_label_string(labels, key)} {value:g}")
+    return lines
+
+
+# Create singleton instance
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    'gigshield_http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route', 'status')
+)
+span_duration = metrics.histogram(
+    'gigshield_span_duration_seconds', 'Duration of traced operations (Firestore, Storage, embedding, Pinecone, Claude)', ('span',)
+)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block; recorded in the span histogram and the current request's trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        span_duration.observe(duration, span=name)
+        trace = _trace_var.get()
+        if trace is not None:
+            trace.append((name, duration))
+
+
+def traced(name: str):
+    """Decorator form of span() for sync and async functions"""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_request(request_id: Optional[str] = None) -> Tuple[str, List[Tuple[str, float]]]:
+    """Bind a request id (the client's, if well-formed) and an empty trace to the current context"""
+    if not request_id or not REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid.uuid4().hex
+    trace: List[Tuple[str, float]] = []
+    request_id_var.set(request_id)
+    _trace_var.set(trace)
+    return request_id, trace
+
+
+def summarize_trace(trace: List[Tuple[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Span name -> {'count', 'ms'} totals for one request"""
+    totals: Dict[str, Dict[str, float]] = {}
+    for name, duration in list(trace):
+        entry = totals.setdefault(name, {'count': 0, 'ms': 0.0})
+        entry['count'] += 1
+        entry['ms'] = round(entry['ms'] + duration * 1000, 2)
+    return totals
+
+
+def server_timing(totals: Dict[str, Dict[str, float]], total_ms: float) -> str:
+    """Server-Timing header value (shown per request in browser dev tools)"""
+    entries = [f'{name.replace(".", "-")};dur={entry["ms"]}' for name, entry in totals.items()]
+    entries.append(f"total;dur={round(total_ms, 2)}")
+    return ', '.join(entries)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, tagged with the current request id"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname.lower(),
+            'event': record.getMessage(),
+            'requestId': request_id_var.get(),
+            **getattr(record, 'fields', {})
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+logger = logging.getLogger('gigshield')
+
+
+def configure_logging() -> None:
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_event(event: str, level: int = logging.INFO, **fields: Any) -> None:
+    """Structured log line correlated with the current request"""
+    logger.log(level, event, extra={'fields': fields})
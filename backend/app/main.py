@@ -2,10 +2,13 @@
 # REPLACE YOUR EXISTING FILE WITH THIS
 
 from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from dotenv import load_dotenv
 import os
+import time
 from collections import defaultdict
 from datetime import datetime, timedelta
 
@@ -19,6 +22,18 @@ from app.core import firebase
 from app.api.appeals import router as appeals_router
 from app.api.analytics import router as analytics_router
 from app.api.scoring import router as scoring_router
+from app.api.diagnostics import router as diagnostics_router
+from app.core import telemetry
+from app.core.auth_middleware import is_admin_request
+from app.core.profiler import MODES as PROFILE_MODES, ProfilerBusyError, profiler
+
+# Structured (JSON) request logs, tagged with the request id
+telemetry.configure_logging()
+
+# Server-Timing exposes internal span timings, so it is only sent to admins
+# who ask for it (X-Server-Timing: 1), or to everyone with SERVER_TIMING_ALL=true
+# (local debugging)
+SERVER_TIMING_ALL = os.getenv("SERVER_TIMING_ALL", "false").lower() == "true"
 
 # Simple in-memory rate limiter
 class RateLimiter:
@@ -56,11 +71,39 @@ class RateLimiter:
 
 rate_limiter = RateLimiter()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background jobs on startup and stop them on shutdown"""
+    from app.services.evidence_gc import evidence_gc
+    from app.services.notice_extraction import notice_extraction_service
+    from app.services.knowledge_base import knowledge_base_service
+    from app.core.loop_watchdog import loop_watchdog
+    
+    # Diagnostic mode: sample stacks of whatever blocks the event loop
+    loop_watchdog.start(app)
+    
+    background_jobs = [
+        asyncio.create_task(evidence_gc.run_periodically())
+    ]
+    
+    if os.getenv("KB_WARM_CONTEXT_CACHE", "false").lower() == "true":
+        # Retrieval blocks (Firestore, embeddings, Pinecone) - warm in a thread
+        background_jobs.append(asyncio.create_task(asyncio.to_thread(knowledge_base_service.warm_context_cache)))
+    
+    yield
+    
+    for job in background_jobs:
+        job.cancel()
+    loop_watchdog.stop()
+    notice_extraction_service.shutdown()
+    knowledge_base_service.shutdown()
+
 # Create FastAPI app
 app = FastAPI(
     title="GigShield API",
     description="API for gig worker deactivation appeals and rights information",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware - allows frontend to call API
@@ -76,7 +119,8 @@ app.add_middleware(
     ],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH"],
-    allow_headers=["Authorization", "Content-Type", "Accept"],
+    allow_headers=["Authorization", "Content-Type", "Accept", "X-Request-ID", "X-Profile", "X-Server-Timing"],
+    expose_headers=["X-Request-ID", "X-Profile-ID"],
 )
 
 # Trusted host middleware
@@ -115,10 +159,73 @@ async def rate_limit_middleware(request: Request, call_next):
     response = await call_next(request)
     return response
 
+# Per-request profiling for admins: "X-Profile: wall|cpu" samples the worker
+# until the response starts (concurrent requests show up too); fetch it with
+# GET /diagnostics/profiles/{X-Profile-ID}
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    mode = request.headers.get("X-Profile")
+    if mode not in PROFILE_MODES or not await is_admin_request(request.headers.get("Authorization")):
+        return await call_next(request)
+    
+    try:
+        profile = profiler.start(mode)
+    except (ProfilerBusyError, ValueError) as e:
+        print(f"⚠ Request not profiled: {e}")
+        return await call_next(request)
+    
+    try:
+        response = await call_next(request)
+    finally:
+        await asyncio.to_thread(profiler.stop, profile)
+        request_id = telemetry.request_id_var.get()
+        profiler.store(request_id, profile)
+    
+    response.headers["X-Profile-ID"] = request_id
+    return response
+
+# Request tracing (registered last, so it is the outermost middleware and
+# times everything): request id, per-route latency histogram, spans from
+# the request in Server-Timing (admin/debug only), and one structured log
+# line per request
+@app.middleware("http")
+async def telemetry_middleware(request: Request, call_next):
+    request_id, trace = telemetry.start_request(request.headers.get("X-Request-ID"))
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        duration = time.perf_counter() - started
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        telemetry.http_request_duration.observe(
+            duration, method=request.method, route=route_path, status=str(status_code)
+        )
+        spans = telemetry.summarize_trace(trace)
+        telemetry.log_event(
+            "request",
+            method=request.method,
+            route=route_path,
+            status=status_code,
+            durationMs=round(duration * 1000, 2),
+            spans=spans
+        )
+    
+    response.headers["X-Request-ID"] = request_id
+    if SERVER_TIMING_ALL or (
+        request.headers.get("X-Server-Timing") == "1"
+        and await is_admin_request(request.headers.get("Authorization"))
+    ):
+        response.headers["Server-Timing"] = telemetry.server_timing(spans, duration * 1000)
+    return response
+
 # Include routers
 app.include_router(appeals_router)
 app.include_router(analytics_router, prefix="/api")
 app.include_router(scoring_router, prefix="/api")
+app.include_router(diagnostics_router)
 
 @app.get("/")
 async def root():
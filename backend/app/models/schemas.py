@@ -62,11 +62,30 @@ class NoticeAnalyzeResponse(BaseModel):
     missing_info: List[str]
     recommendations: List[str]
 
+class NoticeFileAnalyzeResponse(NoticeAnalyzeResponse):
+    extracted_text: str
+    extraction_method: str
+    page_count: int
+
 # Chatbot models
 class ChatRequest(BaseModel):
     message: str
     conversation_history: Optional[List[dict]] = []
+    conversation_id: Optional[str] = None
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
-    suggested_actions: Optional[List[dict]] = []
\ No newline at end of file
+    suggested_actions: Optional[List[dict]] = []
+    session_id: Optional[str] = None
+# Evidence models
+class EvidenceUploadUrlRequest(BaseModel):
+    filename: str
+    content_type: str
+    size: Optional[int] = None
+    case_id: Optional[str] = None
+
+class EvidenceUploadComplete(BaseModel):
+    storage_path: str
+    filename: str
+    case_id: Optional[str] = None
@@ -0,0 +1,40 @@
+"""
+Check that the ONNX embedding backends match the PyTorch model and compare speed.
+Run this (offline - it loads torch) before switching KB_EMBEDDING_BACKEND in production.
+
+Usage (from backend/):
+    python -m app.scripts.check_embedding_parity --backend onnx-int8
+"""
+
+import argparse
+import json
+import time
+
+from app.services.embedding_backend import ONNX_MODEL_FILES, PARITY_TEXTS, check_parity, load_encoder
+
+
+def time_queries(encoder, rounds: int) -> float:
+    """Average milliseconds per single-query encode"""
+    encoder.encode(PARITY_TEXTS[0])  # warm up
+    started = time.perf_counter()
+    for i in range(rounds):
+        encoder.encode(PARITY_TEXTS[i % len(PARITY_TEXTS)])
+    return round((time.perf_counter() - started) * 1000 / rounds, 3)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend parity check")
+    parser.add_argument("--backend", choices=list(ONNX_MODEL_FILES), action="append")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    reference = load_encoder('torch')
+    results = {'torch': {'msPerQuery': time_queries(reference, args.rounds)}}
+
+    for backend in args.backend or list(ONNX_MODEL_FILES):
+        encoder = load_encoder(backend)
+        report = check_parity(encoder, reference, backend=backend)
+        report['msPerQuery'] = time_queries(encoder, args.rounds)
+        results[backend] = report
+
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,26 @@
+"""
+Sweep temporary evidence uploads once (for cron / manual runs).
+Promotes temp files that were later attached to a case and deletes
+unreferenced ones older than --max-age-hours.
+
+Usage (from backend/):
+    python -m app.scripts.sweep_temp_evidence --max-age-hours 24 --dry-run
+"""
+
+import argparse
+import json
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.evidence_gc import evidence_gc
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep orphaned temp evidence")
+    parser.add_argument("--max-age-hours", type=float, default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    report = evidence_gc.sweep(max_age_hours=args.max_age_hours, dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
@@ -1,87 +1,267 @@
 # backend/app/services/ai_service.py
 
+import asyncio
 import os
+import json
 from anthropic import Anthropic
-from typing import Dict, List, Any
+from pydantic import ValidationError
+from typing import Dict, List, Any, Optional
+from app.models.schemas import NoticeAnalyzeResponse
+from app.services.notice_rules import pre_extract_notice
+from app.services.chat_history import ChatHistoryManager, estimate_tokens
+from app.services.context_assembler import context_assembler
+from app.core.telemetry import counter_lines, metrics, span
+
+# Tool schema that forces analyze_notice output into NoticeAnalyzeResponse shape
+NOTICE_ANALYSIS_SCHEMA = NoticeAnalyzeResponse.model_json_schema()
+NOTICE_ANALYSIS_SCHEMA['properties']['urgency_level']['enum'] = ['URGENT', 'MODERATE', 'LOW']
+NOTICE_ANALYSIS_SCHEMA['properties']['risk_level']['enum'] = ['Low', 'Medium', 'High']
+
+NOTICE_ANALYSIS_TOOL = {
+    "name": "record_notice_analysis",
+    "description": "Record the structured analysis of a gig platform deactivation notice.",
+    "input_schema": NOTICE_ANALYSIS_SCHEMA
+}
+
+
+# Static instruction blocks. These are sent as cacheable system-prompt
+# prefixes, so keep anything per-request (dates, user details) out of them.
+APPEAL_INSTRUCTIONS = """You are an expert legal writer specializing in gig economy worker appeals.
+
+Generate a professional, persuasive appeal letter for a gig worker whose account has been deactivated, using the details in the user's message.
+
+Generate a complete appeal letter that:
+1. Is professionally formatted with proper business letter structure
+2. STARTS with the actual date given as CURRENT DATE
+3. States the purpose clearly in the opening
+4. Highlights the worker's positive track record
+5. Addresses the deactivation reason respectfully
+6. Provides context from the worker's perspective
+7. References specific platform policies and state laws when applicable (from the provided context)
+8. Cites relevant legal protections and rights
+9. Requests specific information about the incident
+10. Asks for reinstatement with clear justification
+11. Maintains the requested tone
+12. ENDS with the worker's actual contact information (name, phone, email) instead of placeholders
+
+IMPORTANT FORMATTING:
+- Use PLAIN TEXT ONLY - no markdown, no asterisks, no special formatting
+- Do NOT use ** for bold or * for emphasis
+- Use proper spacing and line breaks for emphasis instead
+- Write in standard business letter format
+- Use the actual date provided, not [Current Date] or any placeholder
+- When citing policies, reference them naturally (e.g., "Under California's AB5...")
+
+Make it persuasive but respectful.
+Use the actual worker's name, phone, and email in the signature - DO NOT use placeholders like [Your Name], [Your Phone], or [Your Email]."""
+
+CHAT_INSTRUCTIONS = """You are a helpful assistant specializing in gig economy worker rights, platform policies, and appeal processes. 
+
+You help workers understand:
+- Their rights under platform terms of service and state labor laws
+- How to appeal deactivations successfully
+- What documentation and evidence they should gather
+- Platform-specific policies (DoorDash, Uber, Lyft, Instacart, Amazon Flex)
+- State-specific labor laws and protections
+- Appeal deadlines and timelines
+
+Be supportive, informative, and action-oriented. Provide specific steps workers can take.
+
+IMPORTANT: Use the KNOWLEDGE BASE CONTEXT below to provide accurate, specific information about laws, policies, and procedures. Each source is marked [S1], [S2], ... - name the source title when you rely on it."""
+
+
+def cached_block(text: str) -> Dict[str, Any]:
+    """System-prompt text block marked as a prompt-cache breakpoint"""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def extract_first_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the first complete JSON object embedded in text, ignoring any
+    prose or code fences around it. Tries each '{' with an incremental
+    decoder instead of a greedy regex, so trailing braces in prose don't break it.
+    """
+    decoder = json.JSONDecoder()
+    start = text.find('{')
+    while start != -1:
+        try:
+            obj, _ = decoder.raw_decode(text, start)
+            if isinstance(obj, dict):
+                return obj
+        except json.JSONDecodeError:
+            pass
+        start = text.find('{', start + 1)
+    return None
+
+
+def _validate_notice_analysis(result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Validate against NoticeAnalyzeResponse; raises ValueError with the reason"""
+    if result is None:
+        raise ValueError("No JSON object found in the response")
+    try:
+        validated = NoticeAnalyzeResponse.model_validate(result).model_dump()
+    except ValidationError as e:
+        raise ValueError(str(e))
+    if validated['urgency_level'] not in NOTICE_ANALYSIS_SCHEMA['properties']['urgency_level']['enum']:
+        raise ValueError("urgency_level must be one of URGENT, MODERATE, LOW")
+    if validated['risk_level'] not in NOTICE_ANALYSIS_SCHEMA['properties']['risk_level']['enum']:
+        raise ValueError("risk_level must be one of Low, Medium, High")
+    return validated
+
 
 class AIService:
     def __init__(self):
         """Initialize Anthropic Claude client"""
         self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
         self.model = "claude-sonnet-4-20250514"
+        
+        # Cumulative token usage per call type, including prompt-cache reads/writes
+        self.usage_stats = {}
+        self.last_usage = {}
+        
+        self.history_manager = ChatHistoryManager(self.client)
+    
+    def _record_usage(self, call_type: str, response) -> Dict[str, int]:
+        """Record input/output and prompt-cache token counts for one call"""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return {}
+        
+        call_usage = {
+            'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+            'output_tokens': getattr(usage, 'output_tokens', 0) or 0,
+            'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+            'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0
+        }
+        
+        totals = self.usage_stats.setdefault(call_type, {'calls': 0, **{k: 0 for k in call_usage}})
+        totals['calls'] += 1
+        for key, value in call_usage.items():
+            totals[key] += value
+        self.last_usage[call_type] = call_usage
+        
+        print(
+            f"✓ {call_type} tokens: in={call_usage['input_tokens']} out={call_usage['output_tokens']} "
+            f"cache_write={call_usage['cache_creation_input_tokens']} cache_read={call_usage['cache_read_input_tokens']}"
+        )
+        return call_usage
+    
+    def usage_metrics(self) -> List[str]:
+        """Claude call and token counters for /metrics, from usage_stats"""
+        calls, tokens = {}, {}
+        for call_type, totals in list(self.usage_stats.items()):
+            calls[(call_type,)] = totals['calls']
+            for kind in ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens'):
+                tokens[(call_type, kind.replace('_tokens', ''))] = totals[kind]
+        return (
+            counter_lines('gigshield_claude_calls_total', 'Claude API calls', ('call_type',), calls)
+            + counter_lines('gigshield_claude_tokens_total', 'Claude tokens by kind', ('call_type', 'kind'), tokens)
+        )
     
     async def analyze_notice(self, notice_text: str, platform: str = None) -> Dict[str, Any]:
         """
-        Analyze a deactivation notice and extract key information
+        Analyze a deactivation notice and extract key information.
+        Fields stated verbatim in the notice are extracted locally first; Claude
+        is only called when the local extraction isn't confident, and then only
+        for the fields still missing.
         """
-        prompt = f"""You are an expert in gig economy platform policies and worker rights.
-
-Analyze this deactivation notice and extract the following information:
+        pre = pre_extract_notice(notice_text)
+        fields = pre['fields']
+        
+        if pre['confident']:
+            print(f"✓ Notice analyzed locally (no LLM call): {fields['platform']}, {fields['deadline_days']} days")
+            return pre['analysis']
+        
+        # Tell Claude what we already know so it can focus on the rest
+        known = []
+        if fields['platform']:
+            known.append(f"- Platform: {fields['platform']}")
+        if fields['deadline_days'] is not None:
+            known.append(f"- Appeal deadline: {fields['deadline_days']} days")
+        if fields['reason_clause']:
+            known.append(f"- Stated reason: {fields['reason_clause']}")
+        if fields['dates']:
+            known.append(f"- Dates mentioned: {', '.join(fields['dates'][:5])}")
+        if fields['partner_ids']:
+            known.append(f"- Account/partner ID: {', '.join(fields['partner_ids'][:3])}")
+        known_section = "ALREADY EXTRACTED (keep these values):\n" + "\n".join(known) + "\n\n" if known else ""
+        
+        prompt = f"""Analyze this gig platform deactivation notice for the worker.
 
 DEACTIVATION NOTICE:
 {notice_text}
 
-Please provide:
-1. Platform name (DoorDash, Uber, Lyft, Instacart, etc.) - if mentioned
-2. Specific reason for deactivation
-3. Urgency level (URGENT, MODERATE, or LOW)
-4. Deadline to appeal (number of days, if mentioned)
-5. Risk level (Low, Medium, or High based on the severity)
-6. Missing information that would be helpful for the appeal
-7. Specific recommendations for the worker
-
-Respond in JSON format with these exact keys:
-{{
-    "platform": "platform name or Unknown",
-    "reason": "specific deactivation reason",
-    "urgency_level": "URGENT/MODERATE/LOW",
-    "deadline_days": number or null,
-    "risk_level": "Low/Medium/High",
-    "missing_info": ["item1", "item2"],
-    "recommendations": ["rec1", "rec2", "rec3"]
-}}"""
+{known_section}Record your analysis with the record_notice_analysis tool. Include up to 4 missing_info items that would help the appeal and 3 specific recommendations."""
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            # Extract the JSON response
-            import json
-            result_text = response.content[0].text
+            result = self._structured_notice_call([{"role": "user", "content": prompt}])
             
-            # Try to parse as JSON
-            try:
-                result = json.loads(result_text)
-            except json.JSONDecodeError:
-                # If not pure JSON, try to extract JSON from the text
-                import re
-                json_match = re.search(r'\{[\s\S]*\}', result_text)
-                if json_match:
-                    result = json.loads(json_match.group())
-                else:
-                    raise ValueError("Could not parse AI response as JSON")
+            # Values found verbatim in the notice win over the model's
+            if fields['platform']:
+                result['platform'] = fields['platform']
+            if fields['deadline_days'] is not None:
+                result['deadline_days'] = fields['deadline_days']
             
-            return result
+            return {**pre['analysis'], **{k: v for k, v in result.items() if v not in (None, '', [])}}
             
         except Exception as e:
             print(f"Error analyzing notice with AI: {e}")
-            # Fallback to basic analysis
-            return {
-                "platform": platform or "Unknown",
-                "reason": "Unable to determine specific reason",
-                "urgency_level": "MODERATE",
-                "deadline_days": 14,
-                "risk_level": "Medium",
-                "missing_info": ["Specific policy violated", "Date of incident", "Evidence"],
-                "recommendations": [
-                    "Gather all delivery/ride records",
-                    "Document your account history",
-                    "Review platform terms of service"
-                ]
-            }
+            # Fallback to the local rule-based analysis
+            analysis = pre['analysis']
+            if platform and analysis['platform'] == 'Unknown':
+                analysis['platform'] = platform
+            return analysis
+    
+    def _parse_notice_response(self, response) -> Dict[str, Any]:
+        """Get the analysis from a tool_use block, or from JSON inside text"""
+        for block in response.content:
+            if block.type == "tool_use" and block.name == NOTICE_ANALYSIS_TOOL["name"]:
+                return _validate_notice_analysis(block.input)
+        
+        text = "".join(block.text for block in response.content if block.type == "text")
+        return _validate_notice_analysis(extract_first_json_object(text))
+    
+    def _structured_notice_call(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Call Claude with the analysis tool forced, validate the output and,
+        if it is malformed, send a single targeted repair request.
+        """
+        request = {
+            "model": self.model,
+            "max_tokens": 512,
+            "tools": [NOTICE_ANALYSIS_TOOL],
+            "tool_choice": {"type": "tool", "name": NOTICE_ANALYSIS_TOOL["name"]}
+        }
+        
+        with span('claude.analyze_notice'):
+            response = self.client.messages.create(messages=messages, **request)
+        self._record_usage('analyze_notice', response)
+        try:
+            return self._parse_notice_response(response)
+        except ValueError as e:
+            print(f"⚠ Malformed notice analysis, retrying once: {e}")
+            error = str(e)
+        
+        # One repair round trip that tells the model exactly what was wrong
+        tool_use = next((block for block in response.content if block.type == "tool_use"), None)
+        repair_text = f"The analysis was invalid: {error}. Call record_notice_analysis again with corrected input."
+        if tool_use is not None:
+            repair_message = {"role": "user", "content": [{
+                "type": "tool_result",
+                "tool_use_id": tool_use.id,
+                "is_error": True,
+                "content": repair_text
+            }]}
+        else:
+            repair_message = {"role": "user", "content": repair_text}
+        
+        with span('claude.analyze_notice'):
+            response = self.client.messages.create(
+                messages=[*messages, {"role": "assistant", "content": response.content}, repair_message],
+                **request
+            )
+        self._record_usage('analyze_notice', response)
+        return self._parse_notice_response(response)
     
     async def generate_appeal(
         self, 
@@ -106,21 +286,16 @@ Respond in JSON format with these exact keys:
         from datetime import datetime
         current_date = datetime.now().strftime('%B %d, %Y')
         
-        # Build prompt with knowledge context
-        context_section = ""
+        # Static instructions and reused knowledge-base context go in the
+        # cacheable system prefix; per-request details go in the user turn
+        system_blocks = [cached_block(APPEAL_INSTRUCTIONS)]
         if knowledge_context:
-            context_section = f"""
-RELEVANT POLICY AND LEGAL INFORMATION:
+            system_blocks.append(cached_block(f"""RELEVANT POLICY AND LEGAL INFORMATION:
 {knowledge_context}
 
-Use the above information to strengthen the appeal with specific policy citations and legal rights.
-"""
+Use the above information to strengthen the appeal with specific policy citations and legal rights."""))
         
-        prompt = f"""You are an expert legal writer specializing in gig economy worker appeals.
-
-Generate a professional, persuasive appeal letter for a gig worker whose account has been deactivated.
-
-CURRENT DATE: {current_date}
+        prompt = f"""CURRENT DATE: {current_date}
 
 PLATFORM: {platform}
 DEACTIVATION REASON: {deactivation_reason}
@@ -141,38 +316,18 @@ WORKER'S CONTACT INFORMATION:
 - Phone: {user_phone}
 
 TONE: {account_details.get('appeal_tone', 'professional')}
-{context_section}
-Generate a complete appeal letter that:
-1. Is professionally formatted with proper business letter structure
-2. START with the actual date: {current_date}
-3. States the purpose clearly in the opening
-4. Highlights the worker's positive track record
-5. Addresses the deactivation reason respectfully
-6. Provides context from the worker's perspective
-7. References specific platform policies and state laws when applicable (from the provided context)
-8. Cites relevant legal protections and rights
-9. Requests specific information about the incident
-10. Asks for reinstatement with clear justification
-11. Maintains the requested tone
-12. ENDS with the worker's actual contact information (name, phone, email) instead of placeholders
 
-IMPORTANT FORMATTING:
-- Use PLAIN TEXT ONLY - no markdown, no asterisks, no special formatting
-- Do NOT use ** for bold or * for emphasis
-- Use proper spacing and line breaks for emphasis instead
-- Write in standard business letter format
-- Use the actual date provided above, not [Current Date] or any placeholder
-- When citing policies, reference them naturally (e.g., "Under California's AB5...")
-
-Make it persuasive but respectful.
-Use the actual worker's name, phone, and email in the signature - DO NOT use placeholders like [Your Name], [Your Phone], or [Your Email]."""
+Write the appeal letter now, starting with the date {current_date}."""
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=2048,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with span('claude.generate_appeal'):
+                response = self.client.messages.create(
+                    model=self.model,
+                    max_tokens=2048,
+                    system=system_blocks,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+            self._record_usage('generate_appeal', response)
             
             # Remove any remaining asterisks that might be used for emphasis
             letter = response.content[0].text
@@ -212,9 +367,18 @@ Sincerely,
 {user_email}
 {user_phone}"""
     
-    async def chat(self, message: str, conversation_history: List[Dict[str, str]] = None) -> Dict[str, Any]:
+    async def chat(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        conversation_id: str = None,
+        user_id: str = ""
+    ) -> Dict[str, Any]:
         """
-        Handle chatbot conversations about worker rights using RAG
+        Handle chatbot conversations about worker rights using RAG.
+        Long histories are compacted: recent turns verbatim, older ones summarized.
+        Summaries and merged context are cached per conversation_id, which
+        defaults to one derived from user_id and the first message.
         """
         from .knowledge_base import knowledge_base_service
         
@@ -249,44 +413,49 @@ Sincerely,
         # Get relevant context from knowledge base using RAG
         context = ""
         if platform or state or reason:
-            context = knowledge_base_service.get_relevant_context(
+            context = await knowledge_base_service.aget_relevant_context(
                 platform=platform or "",
                 state=state or "",
                 reason=reason or "",
-                top_k=3  # Get top 3 most relevant documents
+                top_k=3,  # Get top 3 most relevant documents
+                purpose='chat'
             )
         
-        system_prompt = f"""You are a helpful assistant specializing in gig economy worker rights, platform policies, and appeal processes. 
-
-You help workers understand:
-- Their rights under platform terms of service and state labor laws
-- How to appeal deactivations successfully
-- What documentation and evidence they should gather
-- Platform-specific policies (DoorDash, Uber, Lyft, Instacart, Amazon Flex)
-- State-specific labor laws and protections
-- Appeal deadlines and timelines
-
-Be supportive, informative, and action-oriented. Provide specific steps workers can take.
-
-IMPORTANT: Use the KNOWLEDGE BASE CONTEXT below to provide accurate, specific information about laws, policies, and procedures.
-
-{context}"""
-
-        # Build message history
-        messages = []
-        if conversation_history:
-            for msg in conversation_history:
-                messages.append({"role": msg["role"], "content": msg["content"]})
+        conversation_id = conversation_id or ChatHistoryManager.conversation_key(user_id, conversation_history or [], message)
+        
+        # Reuse KB sections already retrieved in this conversation (no repeats)
+        context = self.history_manager.merge_context(
+            conversation_id, context, token_budget=context_assembler.budget_for('chat')
+        )
+        
+        # Keep per-turn input bounded regardless of session length
+        # (summarizing calls Claude synchronously - keep it off the event loop)
+        messages, history_summary = await asyncio.to_thread(
+            self.history_manager.compact,
+            conversation_id,
+            conversation_history or [],
+            reserved_tokens=estimate_tokens(message)
+        )
         
+        # Static instructions first so they stay a cacheable prefix;
+        # the retrieved context is cached as a second breakpoint
+        system_blocks = [cached_block(CHAT_INSTRUCTIONS)]
+        if context:
+            system_blocks.append(cached_block(context))
+        if history_summary:
+            system_blocks.append({"type": "text", "text": f"SUMMARY OF EARLIER CONVERSATION:\n{history_summary}"})
+
         messages.append({"role": "user", "content": message})
         
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1500,  # Increased for more detailed responses
-                system=system_prompt,
-                messages=messages
-            )
+            with span('claude.chat'):
+                response = self.client.messages.create(
+                    model=self.model,
+                    max_tokens=1500,  # Increased for more detailed responses
+                    system=system_blocks,
+                    messages=messages
+                )
+            self._record_usage('chat', response)
             
             # Determine suggested actions based on user question
             suggested_actions = []
@@ -319,8 +488,10 @@ IMPORTANT: Use the KNOWLEDGE BASE CONTEXT below to provide accurate, specific in
             print(f"Error in chat with AI: {e}")
             return {
                 "response": "I'm here to help with your gig worker rights questions. Please try your question again.",
-                "suggested_actions": []
+                "suggested_actions": [],
+                "failed": True
             }
 
 # Create singleton instance
 ai_service = AIService()
+metrics.register_collector(ai_service.usage_metrics)
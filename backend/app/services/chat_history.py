@@ -0,0 +1,186 @@
+# backend/app/services/chat_history.py
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.core.telemetry import span
+
+SUMMARY_MODEL = "claude-3-5-haiku-20241022"
+CONTEXT_SEPARATOR = "\n---\n"
+SOURCE_HEADER = re.compile(r'^\[S\d+\] (.*)$')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate (~4 characters per token for English text).
+    Good enough for budgeting; exact counts come back in the API usage.
+    """
+    return len(text) // 4 + 1
+
+
+def _messages_hash(messages: List[Dict[str, str]]) -> str:
+    digest = hashlib.sha256()
+    for msg in messages:
+        digest.update(msg["role"].encode())
+        digest.update(b"\0")
+        digest.update(msg["content"].encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ChatHistoryManager:
+    def __init__(self, client):
+        """Keeps chat prompts bounded: recent turns verbatim, older turns summarized"""
+        self.client = client
+        self.keep_turns = int(os.getenv("CHAT_HISTORY_KEEP_TURNS", "4"))  # user+assistant pairs
+        self.token_budget = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+        self.max_context_sections = int(os.getenv("CHAT_MAX_CONTEXT_SECTIONS", "5"))
+        self.max_conversations = 1000
+
+        # conversation_id -> {'covered': n, 'hash': ..., 'summary': ...}
+        # (compact runs in worker threads, so summary cache updates take the lock)
+        self._summaries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._summaries_lock = threading.Lock()
+        # conversation_id -> OrderedDict(source title -> context section)
+        self._contexts: "OrderedDict[str, OrderedDict]" = OrderedDict()
+
+    @staticmethod
+    def conversation_key(user_id: str, history: List[Dict[str, str]], message: str) -> str:
+        """Stable id for a client-held conversation: user + its first user message"""
+        first = next((m["content"] for m in history if m["role"] == "user"), message)
+        return hashlib.sha256(f"{user_id}\0{first}".encode()).hexdigest()[:32]
+
+    def _touch(self, cache: OrderedDict, key: str) -> None:
+        cache.move_to_end(key)
+        while len(cache) > self.max_conversations:
+            cache.popitem(last=False)
+
+    def _summarize(self, previous_summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """Fold messages into the rolling summary with a small, cheap model"""
+        transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+        prior = f"Summary so far:\n{previous_summary}\n\n" if previous_summary else ""
+
+        with span('claude.summarize_history'):
+            response = self.client.messages.create(
+                model=SUMMARY_MODEL,
+                max_tokens=300,
+                messages=[{"role": "user", "content": f"""{prior}New messages:
+{transcript}
+
+Update the summary of this gig worker's conversation with a rights assistant. Keep facts that matter for later answers: platform, state, deactivation reason, dates, deadlines, and advice already given. Max 150 words, plain text."""}]
+            )
+        return response.content[0].text.strip()
+
+    def _rolling_summary(self, conversation_id: str, older: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Summary of all messages before the verbatim window.
+        Cached per conversation; only newly aged-out messages are summarized.
+        """
+        if not older:
+            return None
+
+        with self._summaries_lock:
+            cached = self._summaries.get(conversation_id)
+            if cached and cached['covered'] == len(older) and cached['hash'] == _messages_hash(older):
+                self._touch(self._summaries, conversation_id)
+                return cached['summary']
+
+        previous_summary, start = None, 0
+        if cached and cached['covered'] < len(older) and cached['hash'] == _messages_hash(older[:cached['covered']]):
+            previous_summary, start = cached['summary'], cached['covered']
+
+        try:
+            summary = self._summarize(previous_summary, older[start:])
+        except Exception as e:
+            print(f"⚠ Could not summarize chat history: {e}")
+            return previous_summary
+
+        with self._summaries_lock:
+            self._summaries[conversation_id] = {
+                'covered': len(older),
+                'hash': _messages_hash(older),
+                'summary': summary
+            }
+            self._touch(self._summaries, conversation_id)
+        return summary
+
+    def compact(
+        self,
+        conversation_id: str,
+        history: List[Dict[str, str]],
+        reserved_tokens: int = 0
+    ) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """
+        Split history into (recent messages sent verbatim, summary of the rest).
+        The verbatim window holds the last keep_turns turns and shrinks further
+        until it fits the token budget (minus reserved_tokens for the new message).
+        """
+        messages = [{"role": m["role"], "content": m["content"]} for m in history or []]
+
+        split = max(0, len(messages) - self.keep_turns * 2)
+        budget = self.token_budget - reserved_tokens
+        while split < len(messages) and sum(estimate_tokens(m["content"]) for m in messages[split:]) > budget:
+            split += 1
+
+        # The verbatim window must start with a user message
+        while split < len(messages) and messages[split]["role"] != "user":
+            split += 1
+
+        # Re-summarize in batches: while the messages after the cached summary
+        # still fit the budget, send them verbatim and reuse the summary as-is
+        with self._summaries_lock:
+            cached = self._summaries.get(conversation_id)
+        if cached and cached['covered'] < split and split - cached['covered'] < self.keep_turns * 2:
+            covered = cached['covered']
+            if (messages[covered]["role"] == "user"
+                    and cached['hash'] == _messages_hash(messages[:covered])
+                    and sum(estimate_tokens(m["content"]) for m in messages[covered:]) <= budget):
+                split = covered
+
+        older, recent = messages[:split], messages[split:]
+        return recent, self._rolling_summary(conversation_id, older)
+
+    def merge_context(self, conversation_id: str, context: str, token_budget: Optional[int] = None) -> str:
+        """
+        Combine this turn's knowledge-base context with sections already used
+        in the conversation, without repeating any article. Keeping the block
+        stable across turns also keeps it prompt-cacheable. Earlier sections
+        are dropped (oldest first) to stay within token_budget; this turn's
+        sections are already within it.
+        """
+        sections = self._contexts.setdefault(conversation_id, OrderedDict())
+
+        current = set()
+        for section in (context or "").split(CONTEXT_SEPARATOR):
+            section = section.strip()
+            if not section or section.startswith("No specific policy information"):
+                continue
+            header, _, body = section.partition("\n")
+            match = SOURCE_HEADER.match(header)
+            title = match.group(1) if match else header
+            current.add(title)
+            if title not in sections:
+                sections[title] = body
+
+        def merged_tokens() -> int:
+            # "[S#] " header prefix and separator per section
+            return sum(estimate_tokens(title + body) + 3 for title, body in sections.items())
+
+        for title in list(sections):
+            over_count = len(sections) > self.max_context_sections
+            over_budget = token_budget is not None and merged_tokens() > token_budget
+            if not over_count and not over_budget:
+                break
+            if title not in current or over_count:
+                del sections[title]
+        self._touch(self._contexts, conversation_id)
+
+        # Renumber sources so citations stay unique after merging turns
+        return CONTEXT_SEPARATOR.join(
+            f"[S{i}] {title}\n{body}"
+            for i, (title, body) in enumerate(sections.items(), 1)
+        )
@@ -0,0 +1,83 @@
+# backend/app/services/chat_sessions.py
+
+import asyncio
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any
+
+
+class ChatSessionStore:
+    def __init__(self):
+        """Server-side chat sessions: Firestore turn log + in-memory hot cache"""
+        self.max_cached_sessions = int(os.getenv("CHAT_SESSION_CACHE_SIZE", "500"))
+        # session_id -> {'userId': ..., 'turns': [{'role', 'content'}]}
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Locks exist only while a request holds or waits on them
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+
+    def _cache_put(self, session_id: str, session: Dict[str, Any]) -> None:
+        self._cache[session_id] = session
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.max_cached_sessions:
+            self._cache.popitem(last=False)
+
+    @asynccontextmanager
+    async def lock(self, session_id: str, user_id: str):
+        """
+        Per-session lock so concurrent messages append in order.
+        The session and its owner are checked before a lock is created, and
+        the lock is dropped once no request holds or waits on it, so unknown
+        or foreign session ids never leave entries behind.
+        """
+        await self.get_turns(session_id, user_id)
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        self._lock_users[session_id] = self._lock_users.get(session_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[session_id] -= 1
+            if not self._lock_users[session_id]:
+                del self._lock_users[session_id]
+                del self._locks[session_id]
+
+    async def create(self, user_id: str) -> str:
+        from app.core.firebase import create_chat_session
+
+        session_id = await create_chat_session(user_id)
+        self._cache_put(session_id, {'userId': user_id, 'turns': []})
+        return session_id
+
+    async def get_turns(self, session_id: str, user_id: str) -> List[Dict[str, str]]:
+        """Turn history for a session (hot cache first, then Firestore)"""
+        from app.core.firebase import get_chat_session_turns
+
+        session = self._cache.get(session_id)
+        if session is not None:
+            if session['userId'] != user_id:
+                raise ValueError("Unauthorized to access this chat session")
+            self._cache.move_to_end(session_id)
+            return session['turns']
+
+        turns = await get_chat_session_turns(session_id, user_id)
+        history = [{'role': t['role'], 'content': t['content']} for t in turns]
+        self._cache_put(session_id, {'userId': user_id, 'turns': history})
+        return history
+
+    async def append(self, session_id: str, user_id: str, turns: List[Dict[str, str]]) -> None:
+        """Append turns to the log (write-through to Firestore)"""
+        from app.core.firebase import append_chat_turns
+
+        history = await self.get_turns(session_id, user_id)
+        start_index = await append_chat_turns(session_id, turns)
+        if start_index != len(history):
+            # Another worker appended since this cache entry was loaded
+            self._cache.pop(session_id, None)
+            await self.get_turns(session_id, user_id)
+            return
+        history.extend({'role': t['role'], 'content': t['content']} for t in turns)
+
+# Create singleton instance
+chat_session_store = ChatSessionStore()
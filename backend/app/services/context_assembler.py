@@ -0,0 +1,155 @@
+# backend/app/services/context_assembler.py
+
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+from app.services.chat_history import estimate_tokens, CONTEXT_SEPARATOR
+
+NO_CONTEXT = "No specific policy information found."
+
+# Passages sharing this fraction of their word 5-grams with an already
+# selected passage are treated as duplicates (cross-state boilerplate etc.)
+MAX_SHINGLE_OVERLAP = 0.6
+SHINGLE_SIZE = 5
+
+# Below this many remaining tokens a passage isn't worth truncating to fit
+MIN_TRUNCATED_TOKENS = 60
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _compact(text: str) -> str:
+    """Drop indentation and blank-line runs - they cost tokens and carry nothing"""
+    lines = [line.strip() for line in text.strip().splitlines()]
+    return re.sub(r'\n{2,}', '\n', '\n'.join(lines))
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text at the last sentence (or line) end that fits max_tokens"""
+    limit = max_tokens * 4  # estimate_tokens is ~4 chars per token
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    end = max(cut.rfind('. '), cut.rfind('\n'))
+    return (cut[:end + 1] if end > limit // 2 else cut).rstrip() + " …"
+
+
+class ContextAssembler:
+    def __init__(self):
+        """Builds RAG context blocks from ranked passages under a token budget"""
+        self.budgets = {
+            'appeal': int(os.getenv("KB_CONTEXT_TOKENS_APPEAL", "1200")),
+            'chat': int(os.getenv("KB_CONTEXT_TOKENS_CHAT", "700")),
+        }
+
+    def budget_for(self, purpose: str) -> int:
+        return self.budgets.get(purpose, self.budgets['appeal'])
+
+    @staticmethod
+    def _score(passages: List[Dict[str, Any]], state: str, platform: str) -> List[Dict[str, Any]]:
+        """
+        Order passages by retrieval score (normalised to the best one), boosted
+        when the article is specific to the requested state/platform rather
+        than general ('All'), and damped for each extra passage of an article
+        so one long article doesn't crowd out the rest.
+        """
+        if not passages:
+            return []
+        best = max(p.get('relevance_score') or 0 for p in passages) or 1
+        state, platform = (state or '').lower(), (platform or '').lower()
+
+        scored, per_doc = [], {}
+        for rank, passage in enumerate(passages):
+            score = (passage.get('relevance_score') or 0) / best
+            score += 0.5 / (rank + 1)  # keep the retriever's ordering as a tie-breaker
+            if state and (passage.get('state') or '').lower() == state:
+                score += 0.3
+            if platform and platform in (passage.get('platform') or '').lower():
+                score += 0.2
+            score -= 0.15 * per_doc.get(passage['id'], 0)
+            per_doc[passage['id']] = per_doc.get(passage['id'], 0) + 1
+            scored.append((score, rank, passage))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [passage for _, _, passage in scored]
+
+    @staticmethod
+    def _article_header(index: int, passage: Dict[str, Any]) -> str:
+        """Compact citation marker plus one metadata line"""
+        platform = passage.get('platform') or 'All'
+        state = passage.get('state') or 'All'
+        meta = " · ".join([
+            passage.get('category') or 'General',
+            'All states' if state == 'All' else state,
+            'All platforms' if platform == 'All' else platform
+        ])
+        return f"[S{index}] {passage['title']}\n{meta}"
+
+    def assemble(
+        self,
+        passages: List[Dict[str, Any]],
+        purpose: str = 'appeal',
+        max_sources: int = 3,
+        state: str = '',
+        platform: str = '',
+        token_budget: Optional[int] = None
+    ) -> str:
+        """
+        Select, dedupe and trim passages to the call site's token budget.
+        Output has one [S#] block per article, passages in document order:
+
+            [S1] Article title
+            Category · State · Platform
+            § Section heading
+            passage text
+        """
+        budget = token_budget if token_budget is not None else self.budget_for(purpose)
+        selected: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        seen_shingles: List[set] = []
+        used = 0
+
+        for passage in self._score(passages, state, platform):
+            if passage['id'] not in selected and len(selected) >= max_sources:
+                continue
+
+            shingles = _shingles(passage['content'])
+            if shingles and any(len(shingles & other) / len(shingles) >= MAX_SHINGLE_OVERLAP for other in seen_shingles):
+                continue
+
+            header_cost = 0 if passage['id'] in selected else estimate_tokens(self._article_header(0, passage)) + 2
+            heading = f"§ {passage['heading']}\n" if passage.get('heading') else ""
+            text = _compact(passage['content'])
+            cost = header_cost + estimate_tokens(heading + text)
+
+            if used + cost > budget:
+                remaining = budget - used - header_cost - estimate_tokens(heading)
+                if remaining < MIN_TRUNCATED_TOKENS:
+                    continue
+                text = _truncate_to_tokens(text, remaining)
+                cost = header_cost + estimate_tokens(heading + text)
+
+            selected.setdefault(passage['id'], []).append({**passage, 'content': text})
+            seen_shingles.append(shingles)
+            used += cost
+
+        if not selected:
+            return NO_CONTEXT
+
+        blocks = []
+        for i, article_passages in enumerate(selected.values(), 1):
+            body = "\n".join(
+                (f"§ {p['heading']}\n" if p.get('heading') else "") + p['content']
+                for p in sorted(article_passages, key=lambda p: p.get('position', 0))
+            )
+            blocks.append(f"{self._article_header(i, article_passages[0])}\n{body}")
+        return CONTEXT_SEPARATOR.join(blocks)
+
+# Create singleton instance
+context_assembler = ContextAssembler()
@@ -0,0 +1,148 @@
+# backend/app/services/embedding_backend.py
+
+"""
+Embedding model loader for the knowledge base.
+KB_EMBEDDING_BACKEND selects the runtime for all-MiniLM-L6-v2:
+  torch      - the PyTorch model via sentence-transformers (default)
+  onnx       - exported ONNX graph on onnxruntime
+  onnx-int8  - dynamically int8-quantised ONNX graph (smallest / fastest on CPU)
+The ONNX backends run on onnxruntime + tokenizers alone, so a worker using
+them never imports torch. They must produce the same vectors as PyTorch,
+since documents in Pinecone may have been indexed with either; verify that
+offline with app.scripts.check_embedding_parity before switching.
+"""
+
+import os
+from typing import Dict, List, Any, Optional, Union
+
+import numpy as np
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+MODEL_REPO = f'sentence-transformers/{MODEL_NAME}'
+EMBEDDING_DIM = 384
+MAX_SEQ_LENGTH = 256  # Same truncation as the sentence-transformers model
+
+# Pre-exported files published in the model repo
+ONNX_MODEL_FILES = {
+    'onnx': 'onnx/model.onnx',
+    'onnx-int8': 'onnx/model_quint8_avx2.onnx',
+}
+
+# Minimum cosine similarity to the PyTorch embedding for every parity text
+MIN_PARITY_COSINE = {
+    'onnx': 0.9999,
+    'onnx-int8': 0.98,
+}
+
+PARITY_TEXTS = [
+    "DoorDash deactivation appeal rights policy",
+    "California Prop 22 protections for app-based drivers",
+    "Uber fraud deactivation appeal",
+    "My rating dropped below 4.6 and my account was deactivated without warning",
+    "Seattle deactivation rights ordinance requires written notice and an appeal process",
+    "background check",
+]
+
+
+class OnnxEncoder:
+    def __init__(self, model_file: str):
+        """
+        all-MiniLM-L6-v2 on onnxruntime with the model repo's tokenizer.json:
+        mean pooling over the attention mask, then L2 normalisation - the
+        same pipeline as the sentence-transformers model.
+        """
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(MODEL_REPO, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token='[PAD]')  # Pad to the longest text in a batch
+
+        self.session = onnxruntime.InferenceSession(
+            hf_hub_download(MODEL_REPO, model_file), providers=['CPUExecutionProvider']
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+        output_names = [output.name for output in self.session.get_outputs()]
+        self._output_name = 'last_hidden_state' if 'last_hidden_state' in output_names else output_names[0]
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Same call shape as SentenceTransformer.encode (embeddings are always normalised)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        batches = []
+        for i in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[i:i + batch_size])
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feed = {
+                'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+                'attention_mask': attention_mask
+            }
+            if 'token_type_ids' in self._input_names:
+                feed['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            hidden = self.session.run([self._output_name], feed)[0]
+            mask = attention_mask[..., None].astype(hidden.dtype)
+            batches.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def _load_torch_encoder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME)
+
+
+def load_encoder(backend: Optional[str] = None):
+    """
+    Load the embedding model for the configured backend.
+    Falls back to PyTorch if onnxruntime/tokenizers aren't installed or the
+    ONNX file can't be fetched.
+    """
+    backend = (backend or os.getenv("KB_EMBEDDING_BACKEND", "torch")).lower()
+    if backend == 'torch':
+        return _load_torch_encoder()
+    if backend not in ONNX_MODEL_FILES:
+        print(f"⚠ Unknown KB_EMBEDDING_BACKEND '{backend}', using torch")
+        return _load_torch_encoder()
+
+    try:
+        encoder = OnnxEncoder(os.getenv("KB_ONNX_MODEL_FILE", ONNX_MODEL_FILES[backend]))
+    except Exception as e:
+        # onnxruntime not installed or file not available
+        print(f"⚠ Could not load {backend} embedding backend ({e}), using torch")
+        return _load_torch_encoder()
+
+    print(f"✓ Using {backend} embedding backend")
+    return encoder
+
+
+def check_parity(
+    encoder,
+    reference,
+    backend: str = 'onnx',
+    texts: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Compare an encoder's embeddings with the reference (PyTorch) model's.
+    Returns min/mean cosine similarity, max absolute difference and
+    whether every text met the backend's threshold.
+    """
+    texts = texts or PARITY_TEXTS
+
+    expected = reference.encode(texts, normalize_embeddings=True)
+    actual = encoder.encode(texts, normalize_embeddings=True)
+    cosines = np.sum(expected * actual, axis=1)
+
+    min_cosine = float(cosines.min())
+    return {
+        'backend': backend,
+        'texts': len(texts),
+        'minCosine': round(min_cosine, 6),
+        'meanCosine': round(float(cosines.mean()), 6),
+        'maxAbsDiff': round(float(np.abs(expected - actual).max()), 6),
+        'passed': min_cosine >= MIN_PARITY_COSINE.get(backend, 0.99)
+    }
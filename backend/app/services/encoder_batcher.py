@@ -0,0 +1,150 @@
+# backend/app/services/encoder_batcher.py
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Any
+
+# Number of recent batches kept for the latency/size percentiles
+METRICS_WINDOW = 1000
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class EncoderBatcher:
+    def __init__(self, encode_batch: Callable[[List[str]], List[List[float]]]):
+        """
+        Micro-batches single-text encode requests.
+        Texts submitted within max_wait_ms of the first queued text are
+        encoded together in one call (up to max_batch), and each caller
+        gets its own future.
+        """
+        self.encode_batch = encode_batch
+        self.max_batch = int(os.getenv("KB_ENCODER_MAX_BATCH", "32"))
+        self.max_wait = float(os.getenv("KB_ENCODER_MAX_WAIT_MS", "5")) / 1000
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+
+        self._batch_sizes = deque(maxlen=METRICS_WINDOW)
+        self._queue_latencies = deque(maxlen=METRICS_WINDOW)  # seconds, per request
+        self._encode_times = deque(maxlen=METRICS_WINDOW)  # seconds, per batch
+        self.total_batches = 0
+        self.total_texts = 0
+
+    def _ensure_started(self) -> None:
+        """Start the worker thread on first use"""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="kb-encoder", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for encoding; the future resolves to its vector"""
+        if self._stopped:
+            raise RuntimeError("Encoder batcher is shut down")
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future, time.monotonic()))
+        return future
+
+    def _collect(self) -> list:
+        """Block for the first request, then gather more until the batch is full or max_wait passes"""
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped = True
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopped:
+            batch = self._collect()
+            if not batch:
+                break
+
+            started = time.monotonic()
+            batch = [(text, future, queued_at) for text, future, queued_at in batch
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                vectors = self.encode_batch([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            finished = time.monotonic()
+            for (_, future, queued_at), vector in zip(batch, vectors):
+                self._queue_latencies.append(started - queued_at)
+                future.set_result(vector)
+
+            self._batch_sizes.append(len(batch))
+            self._encode_times.append(finished - started)
+            self.total_batches += 1
+            self.total_texts += len(batch)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Batch-size and queue-latency stats over recent batches"""
+        sizes = list(self._batch_sizes)
+        latencies = list(self._queue_latencies)
+        encode_times = list(self._encode_times)
+        return {
+            'totalBatches': self.total_batches,
+            'totalTexts': self.total_texts,
+            'queueDepth': self._queue.qsize(),
+            'maxBatch': self.max_batch,
+            'maxWaitMs': self.max_wait * 1000,
+            'batchSize': {
+                'avg': round(sum(sizes) / len(sizes), 2) if sizes else 0,
+                'p50': _percentile(sizes, 50),
+                'max': max(sizes) if sizes else 0
+            },
+            'queueLatencyMs': {
+                'p50': round(_percentile(latencies, 50) * 1000, 2),
+                'p95': round(_percentile(latencies, 95) * 1000, 2),
+                'p99': round(_percentile(latencies, 99) * 1000, 2)
+            },
+            'encodeMs': {
+                'p50': round(_percentile(encode_times, 50) * 1000, 2),
+                'p95': round(_percentile(encode_times, 95) * 1000, 2)
+            }
+        }
+
+    def shutdown(self) -> None:
+        """Stop the worker thread; queued requests are cancelled"""
+        self._stopped = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].cancel()
+        self._queue.put(None)  # Wake the worker so it exits
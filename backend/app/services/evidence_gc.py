@@ -0,0 +1,276 @@
+# backend/app/services/evidence_gc.py
+
+import asyncio
+import os
+import random
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any
+
+PREVIEW_SUFFIXES = ('.thumbnail.jpg', '.preview.jpg')
+DELETE_BATCH_SIZE = 100  # Max operations per Storage batch request
+
+
+class EvidenceGarbageCollector:
+    def __init__(self):
+        """Sweeper for temporary evidence uploads (evidence/{uid}/temp_*/)"""
+        self.interval_hours = float(os.getenv("EVIDENCE_GC_INTERVAL_HOURS", "6"))
+        self.max_age_hours = float(os.getenv("EVIDENCE_GC_MAX_AGE_HOURS", "24"))
+        self.page_size = int(os.getenv("EVIDENCE_GC_PAGE_SIZE", "500"))
+        self.startup_delay = float(os.getenv("EVIDENCE_GC_STARTUP_DELAY_SECONDS", "300"))
+        # Lease holder id: one per worker process
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.last_report = None
+
+    def _list_prefixes(self, prefix: str) -> List[str]:
+        """List 'sub-directories' directly under a prefix, page by page"""
+        from app.core.firebase import bucket
+
+        iterator = bucket.list_blobs(prefix=prefix, delimiter='/', page_size=self.page_size)
+        prefixes = []
+        for page in iterator.pages:
+            prefixes.extend(page.prefixes)
+        return prefixes
+
+    def _temp_prefixes(self):
+        """Yield (user_id, prefix) for every temp upload folder"""
+        for user_prefix in self._list_prefixes('evidence/'):
+            user_id = user_prefix.split('/')[1]
+            for case_prefix in self._list_prefixes(user_prefix):
+                if case_prefix.split('/')[2].startswith('temp_'):
+                    yield user_id, case_prefix
+
+    def _group_blobs(self, prefix: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Group a temp folder's blobs by original file:
+        base -> {'original': blob or None, 'previews': [blobs]}
+        """
+        from app.core.firebase import bucket
+
+        groups = {}
+        for page in bucket.list_blobs(prefix=prefix, page_size=self.page_size).pages:
+            for blob in page:
+                preview_suffix = next((sfx for sfx in PREVIEW_SUFFIXES if blob.name.endswith(sfx)), None)
+                if preview_suffix:
+                    base = blob.name[:-len(preview_suffix)]
+                    groups.setdefault(base, {'original': None, 'previews': []})['previews'].append(blob)
+                else:
+                    base = blob.name.rsplit('.', 1)[0]
+                    groups.setdefault(base, {'original': None, 'previews': []})['original'] = blob
+        return groups
+
+    def _promote(self, user_id: str, original, previews: list, references: list) -> list:
+        """
+        Move a temp file that was later attached to a case into that case's
+        folder and repoint every record that references it.
+        Returns the temp blobs that can now be deleted.
+        """
+        from app.core.firebase import bucket, db, invalidate_evidence_download_url
+
+        case_id = references[0].to_dict()['caseId']
+        filename = original.name.rsplit('/', 1)[1]
+        new_path = f"evidence/{user_id}/{case_id}/{filename}"
+        bucket.copy_blob(original, bucket, new_path)
+
+        moved = {'storagePath': (original.name, new_path)}
+        for preview in previews:
+            preview_path = f"evidence/{user_id}/{case_id}/{preview.name.rsplit('/', 1)[1]}"
+            bucket.copy_blob(preview, bucket, preview_path)
+            key = 'thumbnailPath' if preview.name.endswith('.thumbnail.jpg') else 'previewPath'
+            moved[key] = (preview.name, preview_path)
+
+        for ref in references:
+            data = ref.to_dict()
+            updates = {key: new for key, (old, new) in moved.items() if data.get(key) == old}
+            if updates:
+                ref.reference.update(updates)
+
+        # Deduplicated content: point the content index at the new copy too,
+        # and drop the reference held by the temp upload itself
+        content_docs = db.collection('evidence_content') \
+            .where('userId', '==', user_id) \
+            .where('storagePath', '==', original.name) \
+            .stream()
+        for content_doc in content_docs:
+            ref_count = sum(1 for _ in db.collection('evidence')
+                            .where('userId', '==', user_id)
+                            .where('contentHash', '==', content_doc.to_dict().get('contentHash'))
+                            .stream())
+            content_doc.reference.update({
+                **{key: new for key, (old, new) in moved.items()},
+                'refCount': max(ref_count, 1)
+            })
+
+        for old, _ in moved.values():
+            invalidate_evidence_download_url(old)
+
+        return [original, *previews]
+
+    def _release_orphan_content(self, user_id: str, storage_path: str) -> bool:
+        """
+        Drop the content index entry for a temp file nothing references.
+        The refCount is re-read in a transaction, so a duplicate upload that
+        took a reference since the sweep looked keeps the entry.
+        Returns False if the file is referenced again and must be kept.
+        """
+        from app.core.firebase import db, firestore
+
+        @firestore.transactional
+        def release(transaction, index_ref):
+            snapshot = index_ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.to_dict().get('storagePath') != storage_path:
+                return True
+            # The temp upload holds the reference it was indexed with
+            if snapshot.to_dict().get('refCount', 1) > 1:
+                return False
+            transaction.delete(index_ref)
+            return True
+
+        content_docs = db.collection('evidence_content') \
+            .where('userId', '==', user_id) \
+            .where('storagePath', '==', storage_path) \
+            .stream()
+        released = True
+        for content_doc in content_docs:
+            released = release(db.transaction(), content_doc.reference) and released
+        return released
+
+    def _delete_blobs(self, blobs: list) -> int:
+        """
+        Delete blobs in batched Storage requests.
+        Returns the number of blobs that could not be deleted.
+        """
+        from google.api_core.exceptions import NotFound
+        from app.core.firebase import bucket
+
+        failed = 0
+        for i in range(0, len(blobs), DELETE_BATCH_SIZE):
+            chunk = blobs[i:i + DELETE_BATCH_SIZE]
+            try:
+                with bucket.client.batch():
+                    for blob in chunk:
+                        blob.delete()
+            except Exception:
+                # One failed sub-request fails the whole batch - retry blob by blob
+                for blob in chunk:
+                    try:
+                        blob.delete()
+                    except NotFound:
+                        pass  # Already gone
+                    except Exception as e:
+                        failed += 1
+                        print(f"❌ Evidence GC could not delete {blob.name}: {e}")
+        return failed
+
+    def sweep(self, max_age_hours: float = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Sweep all temp evidence folders once (blocking).
+        - Files referenced by an evidence record are promoted into the case folder
+        - Unreferenced files older than max_age_hours are deleted
+        Returns a report with counts and bytes reclaimed.
+        """
+        from app.core.firebase import db
+
+        max_age = timedelta(hours=max_age_hours if max_age_hours is not None else self.max_age_hours)
+        cutoff = datetime.now(timezone.utc) - max_age
+        started = datetime.now(timezone.utc)
+
+        report = {
+            'foldersScanned': 0,
+            'filesScanned': 0,
+            'promoted': 0,
+            'deleted': 0,
+            'bytesReclaimed': 0,
+            'errors': 0,
+            'dryRun': dry_run
+        }
+
+        to_delete = []
+        for user_id, prefix in self._temp_prefixes():
+            report['foldersScanned'] += 1
+
+            for base, group in self._group_blobs(prefix).items():
+                original, previews = group['original'], group['previews']
+                blobs = [b for b in [original, *previews] if b is not None]
+                report['filesScanned'] += len(blobs)
+
+                try:
+                    references = []
+                    if original is not None:
+                        references = list(
+                            db.collection('evidence')
+                            .where('userId', '==', user_id)
+                            .where('storagePath', '==', original.name)
+                            .stream()
+                        )
+
+                    if references:
+                        report['promoted'] += 1
+                        if not dry_run:
+                            to_delete.extend(self._promote(user_id, original, previews, references))
+                        continue
+
+                    newest = max(b.time_created for b in blobs)
+                    if newest > cutoff:
+                        continue
+
+                    if not dry_run and original is not None \
+                            and not self._release_orphan_content(user_id, original.name):
+                        print(f"⚠ Evidence GC: {base} was reused by a new upload, kept")
+                        continue
+
+                    report['deleted'] += len(blobs)
+                    report['bytesReclaimed'] += sum(b.size or 0 for b in blobs)
+                    if not dry_run:
+                        to_delete.extend(blobs)
+
+                except Exception as e:
+                    report['errors'] += 1
+                    print(f"❌ Evidence GC error for {base}: {e}")
+
+            # Flush deletes in batches as we go to keep memory bounded
+            if len(to_delete) >= DELETE_BATCH_SIZE:
+                report['errors'] += self._delete_blobs(to_delete)
+                to_delete = []
+
+        if to_delete:
+            report['errors'] += self._delete_blobs(to_delete)
+
+        report['durationSeconds'] = round((datetime.now(timezone.utc) - started).total_seconds(), 2)
+        report['finishedAt'] = datetime.utcnow().isoformat()
+        self.last_report = report
+
+        print(
+            f"✓ Evidence GC: {report['promoted']} promoted, {report['deleted']} deleted, "
+            f"{report['bytesReclaimed']} bytes reclaimed{' (dry run)' if dry_run else ''}"
+        )
+        return report
+
+    async def run_periodically(self) -> None:
+        """
+        Run the sweeper every EVIDENCE_GC_INTERVAL_HOURS (0 disables it).
+        Every worker runs this loop; a Firestore lease held for one interval
+        makes sure only one of them sweeps.
+        """
+        from app.core.firebase import acquire_lease
+
+        if self.interval_hours <= 0:
+            print("⚠ Evidence GC disabled (EVIDENCE_GC_INTERVAL_HOURS=0)")
+            return
+
+        # Workers start together - spread their first attempts out
+        await asyncio.sleep(self.startup_delay + random.uniform(0, self.startup_delay))
+
+        while True:
+            try:
+                # Storage/Firestore SDK calls block - run the sweep in a thread
+                if await asyncio.to_thread(acquire_lease, 'evidence_gc', self.worker_id, self.interval_hours * 3600):
+                    await asyncio.to_thread(self.sweep)
+                else:
+                    print("✓ Evidence GC: another worker holds the sweep lease, skipping")
+            except Exception as e:
+                print(f"❌ Evidence GC failed: {e}")
+            await asyncio.sleep(self.interval_hours * 3600)
+
+# Create singleton instance
+evidence_gc = EvidenceGarbageCollector()
@@ -0,0 +1,118 @@
+# backend/app/services/evidence_previews.py
+
+import asyncio
+import io
+from typing import Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow not installed - image thumbnails disabled
+    Image = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # PyMuPDF not installed - PDF previews disabled
+    fitz = None
+
+
+class EvidencePreviewService:
+    def __init__(self):
+        """Generate small JPEG thumbnails/previews for evidence files"""
+        self.thumbnail_size = (320, 320)
+        self.preview_width = 800
+        self.jpeg_quality = 70
+
+        if Image is None:
+            print("⚠ Pillow not installed - evidence thumbnails disabled")
+        if fitz is None:
+            print("⚠ PyMuPDF not installed - PDF previews disabled")
+
+    def _image_thumbnail(self, file_bytes: bytes) -> bytes:
+        """Downscale an image to a compressed JPEG thumbnail"""
+        with Image.open(io.BytesIO(file_bytes)) as img:
+            img.draft('RGB', self.thumbnail_size)  # Fast JPEG decode at reduced size
+            img = img.convert('RGB')
+            img.thumbnail(self.thumbnail_size)
+
+            output = io.BytesIO()
+            img.save(output, format='JPEG', quality=self.jpeg_quality, optimize=True)
+            return output.getvalue()
+
+    def _pdf_preview(self, file_bytes: bytes) -> bytes:
+        """Render the first page of a PDF to a compressed JPEG"""
+        with fitz.open(stream=file_bytes, filetype='pdf') as pdf:
+            page = pdf[0]
+            zoom = self.preview_width / page.rect.width
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+
+        if Image is None:
+            return pixmap.tobytes('jpeg')
+
+        img = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=self.jpeg_quality, optimize=True)
+        return output.getvalue()
+
+    def render(self, file_bytes: bytes, content_type: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Render a thumbnail (images) or first-page preview (PDFs).
+        Returns (kind, jpeg_bytes) where kind is 'thumbnail' or 'preview',
+        or None if the file type isn't supported in this environment.
+        """
+        if content_type.startswith('image/') and Image is not None:
+            return 'thumbnail', self._image_thumbnail(file_bytes)
+        if content_type == 'application/pdf' and fitz is not None:
+            return 'preview', self._pdf_preview(file_bytes)
+        return None
+
+    async def process_upload(
+        self,
+        storage_path: str,
+        user_id: str,
+        content_type: str,
+        file_bytes: bytes = None,
+        evidence_id: str = None,
+        content_hash: str = None
+    ) -> Optional[str]:
+        """
+        Background job run after an evidence upload.
+        Stores the rendered JPEG next to the original and records its path
+        in the evidence metadata. Returns the preview storage path.
+        """
+        from app.core.firebase import (
+            download_evidence_file,
+            upload_evidence_preview,
+            update_evidence_metadata,
+            update_content_index
+        )
+
+        try:
+            if file_bytes is None:
+                file_bytes = await download_evidence_file(storage_path, user_id)
+
+            # Decoding/rendering is CPU-bound - keep it off the event loop
+            rendered = await asyncio.to_thread(self.render, file_bytes, content_type)
+            if rendered is None:
+                return None
+
+            kind, jpeg_bytes = rendered
+            preview_path = await upload_evidence_preview(jpeg_bytes, storage_path, user_id, kind)
+
+            if evidence_id:
+                await update_evidence_metadata(evidence_id, user_id, {
+                    f'{kind}Path': preview_path,
+                    f'{kind}Size': len(jpeg_bytes)
+                })
+
+            # Later duplicates of the same bytes reuse this preview
+            if content_hash:
+                await update_content_index(user_id, content_hash, {f'{kind}Path': preview_path})
+
+            return preview_path
+
+        except Exception as e:
+            print(f"❌ Error generating evidence preview for {storage_path}: {e}")
+            return None
+
+# Create singleton instance
+evidence_preview_service = EvidencePreviewService()
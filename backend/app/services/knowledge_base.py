@@ -1,23 +1,158 @@
 # backend/app/services/knowledge_base.py
 
+import asyncio
+import hashlib
+import json
 import os
-from typing import List, Dict, Any, Optional
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Tuple
 from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
+from app.services.embedding_backend import load_encoder
+from app.services.encoder_batcher import EncoderBatcher
+from app.services.passages import split_passages
+from app.services.context_assembler import context_assembler
+from app.core.telemetry import counter_lines, metrics, span
+
+# Filterable document fields
+FACETS = ('category', 'state', 'platform')
+# Facet -> key in the catalog endpoints' JSON
+FACET_CATALOG_KEYS = {'category': 'categories', 'state': 'states', 'platform': 'platforms'}
+
+# Largest id list sent as a Pinecone filter; bigger matches over-fetch instead
+PINECONE_ID_FILTER_MAX = 1000
+
+# Passage vectors (one per article section) live in their own namespace
+PASSAGE_NAMESPACE = "passages"
+UPSERT_BATCH_SIZE = 100
+
+# Passages retrieved per cited article when building RAG context; the
+# assembler then picks what fits the call site's token budget
+CONTEXT_PASSAGES_PER_SOURCE = 3
+
+# Hybrid retrieval: candidates taken from each engine, reciprocal-rank
+# fusion constant, and how many fused candidates the cross-encoder re-scores
+HYBRID_CANDIDATES = 30
+RRF_K = 60
+RERANK_CANDIDATES = 20
+
+# Article search takes one passage per article from each engine, this many
+# articles deep, so every page of /search comes from the same fused list
+HYBRID_ARTICLE_CANDIDATES = 100
+
+# Fused lists that missed the rerank (timeout, busy or failed) are only
+# cached briefly, so a later request can still get the reranked order
+UNRERANKED_CACHE_TTL = 30
+
+# Canonical reason terms added to RAG queries (keyword pattern -> term);
+# keywords match whole words, so 'star' doesn't fire on "started"
+REASON_TERMS = {
+    'safety': 'safety',
+    'unsafe': 'safety',
+    r'accidents?': 'safety',
+    r'incidents?': 'safety',
+    r'fraud(?:ulent)?': 'fraud',
+    'theft': 'fraud',
+    'stolen': 'fraud',
+    'not delivered': 'fraud',
+    'undelivered': 'fraud',
+    r'incomplete deliver(?:y|ies)': 'fraud',
+    'background': 'background check',
+    'criminal': 'background check',
+    'completion': 'completion rate',
+    r'cancel(?:s|led|ed|ing|lations?)?': 'completion rate',
+    'acceptance': 'completion rate',
+    r'ratings?': 'rating',
+    r'(?:customer|negative|bad|poor) reviews?': 'rating',
+    'satisfaction': 'rating',
+    r'stars?': 'rating',
+    r'polic(?:y|ies)': 'policy violation',
+    r'violations?': 'policy violation',
+}
+
+REASON_TERM_PATTERNS = [(re.compile(rf'\b(?:{keyword})\b'), term) for keyword, term in REASON_TERMS.items()]
+
+# Words of the worker's reason text added to the RAG query (not to the
+# cache key), and of an unrecognised reason kept as its cache key
+REASON_QUERY_WORDS = 24
+REASON_KEY_WORDS = 6
+
+# Knowledge base edits reach Pinecone from one worker: whoever holds this
+# Firestore lease (taken when a change arrives) writes the vectors
+VECTOR_SYNC_LEASE = 'knowledge_base_vectors'
+VECTOR_SYNC_LEASE_SECONDS = 300
 
 class KnowledgeBaseService:
-    def __init__(self):
-        """Initialize knowledge base with Pinecone vector database"""
-        self.documents = self._load_documents()
-        self.use_pinecone = bool(os.getenv("PINECONE_API_KEY"))
+    def __init__(
+        self,
+        documents: Optional[List[Dict[str, Any]]] = None,
+        index: Optional[Any] = None,
+        encoder: Optional[Any] = None
+    ):
+        """
+        Initialize knowledge base with Pinecone vector database.
+        Offline use (benchmarks) can pass a fixed document list and a
+        Pinecone-compatible index instead of Firestore and Pinecone.
+        """
+        self.documents = documents if documents is not None else self._load_documents()
+        # Serialises index writers (the Firestore listener); readers never lock
+        self._index_lock = threading.Lock()
+        self._build_search_index()
         
-        if self.use_pinecone:
+        # Memoised RAG context: normalised (platform, state, reason, top_k, purpose) -> text
+        self.context_cache_size = int(os.getenv("KB_CONTEXT_CACHE_SIZE", "512"))
+        self.context_cache_ttl = float(os.getenv("KB_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+        self._context_cache: "OrderedDict[Tuple, Tuple[float, str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Bumped by invalidate_caches; results computed under an older
+        # generation are not cached
+        self._cache_generation = 0
+        self.context_cache_hits = 0
+        self.context_cache_misses = 0
+        
+        # Query embeddings: normalised query text -> vector. Misses are
+        # micro-batched into one encode call off the event loop, and identical
+        # in-flight queries share one future.
+        self.embedding_cache_size = int(os.getenv("KB_EMBEDDING_CACHE_SIZE", "2048"))
+        self._embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._pending_embeddings: Dict[str, Future] = {}
+        self._embedding_lock = threading.Lock()
+        self.encoder_batcher = EncoderBatcher(self._encode_batch)
+        self.embedding_stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+        
+        # Hybrid retrieval (keyword + vector fused with RRF, optional cross-encoder rerank)
+        self.retrieval_mode = os.getenv("KB_RETRIEVAL_MODE", "hybrid").lower()
+        self.reranker_model = os.getenv("KB_RERANKER_MODEL", "")
+        self.rerank_budget = float(os.getenv("KB_RERANK_BUDGET_MS", "150")) / 1000
+        self._reranker = None
+        self._rerank_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-rerank")
+        self._rerank_future = None
+        self._fused_cache: "OrderedDict[Tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self.rerank_stats = {'reranked': 0, 'timeouts': 0, 'skipped': 0}
+        # Retrieval runs on request threads and the event loop at once
+        self._stats_lock = threading.Lock()
+        if self.reranker_model:
+            # Load the cross-encoder up front; until it's ready requests skip the rerank
+            self._rerank_future = self._rerank_executor.submit(self._load_reranker)
+        
+        self.use_pinecone = index is not None or bool(os.getenv("PINECONE_API_KEY"))
+        
+        if index is not None:
+            self.index = index
+            self.encoder = encoder or load_encoder()
+            self._index_documents()
+            print("✓ Vector search enabled (supplied index)")
+        elif self.use_pinecone:
             # Initialize Pinecone
             self.pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
             self.index_name = "gigshield-knowledge"
             
-            # Initialize embedding model
-            self.encoder = SentenceTransformer('all-MiniLM-L6-v2')  # 384 dimensions
+            # Initialize embedding model (torch or ONNX, see KB_EMBEDDING_BACKEND)
+            self.encoder = load_encoder()  # all-MiniLM-L6-v2, 384 dimensions
             
             # Create or connect to index
             self._setup_index()
@@ -28,6 +163,14 @@ class KnowledgeBaseService:
             print("✓ Pinecone vector search enabled")
         else:
             print("⚠ Pinecone not configured - using keyword search fallback")
+        
+        # Apply knowledge_base edits live (and invalidate caches) without a restart
+        self._watch = None
+        if documents is None and os.getenv("KB_WATCH_CHANGES", "true").lower() == "true":
+            try:
+                self._watch_documents()
+            except Exception as e:
+                print(f"⚠ Could not watch knowledge base changes: {e}")
     
     def _setup_index(self):
         """Create Pinecone index if it doesn't exist"""
@@ -58,51 +201,83 @@ class KnowledgeBaseService:
     def _index_documents(self):
         """Index documents into Pinecone with embeddings"""
         try:
-            # Check if documents are already indexed
+            # Check if passages are already indexed
             stats = self.index.describe_index_stats()
-            if stats.total_vector_count >= len(self.documents):
-                print(f"✓ Documents already indexed ({stats.total_vector_count} vectors)")
+            namespace = (stats.namespaces or {}).get(PASSAGE_NAMESPACE)
+            indexed = namespace.vector_count if namespace else 0
+            passage_count = len(self._facet_index['passages'])
+            if indexed >= passage_count:
+                print(f"✓ Documents already indexed ({indexed} passage vectors)")
                 return
             
-            print(f"Indexing {len(self.documents)} documents...")
-            
-            vectors = []
-            for doc in self.documents:
-                # Create text to embed (combine title and content)
-                text = f"{doc['title']}. {doc['content']}"
-                
-                # Generate embedding
-                embedding = self.encoder.encode(text).tolist()
-                
-                # Prepare metadata (filter out None values - Pinecone doesn't accept null)
-                metadata = {
-                    'id': doc['id'],
-                    'title': doc['title'],
-                    'category': doc['category'],
-                    'content_preview': doc['content'][:500],  # First 500 chars
-                    'tags': ','.join(doc['tags'])
-                }
-                
-                # Add optional fields only if they have values
-                if doc['state']:
-                    metadata['state'] = doc['state']
-                if doc['platform']:
-                    metadata['platform'] = doc['platform']
-                
-                vectors.append({
-                    'id': doc['id'],
-                    'values': embedding,
-                    'metadata': metadata
-                })
-            
-            # Upsert vectors in batches
-            self.index.upsert(vectors=vectors)
-            print(f"✓ Indexed {len(vectors)} documents to Pinecone")
+            print(f"Indexing {len(self.documents)} documents ({passage_count} passages)...")
+            self._upsert_vectors(self.documents)
+            print(f"✓ Indexed {passage_count} passages to Pinecone")
             
         except Exception as e:
             print(f"❌ Error indexing documents: {e}")
             self.use_pinecone = False
         
+    def _upsert_vectors(self, documents: List[Dict[str, Any]]) -> None:
+        """Embed documents passage by passage and upsert them into Pinecone"""
+        passages = [(doc, passage) for doc in documents for passage in split_passages(doc)]
+        
+        # Create text to embed (title, section heading and passage), encoded in one batch
+        texts = [
+            f"{doc['title']}. {passage['heading']}. {passage['text']}" if passage['heading']
+            else f"{doc['title']}. {passage['text']}"
+            for doc, passage in passages
+        ]
+        embeddings = self.encoder.encode(texts).tolist()
+        
+        vectors = []
+        for (doc, passage), embedding in zip(passages, embeddings):
+            # Prepare metadata (filter out None values - Pinecone doesn't accept null)
+            metadata = {
+                'id': passage['id'],
+                'doc_id': doc['id'],
+                'title': doc['title'],
+                'heading': passage['heading'],
+                'category': doc['category'],
+                'content_preview': passage['text'][:500],  # First 500 chars
+                'tags': ','.join(doc['tags'])
+            }
+            
+            # Add optional fields only if they have values
+            if doc['state']:
+                metadata['state'] = doc['state']
+            if doc['platform']:
+                metadata['platform'] = doc['platform']
+            
+            vectors.append({
+                'id': passage['id'],
+                'values': embedding,
+                'metadata': metadata
+            })
+        
+        # Upsert vectors in batches
+        for i in range(0, len(vectors), UPSERT_BATCH_SIZE):
+            with span('pinecone.upsert'):
+                self.index.upsert(vectors=vectors[i:i + UPSERT_BATCH_SIZE], namespace=PASSAGE_NAMESPACE)
+    
+    @staticmethod
+    def _document_from_firestore(doc) -> Dict[str, Any]:
+        """Convert a Firestore knowledge_base snapshot to the expected format"""
+        return KnowledgeBaseService._normalize_document(doc.to_dict(), doc.id)
+    
+    @staticmethod
+    def _normalize_document(data: Dict[str, Any], doc_id: str = '') -> Dict[str, Any]:
+        """Fill in defaults for an article dict (as stored by the migration scripts)"""
+        return {
+            'id': data.get('id', doc_id),
+            'title': data.get('title', ''),
+            'category': data.get('category', ''),
+            'state': data.get('state') or 'All',
+            'platform': data.get('platform') or 'All',
+            'content': data.get('content', ''),
+            'tags': data.get('tags') or []
+        }
+    
     def _load_documents(self) -> List[Dict[str, Any]]:
         """Load knowledge base documents from Firestore"""
         from app.core.firebase import db
@@ -113,17 +288,7 @@ class KnowledgeBaseService:
             documents = []
             
             for doc in docs_ref:
-                data = doc.to_dict()
-                # Convert to expected format
-                documents.append({
-                    'id': data.get('id', doc.id),
-                    'title': data.get('title', ''),
-                    'category': data.get('category', ''),
-                    'state': data.get('state', 'All'),
-                    'platform': data.get('platform', 'All'),
-                    'content': data.get('content', ''),
-                    'tags': data.get('tags', [])
-                })
+                documents.append(self._document_from_firestore(doc))
             
             if documents:
                 print(f"✓ Loaded {len(documents)} documents from Firestore")
@@ -506,93 +671,457 @@ class KnowledgeBaseService:
             }
         ]
     
-    def search(self, query: str, top_k: int = 5, filters: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        # all-MiniLM-L6-v2 is uncased, so lowercasing doesn't change the embedding
+        return ' '.join(query.lower().split())
+    
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        with span('embedding.encode_batch'):
+            return self.encoder.encode(texts, batch_size=len(texts)).tolist()
+    
+    def _embedding_future(self, query: str) -> Future:
+        """
+        Future for a query embedding: resolved immediately on a cache hit,
+        shared with an identical in-flight query, or submitted to the pool.
+        """
+        key = self._normalize_query(query)
+        
+        with self._embedding_lock:
+            cached = self._embedding_cache.get(key)
+            if cached is not None:
+                self._embedding_cache.move_to_end(key)
+                self.embedding_stats['hits'] += 1
+                future = Future()
+                future.set_result(cached)
+                return future
+            
+            pending = self._pending_embeddings.get(key)
+            if pending is not None:
+                self.embedding_stats['coalesced'] += 1
+                return pending
+            
+            self.embedding_stats['misses'] += 1
+            future = self.encoder_batcher.submit(key)
+            self._pending_embeddings[key] = future
+        
+        future.add_done_callback(lambda done: self._finish_embedding(key, done))
+        return future
+    
+    def _finish_embedding(self, key: str, future: Future) -> None:
+        with self._embedding_lock:
+            self._pending_embeddings.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._embedding_cache[key] = future.result()
+            while len(self._embedding_cache) > self.embedding_cache_size:
+                self._embedding_cache.popitem(last=False)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Query embedding (blocking)"""
+        with span('embedding.query'):
+            return self._embedding_future(query).result()
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """
+        Query embedding without blocking the event loop.
+        The future may be shared by coalesced callers, so a cancelled caller
+        (client disconnect, timeout) must not cancel it for the others.
+        """
+        with span('embedding.query'):
+            return await asyncio.shield(asyncio.wrap_future(self._embedding_future(query)))
+    
+    @staticmethod
+    def _facet_labels(doc: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+        """Per facet, the document's lowercased filter values -> display values ('All' matches every filter)"""
+        labels = {}
+        for facet in FACETS:
+            display_values = [doc.get(facet) or 'All']
+            if facet == 'platform':
+                display_values = [p.strip() for p in display_values[0].split(',') if p.strip()]
+            labels[facet] = {display.strip().lower(): display.strip() for display in display_values}
+        return labels
+    
+    def _build_search_index(self) -> None:
+        """
+        Split documents into passages and precompute per-facet document-id
+        bitsets: bit i is set when documents[i] has that value. Filtering is
+        then a few int ANDs/ORs. The index keeps its own document list so
+        readers never see a half-updated pair.
+        """
+        index = {
+            'documents': [],
+            'positions': {},
+            'passages': {},  # passage id -> passage
+            'doc_passages': {},  # document id -> its passage ids
+            'bits': {facet: {} for facet in FACETS},
+            'counts': {facet: {} for facet in FACETS},
+            'labels': {facet: {} for facet in FACETS},  # lowercased value -> display value
+            'all': 0
+        }
+        for doc in self.documents:
+            self._index_put(index, doc)
+        self._swap_index(index)
+    
+    @staticmethod
+    def _copy_index(index: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of the index containers (documents and passages are shared) for a writer to change"""
+        return {
+            'documents': list(index['documents']),
+            'positions': dict(index['positions']),
+            'passages': dict(index['passages']),
+            'doc_passages': dict(index['doc_passages']),
+            'bits': {facet: dict(values) for facet, values in index['bits'].items()},
+            'counts': {facet: dict(values) for facet, values in index['counts'].items()},
+            'labels': {facet: dict(values) for facet, values in index['labels'].items()},
+            'all': index['all']
+        }
+    
+    def _mark_document(self, index: Dict[str, Any], doc: Dict[str, Any], position: int, present: bool) -> None:
+        """Set (or clear) a document's bit and count under each of its facet values"""
+        for facet, doc_labels in self._facet_labels(doc).items():
+            bits, counts, labels = index['bits'][facet], index['counts'][facet], index['labels'][facet]
+            for value, display in doc_labels.items():
+                if present:
+                    bits[value] = bits.get(value, 0) | (1 << position)
+                    counts[value] = counts.get(value, 0) + 1
+                    labels.setdefault(value, display)
+                elif counts[value] > 1:
+                    bits[value] &= ~(1 << position)
+                    counts[value] -= 1
+                else:
+                    del bits[value], counts[value], labels[value]
+    
+    def _index_put(self, index: Dict[str, Any], doc: Dict[str, Any]) -> None:
+        """Add or replace one document in an index copy (only its own passages are split)"""
+        position = index['positions'].get(doc['id'])
+        if position is None:
+            position = len(index['documents'])
+            index['documents'].append(doc)
+            index['positions'][doc['id']] = position
+            index['all'] |= 1 << position
+        else:
+            self._mark_document(index, index['documents'][position], position, False)
+            for passage_id in index['doc_passages'][doc['id']]:
+                del index['passages'][passage_id]
+            index['documents'][position] = doc
+        self._mark_document(index, doc, position, True)
+        
+        passages = split_passages(doc)
+        index['passages'].update((passage['id'], passage) for passage in passages)
+        index['doc_passages'][doc['id']] = [passage['id'] for passage in passages]
+    
+    def _index_drop(self, index: Dict[str, Any], doc_id: str) -> None:
+        """Remove one document from an index copy; the last document moves into its slot"""
+        position = index['positions'].pop(doc_id, None)
+        if position is None:
+            return
+        self._mark_document(index, index['documents'][position], position, False)
+        for passage_id in index['doc_passages'].pop(doc_id):
+            del index['passages'][passage_id]
+        
+        last = len(index['documents']) - 1
+        moved = index['documents'].pop()
+        if position != last:
+            self._mark_document(index, moved, last, False)
+            index['documents'][position] = moved
+            index['positions'][moved['id']] = position
+            self._mark_document(index, moved, position, True)
+        index['all'] = (1 << last) - 1
+    
+    def _swap_index(self, index: Dict[str, Any]) -> None:
+        """Publish a finished index: readers pick up the new objects, never a half-built one"""
+        catalog = self._build_facet_catalog(index)
+        self._facet_index = index
+        self._facet_catalog = catalog
+        self.documents = index['documents']
+    
+    def _build_facet_catalog(self, index: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Facet values with document counts, pre-serialised with an ETag for
+        the filter dropdown endpoints. Rebuilt only when documents change.
+        'All' is a wildcard, not a selectable state/platform.
+        """
+        catalog = {}
+        for facet, key in FACET_CATALOG_KEYS.items():
+            counts = {
+                index['labels'][facet][value]: count
+                for value, count in index['counts'][facet].items()
+                if facet == 'category' or value != 'all'
+            }
+            body = json.dumps({key: sorted(counts), 'counts': counts}, sort_keys=True).encode()
+            catalog[facet] = {
+                'values': sorted(counts),
+                'counts': counts,
+                'body': body,
+                'etag': f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            }
+        return catalog
+    
+    def get_facet_catalog(self, facet: str) -> Dict[str, Any]:
+        """Catalog entry for a facet: values, counts, serialised body and ETag"""
+        return self._facet_catalog[facet]
+    
+    def _filter_bits(self, filters: Optional[Dict[str, str]], index: Dict[str, Any]) -> Optional[int]:
+        """
+        Bitset of documents matching all filters, or None when unfiltered.
+        category must match exactly; state/platform match their value or 'All'.
+        """
+        if not filters or not any(filters.get(facet) for facet in FACETS):
+            return None
+        
+        matched = index['all']
+        for facet in FACETS:
+            value = (filters.get(facet) or '').strip().lower()
+            if not value:
+                continue
+            facet_bits = index['bits'][facet]
+            allowed = facet_bits.get(value, 0)
+            if facet != 'category':
+                allowed |= facet_bits.get('all', 0)
+            matched &= allowed
+        return matched
+    
+    @staticmethod
+    def _iter_bits(bits: int):
+        """Yield the positions of set bits, lowest first"""
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, str]] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
         """
         Search knowledge base using Pinecone vector search or keyword fallback.
+        Filters (category, state, platform) are applied inside retrieval, so
+        a filtered search still returns up to top_k matches; offset pages
+        through the ranked results.
         """
+        if self.use_hybrid:
+            fused = self._hybrid_candidates(query, filters, **self._article_candidates(top_k + offset))
+            return self._hybrid_articles(fused, top_k, offset)
         if self.use_pinecone:
-            return self._vector_search(query, top_k, filters)
+            return self._vector_search(query, top_k, filters, offset)
         else:
-            return self._keyword_search(query, top_k)
+            return self._keyword_search(query, top_k, filters, offset)
+    
+    async def asearch(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, str]] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Async search for request handlers: the embedding comes from the
+        cache/worker pool and the Pinecone call runs in a thread.
+        """
+        if self.use_hybrid:
+            fused = await self._ahybrid_candidates(query, filters, **self._article_candidates(top_k + offset))
+            return self._hybrid_articles(fused, top_k, offset)
+        if not self.use_pinecone:
+            return self._keyword_search(query, top_k, filters, offset)
+        
+        try:
+            query_embedding = await self.aembed_query(query)
+            return await asyncio.to_thread(self._query_index, query_embedding, top_k, filters, offset)
+        except Exception as e:
+            print(f"❌ Vector search error: {e}. Falling back to keyword search.")
+            return self._keyword_search(query, top_k, filters, offset)
     
-    def _vector_search(self, query: str, top_k: int = 5, filters: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    def _vector_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, str]] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
         """Semantic search using Pinecone"""
         try:
-            # Generate query embedding
-            query_embedding = self.encoder.encode(query).tolist()
+            # Generate query embedding (cached)
+            query_embedding = self.embed_query(query)
+            return self._query_index(query_embedding, top_k, filters, offset)
             
-            # Build filter dict for Pinecone
-            pinecone_filter = {}
-            if filters:
-                if filters.get('category'):
-                    pinecone_filter['category'] = filters['category']
-                if filters.get('state'):
-                    pinecone_filter['state'] = filters['state']
-                if filters.get('platform'):
-                    pinecone_filter['platform'] = {'$eq': filters['platform']}
-            
-            # Query Pinecone
-            results = self.index.query(
-                vector=query_embedding,
-                top_k=top_k,
-                include_metadata=True,
-                filter=pinecone_filter if pinecone_filter else None
-            )
+        except Exception as e:
+            print(f"❌ Vector search error: {e}. Falling back to keyword search.")
+            return self._keyword_search(query, top_k, filters, offset)
+    
+    def _query_passages(
+        self,
+        query_embedding: List[float],
+        needed: int,
+        filters: Optional[Dict[str, str]],
+        per_article: Optional[int] = None
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any], float]]:
+        """
+        Ranked (passage, parent document, score) matches from Pinecone.
+        Collects `needed` results, counting at most per_article passages
+        from any one article (None = no limit).
+        """
+        index = self._facet_index
+        allowed = self._filter_bits(filters, index)
+        if allowed == 0:
+            return []
+        
+        # Resolve filters locally and pass the matching parent ids to
+        # Pinecone, so its top_k is already filtered. Platform lists are
+        # stored as comma strings in metadata, which Pinecone can't match.
+        pinecone_filter = None
+        over_fetch = allowed is not None
+        if allowed is not None:
+            allowed_ids = [index['documents'][i]['id'] for i in self._iter_bits(allowed)]
+            if len(allowed_ids) <= PINECONE_ID_FILTER_MAX:
+                pinecone_filter = {'doc_id': {'$in': allowed_ids}}
+                over_fetch = False
+        
+        # Articles have several passages: fetch extra, doubling until enough
+        # results survive the per-article cap or the index runs out
+        fetch_k = needed * (3 if per_article else 1) * (4 if over_fetch else 1)
+        while True:
+            with span('pinecone.query'):
+                results = self.index.query(
+                    vector=query_embedding,
+                    top_k=min(fetch_k, 10000),
+                    include_metadata=True,
+                    filter=pinecone_filter,
+                    namespace=PASSAGE_NAMESPACE
+                )
             
-            # Format results
-            formatted_results = []
+            matches, per_doc = [], {}
             for match in results.matches:
-                # Find full document
-                full_doc = next((doc for doc in self.documents if doc['id'] == match.id), None)
-                if full_doc:
-                    formatted_results.append({
-                        **full_doc,
-                        'relevance_score': round(match.score * 100, 2)  # Convert to percentage
-                    })
-            
-            return formatted_results
+                # Find passage and its full document
+                passage = index['passages'].get(match.id)
+                if passage is None:
+                    continue
+                doc_position = index['positions'][passage['doc_id']]
+                if allowed is not None and not allowed >> doc_position & 1:
+                    continue
+                if per_article and per_doc.get(passage['doc_id'], 0) >= per_article:
+                    continue
+                per_doc[passage['doc_id']] = per_doc.get(passage['doc_id'], 0) + 1
+                matches.append((passage, index['documents'][doc_position], match.score))
+                if len(matches) >= needed:
+                    return matches
             
-        except Exception as e:
-            print(f"❌ Vector search error: {e}. Falling back to keyword search.")
-            return self._keyword_search(query, top_k)
+            if len(results.matches) < fetch_k or fetch_k >= 10000:
+                return matches
+            fetch_k *= 2
+    
+    def _query_index(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filters: Optional[Dict[str, str]] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Article search with a precomputed embedding (ranked by best passage)"""
+        matches = self._query_passages(query_embedding, top_k + offset, filters, per_article=1)
+        
+        # Format results
+        formatted_results = [
+            {
+                **doc,
+                'relevance_score': round(score * 100, 2)  # Convert to percentage
+            }
+            for _, doc, score in matches
+        ]
+        return formatted_results[offset:offset + top_k]
     
-    def _keyword_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _passage_result(passage: Dict[str, Any], doc: Dict[str, Any], score: float) -> Dict[str, Any]:
+        """A passage with its parent article's fields, for citation"""
+        return {
+            'id': doc['id'],
+            'passage_id': passage['id'],
+            'position': passage['position'],
+            'title': doc['title'],
+            'heading': passage['heading'],
+            'category': doc['category'],
+            'state': doc['state'],
+            'platform': doc['platform'],
+            'tags': doc['tags'],
+            'content': passage['text'],
+            'relevance_score': score
+        }
+    
+    def search_passages(
+        self,
+        query: str,
+        top_k: int = 6,
+        filters: Optional[Dict[str, str]] = None,
+        per_article: int = CONTEXT_PASSAGES_PER_SOURCE,
+        soft_filters: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Passage-level search: the best matching sections of articles,
+        at most per_article from any one article. soft_filters (hybrid
+        mode only) prefers matching articles instead of excluding the rest.
+        """
+        if self.use_hybrid:
+            fused = self._hybrid_candidates(query, filters, soft_filters)
+            return self._cap_per_article(fused, top_k, per_article)
+        if self.use_pinecone:
+            try:
+                query_embedding = self.embed_query(query)
+                return [
+                    self._passage_result(passage, doc, round(score * 100, 2))
+                    for passage, doc, score in self._query_passages(query_embedding, top_k, filters, per_article)
+                ]
+            except Exception as e:
+                print(f"❌ Vector search error: {e}. Falling back to keyword search.")
+        return self._keyword_search_passages(query, top_k, filters, per_article)
+    
+    async def asearch_passages(
+        self,
+        query: str,
+        top_k: int = 6,
+        filters: Optional[Dict[str, str]] = None,
+        per_article: int = CONTEXT_PASSAGES_PER_SOURCE,
+        soft_filters: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Async search_passages (embedding and Pinecone call off the event loop)"""
+        if self.use_hybrid:
+            fused = await self._ahybrid_candidates(query, filters, soft_filters)
+            return self._cap_per_article(fused, top_k, per_article)
+        if self.use_pinecone:
+            try:
+                query_embedding = await self.aembed_query(query)
+                matches = await asyncio.to_thread(self._query_passages, query_embedding, top_k, filters, per_article)
+                return [self._passage_result(passage, doc, round(score * 100, 2)) for passage, doc, score in matches]
+            except Exception as e:
+                print(f"❌ Vector search error: {e}. Falling back to keyword search.")
+        return self._keyword_search_passages(query, top_k, filters, per_article)
+    
+    def _keyword_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, str]] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
         """
         Fallback keyword search when Pinecone is unavailable.
+        Only documents in the filter bitset are scored.
         """
-        query_lower = query.lower()
-        query_words = set(query_lower.split())
+        index = self._facet_index
+        allowed = self._filter_bits(filters, index)
+        if allowed is None:
+            candidates = index['documents']
+        else:
+            candidates = [index['documents'][i] for i in self._iter_bits(allowed)]
+        
+        query_words = set(query.lower().split())
         
         # Score each document based on keyword matches
         scored_docs = []
-        for doc in self.documents:
-            score = 0
-            
-            # Check title match (high weight)
-            if any(word in doc['title'].lower() for word in query_words):
-                score += 5
-            
-            # Check tags match (medium-high weight)
-            for tag in doc['tags']:
-                if any(word in tag for word in query_words):
-                    score += 3
-            
-            # Check category match
-            if any(word in doc['category'].lower() for word in query_words):
-                score += 2
-            
-            # Check content match (lower weight but still important)
-            content_lower = doc['content'].lower()
-            for word in query_words:
-                if word in content_lower:
-                    score += 1
-            
-            # Check state/platform match
-            if any(word in doc['state'].lower() for word in query_words):
-                score += 4
-            if any(word in doc['platform'].lower() for word in query_words):
-                score += 4
-            
+        for doc in candidates:
+            score = self._keyword_score(query_words, doc, doc['content'])
             if score > 0:
                 scored_docs.append({
                     **doc,
@@ -601,58 +1130,647 @@ class KnowledgeBaseService:
         
         # Sort by score and return top k
         scored_docs.sort(key=lambda x: x['relevance_score'], reverse=True)
-        return scored_docs[:top_k]
+        return scored_docs[offset:offset + top_k]
+    
+    def _keyword_search_passages(
+        self,
+        query: str,
+        top_k: int = 6,
+        filters: Optional[Dict[str, str]] = None,
+        per_article: Optional[int] = CONTEXT_PASSAGES_PER_SOURCE
+    ) -> List[Dict[str, Any]]:
+        """Keyword scoring of passages (article fields + the passage's own text)"""
+        index = self._facet_index
+        allowed = self._filter_bits(filters, index)
+        query_words = set(query.lower().split())
+        
+        scored = []
+        for passage in index['passages'].values():
+            doc_position = index['positions'][passage['doc_id']]
+            if allowed is not None and not allowed >> doc_position & 1:
+                continue
+            doc = index['documents'][doc_position]
+            score = self._keyword_score(query_words, doc, f"{passage['heading']}\n{passage['text']}")
+            if score > 0:
+                scored.append(self._passage_result(passage, doc, score))
+        
+        scored.sort(key=lambda x: x['relevance_score'], reverse=True)
+        return self._cap_per_article(scored, top_k, per_article)
+    
+    @staticmethod
+    def _cap_per_article(results: List[Dict[str, Any]], top_k: int, per_article: Optional[int]) -> List[Dict[str, Any]]:
+        """First top_k ranked passages, at most per_article from one article (None = no limit)"""
+        capped, per_doc = [], {}
+        for result in results:
+            if per_article and per_doc.get(result['id'], 0) >= per_article:
+                continue
+            per_doc[result['id']] = per_doc.get(result['id'], 0) + 1
+            capped.append(result)
+            if len(capped) >= top_k:
+                break
+        return capped
+    
+    @property
+    def use_hybrid(self) -> bool:
+        return self.retrieval_mode == 'hybrid' and self.use_pinecone
+    
+    def _fused_cache_key(
+        self,
+        query: str,
+        filters: Optional[Dict[str, str]],
+        soft_filters: bool,
+        candidates: int = HYBRID_CANDIDATES,
+        per_article: Optional[int] = None
+    ) -> Tuple:
+        active = tuple(sorted(
+            (facet, filters[facet].strip().lower()) for facet in FACETS if filters and filters.get(facet)
+        ))
+        return (self._normalize_query(query), active, soft_filters, candidates, per_article)
+    
+    @staticmethod
+    def _article_candidates(needed: int) -> Dict[str, Any]:
+        """
+        Hybrid settings for article search: one passage per article from each
+        engine, HYBRID_ARTICLE_CANDIDATES deep (grown in whole steps for pages
+        past that), so offset + top_k articles exist whenever the index has them.
+        """
+        steps = max(1, -(-needed // HYBRID_ARTICLE_CANDIDATES))
+        return {'candidates': steps * HYBRID_ARTICLE_CANDIDATES, 'per_article': 1}
+    
+    def _fuse(self, rankings: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Reciprocal-rank fusion of passage rankings: each engine contributes
+        1 / (RRF_K + rank), so agreement between engines beats a high rank
+        in only one. relevance_score is the fused score as a percentage of
+        the best possible (rank 1 in every engine).
+        """
+        fused = {}
+        for ranking in rankings:
+            for rank, result in enumerate(ranking, 1):
+                entry = fused.setdefault(result['passage_id'], {**result, 'fused_score': 0.0})
+                entry['fused_score'] += 1 / (RRF_K + rank)
+        
+        best_possible = len(rankings) / (RRF_K + 1)
+        ordered = sorted(fused.values(), key=lambda r: r['fused_score'], reverse=True)
+        for result in ordered:
+            result['relevance_score'] = round(result['fused_score'] / best_possible * 100, 2)
+        return ordered
+    
+    def _load_reranker(self):
+        """Load the cross-encoder (in the rerank thread) and run it once to warm it up"""
+        if self._reranker is None:
+            from sentence_transformers import CrossEncoder
+            reranker = CrossEncoder(self.reranker_model)
+            reranker.predict([("warm up", "warm up")])
+            self._reranker = reranker
+            print(f"✓ Reranker loaded: {self.reranker_model}")
+        return self._reranker
+    
+    def _rerank(self, query: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Re-score candidates with the cross-encoder (runs in the rerank thread)"""
+        scores = self._load_reranker().predict([
+            (query, f"{c['title']}. {c['heading']}. {c['content']}") for c in candidates
+        ])
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        return [candidates[i] for i in order]
+    
+    def _rerank_wanted(self, fused: List[Dict[str, Any]]) -> bool:
+        return bool(self.reranker_model) and len(fused) >= 2
+    
+    def _count_rerank(self, outcome: str) -> None:
+        with self._stats_lock:
+            self.rerank_stats[outcome] += 1
     
-    def get_relevant_context(self, platform: str, state: str, reason: str, top_k: int = 3) -> str:
+    def _submit_rerank(self, query: str, fused: List[Dict[str, Any]]) -> Optional[Future]:
+        """
+        Start a rerank of the top fused candidates, or None when reranking
+        is off or the previous rerank is still running (never queue behind it).
+        """
+        if not self._rerank_wanted(fused):
+            return None
+        if self._rerank_future is not None and not self._rerank_future.done():
+            self._count_rerank('skipped')
+            return None
+        self._rerank_future = self._rerank_executor.submit(self._rerank, query, fused[:RERANK_CANDIDATES])
+        return self._rerank_future
+    
+    def _apply_rerank(self, fused: List[Dict[str, Any]], reranked: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        if reranked is None:
+            return fused
+        self._count_rerank('reranked')
+        return reranked + fused[len(reranked):]
+    
+    def _hybrid_finish(
+        self,
+        key: Tuple,
+        fused: List[Dict[str, Any]],
+        filters: Optional[Dict[str, str]],
+        soft_filters: bool,
+        final: bool = True,
+        generation: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        With soft filters, rank passages of matching articles first (the
+        rest backfill). Then cache the candidate list - only briefly when it
+        isn't final (the rerank was wanted but didn't make the budget), and
+        not at all if the caches were invalidated since retrieval started.
+        """
+        allowed = self._filter_bits(filters, self._facet_index) if soft_filters else None
+        if allowed is not None:
+            positions = self._facet_index['positions']
+            fused = sorted(fused, key=lambda r: not (r['id'] in positions and allowed >> positions[r['id']] & 1))
+        
+        with self._cache_lock:
+            if generation is not None and generation != self._cache_generation:
+                return fused
+            ttl = self.context_cache_ttl if final else min(self.context_cache_ttl, UNRERANKED_CACHE_TTL)
+            self._fused_cache[key] = (time.monotonic() + ttl, fused)
+            self._fused_cache.move_to_end(key)
+            while len(self._fused_cache) > self.context_cache_size:
+                self._fused_cache.popitem(last=False)
+        return fused
+    
+    def _fused_cache_get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        with self._cache_lock:
+            entry = self._fused_cache.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self._fused_cache.move_to_end(key)
+            return entry[1]
+    
+    def _hybrid_candidates(
+        self,
+        query: str,
+        filters: Optional[Dict[str, str]] = None,
+        soft_filters: bool = False,
+        candidates: int = HYBRID_CANDIDATES,
+        per_article: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Hybrid retrieval (blocking): keyword and vector candidates fused with
+        RRF, optionally reranked. With soft_filters, matching articles rank
+        first and others backfill, so one retrieval replaces the old
+        filtered-then-unfiltered pair. Each engine contributes `candidates`
+        passages, at most per_article from one article (None = no limit).
+        """
+        key = self._fused_cache_key(query, filters, soft_filters, candidates, per_article)
+        generation = self._cache_generation
+        cached = self._fused_cache_get(key)
+        if cached is not None:
+            return cached
+        
+        engine_filters = None if soft_filters else filters
+        keyword = self._keyword_search_passages(query, candidates, engine_filters, per_article)
+        try:
+            vector = [
+                self._passage_result(passage, doc, round(score * 100, 2))
+                for passage, doc, score in self._query_passages(self.embed_query(query), candidates, engine_filters, per_article)
+            ]
+        except Exception as e:
+            print(f"❌ Vector search error: {e}. Using keyword results only.")
+            vector = []
+        
+        fused = self._fuse([keyword, vector])
+        future = self._submit_rerank(query, fused)
+        reranked = None
+        if future is not None:
+            try:
+                reranked = future.result(timeout=self.rerank_budget)
+            except FutureTimeoutError:
+                self._count_rerank('timeouts')
+            except Exception as e:
+                print(f"⚠ Rerank failed: {e}")
+        
+        final = reranked is not None or not self._rerank_wanted(fused)
+        return self._hybrid_finish(key, self._apply_rerank(fused, reranked), filters, soft_filters, final, generation)
+    
+    async def _ahybrid_candidates(
+        self,
+        query: str,
+        filters: Optional[Dict[str, str]] = None,
+        soft_filters: bool = False,
+        candidates: int = HYBRID_CANDIDATES,
+        per_article: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Async _hybrid_candidates: both engines run concurrently off the event loop"""
+        key = self._fused_cache_key(query, filters, soft_filters, candidates, per_article)
+        generation = self._cache_generation
+        cached = self._fused_cache_get(key)
+        if cached is not None:
+            return cached
+        
+        engine_filters = None if soft_filters else filters
+        
+        async def vector_ranking():
+            query_embedding = await self.aembed_query(query)
+            matches = await asyncio.to_thread(self._query_passages, query_embedding, candidates, engine_filters, per_article)
+            return [self._passage_result(passage, doc, round(score * 100, 2)) for passage, doc, score in matches]
+        
+        keyword, vector = await asyncio.gather(
+            asyncio.to_thread(self._keyword_search_passages, query, candidates, engine_filters, per_article),
+            vector_ranking(),
+            return_exceptions=True
+        )
+        if isinstance(keyword, Exception):
+            print(f"❌ Keyword search error: {keyword}")
+            keyword = []
+        if isinstance(vector, Exception):
+            print(f"❌ Vector search error: {vector}. Using keyword results only.")
+            vector = []
+        
+        fused = self._fuse([keyword, vector])
+        future = self._submit_rerank(query, fused)
+        reranked = None
+        if future is not None:
+            try:
+                reranked = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.rerank_budget)
+            except asyncio.TimeoutError:
+                self._count_rerank('timeouts')
+            except Exception as e:
+                print(f"⚠ Rerank failed: {e}")
+        
+        final = reranked is not None or not self._rerank_wanted(fused)
+        return self._hybrid_finish(key, self._apply_rerank(fused, reranked), filters, soft_filters, final, generation)
+    
+    def _hybrid_articles(self, fused: List[Dict[str, Any]], top_k: int, offset: int) -> List[Dict[str, Any]]:
+        """Articles ranked by their best fused passage"""
+        documents = self._facet_index['documents']
+        positions = self._facet_index['positions']
+        best = self._cap_per_article(fused, top_k + offset, per_article=1)
+        return [
+            {**documents[positions[r['id']]], 'relevance_score': r['relevance_score']}
+            for r in best[offset:offset + top_k]
+            if r['id'] in positions
+        ]
+    
+    @staticmethod
+    def _keyword_score(query_words: set, doc: Dict[str, Any], content: str) -> int:
+        """Weighted keyword matches of a document (or one of its passages)"""
+        score = 0
+        
+        # Check title match (high weight)
+        if any(word in doc['title'].lower() for word in query_words):
+            score += 5
+        
+        # Check tags match (medium-high weight)
+        for tag in doc['tags']:
+            if any(word in tag for word in query_words):
+                score += 3
+        
+        # Check category match
+        if any(word in doc['category'].lower() for word in query_words):
+            score += 2
+        
+        # Check content match (lower weight but still important)
+        content_lower = content.lower()
+        for word in query_words:
+            if word in content_lower:
+                score += 1
+        
+        # Check state/platform match
+        if any(word in doc['state'].lower() for word in query_words):
+            score += 4
+        if any(word in doc['platform'].lower() for word in query_words):
+            score += 4
+        
+        return score
+    
+    def _normalize_context_key(self, platform: str, state: str, reason: str) -> Tuple[str, str, str]:
+        """
+        Map free-form inputs onto the knowledge base's small vocabularies
+        (e.g. 'door dash' -> 'DoorDash', 'texas' -> 'Texas', a long notice
+        text -> 'rating'), so equivalent requests share one cache entry.
+        """
+        def canonical(value: str, vocabulary: List[str]) -> str:
+            value = re.sub(r'\s+', ' ', (value or '').strip().lower())
+            if not value:
+                return ''
+            compact = value.replace(' ', '')
+            for term in vocabulary:
+                if term.lower().replace(' ', '') == compact:
+                    return term
+            return value.title()
+        
+        reason_lower = (reason or '').lower()
+        terms = []
+        for pattern, term in REASON_TERM_PATTERNS:
+            if term not in terms and pattern.search(reason_lower):
+                terms.append(term)
+        # Unrecognised reason: keep a short normalised prefix
+        reason_key = ' '.join(terms) or ' '.join(re.findall(r'[a-z]+', reason_lower)[:REASON_KEY_WORDS])
+        
+        return (
+            canonical(platform, self.get_all_platforms()),
+            canonical(state, self.get_all_states()),
+            reason_key
+        )
+    
+    @staticmethod
+    def _context_query(platform: str, state: str, reason_key: str, reason_text: Optional[str] = None) -> str:
+        """RAG query: the canonical reason terms plus the worker's own reason text"""
+        words = re.findall(r'[a-z0-9]+(?:\.[0-9]+)?', (reason_text or '').lower())[:REASON_QUERY_WORDS]
+        parts = (platform, state, reason_key, ' '.join(words))
+        return ' '.join(part for part in parts if part) + " deactivation appeal rights policy"
+    
+    def _context_cache_get(self, key: Tuple) -> Optional[str]:
+        """Cached context, counting the hit or miss under the cache lock"""
+        with self._cache_lock:
+            entry = self._context_cache.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._context_cache[key]
+                entry = None
+            if entry is None:
+                self.context_cache_misses += 1
+                return None
+            self.context_cache_hits += 1
+            self._context_cache.move_to_end(key)
+            return entry[1]
+    
+    def _context_cache_put(self, key: Tuple, context: str, generation: int) -> None:
+        with self._cache_lock:
+            # Built from documents that changed meanwhile
+            if generation != self._cache_generation:
+                return
+            self._context_cache[key] = (time.monotonic() + self.context_cache_ttl, context)
+            self._context_cache.move_to_end(key)
+            while len(self._context_cache) > self.context_cache_size:
+                self._context_cache.popitem(last=False)
+    
+    def invalidate_caches(self) -> None:
+        """Drop memoised retrieval results (call whenever documents change)"""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._context_cache.clear()
+            self._fused_cache.clear()
+        print("✓ Knowledge base caches invalidated")
+    
+    def get_relevant_context(
+        self,
+        platform: str,
+        state: str,
+        reason: str,
+        top_k: int = 3,
+        purpose: str = 'appeal'
+    ) -> str:
         """
         Get relevant context for RAG-enhanced appeal generation.
-        Returns formatted text with citations.
+        Returns formatted text with [S#] citations, trimmed to the token
+        budget for the call site (purpose: 'appeal' or 'chat').
+        Results are memoised per normalised (platform, state, reason terms,
+        top_k, purpose) with LRU + TTL eviction; the reason text itself only
+        shapes the retrieval query of a miss.
+        """
+        reason_text = reason
+        platform, state, reason = self._normalize_context_key(platform, state, reason)
+        cache_key = (platform, state, reason, top_k, purpose)
+        generation = self._cache_generation
+        
+        cached = self._context_cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        context = self._build_relevant_context(platform, state, reason, top_k, purpose, reason_text)
+        self._context_cache_put(cache_key, context, generation)
+        return context
+    
+    async def aget_relevant_context(
+        self,
+        platform: str,
+        state: str,
+        reason: str,
+        top_k: int = 3,
+        purpose: str = 'appeal'
+    ) -> str:
+        """Async get_relevant_context (shares the same cache)"""
+        reason_text = reason
+        platform, state, reason = self._normalize_context_key(platform, state, reason)
+        cache_key = (platform, state, reason, top_k, purpose)
+        generation = self._cache_generation
+        
+        cached = self._context_cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        query = self._context_query(platform, state, reason, reason_text)
+        passage_k = top_k * CONTEXT_PASSAGES_PER_SOURCE
+        results = await self.asearch_passages(query, top_k=passage_k, filters={
+            'platform': platform,
+            'state': state
+        }, soft_filters=True)
+        if not results and not self.use_hybrid:
+            results = await self.asearch_passages(query, top_k=passage_k)
+        
+        context = context_assembler.assemble(results, purpose, max_sources=top_k, state=state, platform=platform)
+        self._context_cache_put(cache_key, context, generation)
+        return context
+    
+    def _build_relevant_context(
+        self,
+        platform: str,
+        state: str,
+        reason: str,
+        top_k: int,
+        purpose: str = 'appeal',
+        reason_text: Optional[str] = None
+    ) -> str:
+        """Run retrieval and format the context (uncached)"""
+        results = self.context_passages(platform, state, reason, top_k, reason_text)
+        return context_assembler.assemble(results, purpose, max_sources=top_k, state=state, platform=platform)
+    
+    def context_passages(
+        self,
+        platform: str,
+        state: str,
+        reason: str,
+        top_k: int = 3,
+        reason_text: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Ranked passages retrieved for RAG context (expects a normalised key;
+        reason_text is the worker's own wording, added to the query)
         """
         # Build search query from appeal details
-        query = f"{platform} {state} {reason} deactivation appeal rights policy"
+        query = self._context_query(platform, state, reason, reason_text)
         
-        # Search with filters
-        results = self.search(query, top_k=top_k, filters={
+        # Search passages with filters
+        passage_k = top_k * CONTEXT_PASSAGES_PER_SOURCE
+        results = self.search_passages(query, top_k=passage_k, filters={
             'platform': platform,
             'state': state
-        })
+        }, soft_filters=True)
+        
+        if not results and not self.use_hybrid:
+            # Try broader search without filters (hybrid already backfills)
+            results = self.search_passages(query, top_k=passage_k)
+        
+        return results
+    
+    def warm_context_cache(self, top_n: int = 50) -> int:
+        """
+        Pre-compute context for the most common (platform, state, reason)
+        combinations seen in recent appeals. Returns number of entries warmed.
+        """
+        from collections import Counter
+        from app.core.firebase import db
         
-        if not results:
-            # Try broader search without filters
-            results = self.search(query, top_k=top_k)
+        combos = Counter()
+        for appeal in db.collection('appeals').limit(2000).stream():
+            data = appeal.to_dict()
+            combos[self._normalize_context_key(
+                data.get('platform', ''),
+                data.get('userState') or 'California',
+                data.get('deactivationReason', '')
+            )] += 1
         
-        # Format context with citations
-        context_parts = []
-        for i, doc in enumerate(results, 1):
-            context_parts.append(
-                f"[Source {i}: {doc['title']}]\n"
-                f"Category: {doc['category']}\n"
-                f"State: {doc['state']} | Platform: {doc['platform']}\n"
-                f"Content: {doc['content']}\n"
-            )
+        warmed = 0
+        for (platform, state, reason), _ in combos.most_common(top_n):
+            self.get_relevant_context(platform, state, reason, top_k=3)
+            warmed += 1
         
-        return "\n---\n".join(context_parts) if context_parts else "No specific policy information found."
+        print(f"✓ Warmed {warmed} knowledge base context entries")
+        return warmed
+    
+    def _watch_documents(self) -> None:
+        """
+        Listen for knowledge_base changes in Firestore and apply them live,
+        invalidating cached retrieval results. Every worker reindexes its own
+        copy; only the holder of the vector sync lease writes to Pinecone.
+        """
+        from app.core.firebase import db
+        
+        initial_snapshot = {'seen': False}
+        
+        def on_snapshot(docs, changes, read_time):
+            # The first snapshot is the current state, already loaded
+            if not initial_snapshot['seen']:
+                initial_snapshot['seen'] = True
+                return
+            try:
+                sync_vectors = self._holds_vector_sync_lease()
+                for change in changes:
+                    if change.type.name == 'REMOVED':
+                        self.remove_document(change.document.id, sync_vectors=sync_vectors)
+                    else:
+                        self.upsert_document(self._document_from_firestore(change.document), sync_vectors=sync_vectors)
+            except Exception as e:
+                print(f"❌ Error applying knowledge base change: {e}")
+        
+        self._watch = db.collection('knowledge_base').on_snapshot(on_snapshot)
+    
+    def _holds_vector_sync_lease(self) -> bool:
+        """Take (or renew) the lease for writing listener changes to Pinecone"""
+        from app.core.firebase import acquire_lease
+        
+        if not self.use_pinecone:
+            return False
+        try:
+            return acquire_lease(VECTOR_SYNC_LEASE, f"{socket.gethostname()}:{os.getpid()}", VECTOR_SYNC_LEASE_SECONDS)
+        except Exception as e:
+            print(f"⚠ Could not take the vector sync lease: {e}")
+            return False
+    
+    def _cache_counters(self) -> Dict[str, Dict[str, int]]:
+        """Consistent copy of the cache counters (each read under the lock that guards it)"""
+        with self._cache_lock:
+            context = {'hits': self.context_cache_hits, 'misses': self.context_cache_misses}
+        with self._embedding_lock:
+            embedding = dict(self.embedding_stats)
+        return {'context': context, 'embedding': embedding}
+    
+    def stats(self) -> Dict[str, Any]:
+        """Retrieval cache and encoder metrics"""
+        with self._stats_lock:
+            rerank_stats = dict(self.rerank_stats)
+        counters = self._cache_counters()
+        return {
+            'documents': len(self.documents),
+            'passages': len(self._facet_index['passages']),
+            'vectorSearch': self.use_pinecone,
+            'retrievalMode': 'hybrid' if self.use_hybrid else ('vector' if self.use_pinecone else 'keyword'),
+            'fusedCache': {'size': len(self._fused_cache)},
+            'rerank': {'model': self.reranker_model or None, **rerank_stats},
+            'contextCache': {
+                'size': len(self._context_cache),
+                **counters['context']
+            },
+            'embeddingCache': {
+                'size': len(self._embedding_cache),
+                **counters['embedding']
+            },
+            'encoder': self.encoder_batcher.metrics()
+        }
+    
+    def cache_metrics(self) -> List[str]:
+        """Cache hit/miss counters for /metrics"""
+        counters = self._cache_counters()
+        return counter_lines(
+            'gigshield_kb_cache_lookups_total', 'Knowledge base cache lookups', ('cache', 'result'), {
+                ('context', 'hit'): counters['context']['hits'],
+                ('context', 'miss'): counters['context']['misses'],
+                ('embedding', 'hit'): counters['embedding']['hits'],
+                ('embedding', 'miss'): counters['embedding']['misses'],
+                ('embedding', 'coalesced'): counters['embedding']['coalesced']
+            }
+        )
+    
+    def shutdown(self) -> None:
+        """Stop the encoder thread and the Firestore listener"""
+        self.encoder_batcher.shutdown()
+        self._rerank_executor.shutdown(wait=False, cancel_futures=True)
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+    
+    def upsert_document(self, doc: Dict[str, Any], sync_vectors: bool = True) -> None:
+        """
+        Add or replace a document, then invalidate caches.
+        Only this document is re-split and re-marked in the facet bitsets;
+        the updated index is built aside and swapped in as a whole.
+        With sync_vectors its passage vectors are written to Pinecone too.
+        """
+        with self._index_lock:
+            index = self._copy_index(self._facet_index)
+            old_ids = set(index['doc_passages'].get(doc['id'], []))
+            self._index_put(index, doc)
+            self._swap_index(index)
+        if self.use_pinecone and sync_vectors:
+            self._upsert_vectors([doc])
+            # An edited article may now have fewer passages
+            stale_ids = list(old_ids - set(index['doc_passages'][doc['id']]))
+            if stale_ids:
+                self.index.delete(ids=stale_ids, namespace=PASSAGE_NAMESPACE)
+        self.invalidate_caches()
+        print(f"✓ Knowledge base document updated: {doc['id']}")
+    
+    def remove_document(self, doc_id: str, sync_vectors: bool = True) -> None:
+        """
+        Remove a document, then invalidate caches.
+        With sync_vectors its passage vectors are deleted from Pinecone too.
+        """
+        with self._index_lock:
+            index = self._copy_index(self._facet_index)
+            passage_ids = index['doc_passages'].get(doc_id, [])
+            self._index_drop(index, doc_id)
+            self._swap_index(index)
+        if self.use_pinecone and sync_vectors and passage_ids:
+            try:
+                self.index.delete(ids=passage_ids, namespace=PASSAGE_NAMESPACE)
+            except Exception as e:
+                print(f"❌ Error deleting vectors for {doc_id}: {e}")
+        self.invalidate_caches()
+        print(f"✓ Knowledge base document removed: {doc_id}")
     
     def get_all_categories(self) -> List[str]:
         """Get all unique categories"""
-        return list(set(doc['category'] for doc in self.documents))
+        return self._facet_catalog['category']['values']
     
     def get_all_states(self) -> List[str]:
         """Get all unique states"""
-        states = set()
-        for doc in self.documents:
-            if doc['state'] != 'All':
-                states.add(doc['state'])
-        return sorted(list(states))
+        return self._facet_catalog['state']['values']
     
     def get_all_platforms(self) -> List[str]:
         """Get all unique platforms"""
-        platforms = set()
-        for doc in self.documents:
-            if doc['platform'] != 'All':
-                for platform in doc['platform'].split(', '):
-                    platforms.add(platform.strip())
-        return sorted(list(platforms))
+        return self._facet_catalog['platform']['values']
     
     def filter_by_category(self, category: str) -> List[Dict[str, Any]]:
         """Filter documents by category"""
@@ -668,3 +1786,4 @@ class KnowledgeBaseService:
 
 # Create singleton instance
 knowledge_base_service = KnowledgeBaseService()
+metrics.register_collector(knowledge_base_service.cache_metrics)
@@ -0,0 +1,190 @@
+# backend/app/services/notice_extraction.py
+
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Tuple
+
+try:
+    import fitz  # PyMuPDF - PDF text layer and page rendering
+except ImportError:
+    fitz = None
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # OCR fallback disabled
+    pytesseract = None
+
+# Pages with less text than this are treated as scanned and sent to OCR
+MIN_TEXT_LAYER_CHARS = 20
+OCR_DPI = 200
+
+
+# Worker functions live at module level so the process pool can pickle them
+
+def _pdf_page_count(pdf_bytes: bytes) -> int:
+    with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+        return pdf.page_count
+
+
+def _ocr_image_bytes(image_bytes: bytes) -> str:
+    """OCR a single image with Tesseract"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        return pytesseract.image_to_string(img.convert('L'))
+
+
+def _extract_pdf_pages(pdf_bytes: bytes, page_numbers: List[int], ocr_enabled: bool) -> List[Tuple[int, str, str]]:
+    """
+    Extract text from a range of PDF pages.
+    Uses the embedded text layer; falls back to OCR for image-only pages.
+    Returns [(page_number, text, method)].
+    """
+    results = []
+    with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+        for page_number in page_numbers:
+            page = pdf[page_number]
+            text = page.get_text('text').strip()
+            method = 'text_layer'
+
+            if len(text) < MIN_TEXT_LAYER_CHARS and ocr_enabled:
+                pixmap = page.get_pixmap(dpi=OCR_DPI, alpha=False)
+                text = _ocr_image_bytes(pixmap.tobytes('png')).strip()
+                method = 'ocr'
+
+            results.append((page_number, text, method))
+    return results
+
+
+class NoticeExtractionService:
+    def __init__(self):
+        """Server-side text extraction for uploaded deactivation notices"""
+        self.max_workers = int(os.getenv("NOTICE_EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.pages_per_task = 4
+        self.cache_size = 256
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._executor = None
+        self._ocr_enabled = None
+
+        if fitz is None:
+            print("⚠ PyMuPDF not installed - PDF notice extraction disabled")
+        if pytesseract is None:
+            print("⚠ pytesseract not installed - OCR fallback disabled")
+
+    @property
+    def ocr_enabled(self) -> bool:
+        """pytesseract is installed and the tesseract binary runs (checked once, on first use)"""
+        if self._ocr_enabled is None:
+            self._ocr_enabled = False
+            if pytesseract is not None:
+                try:
+                    pytesseract.get_tesseract_version()
+                    self._ocr_enabled = True
+                except Exception as e:
+                    print(f"⚠ tesseract binary not available - OCR fallback disabled ({e})")
+        return self._ocr_enabled
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Create the process pool on first use. Workers are spawned, not forked:
+        forking a process that already runs gRPC, torch and encoder threads
+        can deadlock the child.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _cache_get(self, file_hash: str):
+        result = self._cache.get(file_hash)
+        if result is not None:
+            self._cache.move_to_end(file_hash)
+        return result
+
+    def _cache_put(self, file_hash: str, result: Dict[str, Any]) -> None:
+        self._cache[file_hash] = result
+        self._cache.move_to_end(file_hash)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _extract_pdf(self, file_bytes: bytes) -> Dict[str, Any]:
+        """Extract PDF pages in parallel across the process pool"""
+        if fitz is None:
+            raise ValueError("PDF extraction is not available on this server")
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        # Even opening the PDF parses it - keep it off the event loop
+        page_count = await loop.run_in_executor(executor, _pdf_page_count, file_bytes)
+        page_chunks = [
+            list(range(start, min(start + self.pages_per_task, page_count)))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+
+        chunk_results = await asyncio.gather(*[
+            loop.run_in_executor(executor, _extract_pdf_pages, file_bytes, chunk, self.ocr_enabled)
+            for chunk in page_chunks
+        ])
+
+        pages = sorted(page for chunk in chunk_results for page in chunk)
+        methods = {method for _, _, method in pages}
+
+        return {
+            'text': '\n\n'.join(text for _, text, _ in pages if text),
+            'pageCount': page_count,
+            'method': 'mixed' if len(methods) > 1 else (methods.pop() if methods else 'text_layer')
+        }
+
+    async def _extract_image(self, file_bytes: bytes) -> Dict[str, Any]:
+        """OCR an image notice in the process pool"""
+        if not self.ocr_enabled:
+            raise ValueError("Image OCR is not available on this server")
+
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(self._get_executor(), _ocr_image_bytes, file_bytes)
+
+        return {
+            'text': text.strip(),
+            'pageCount': 1,
+            'method': 'ocr'
+        }
+
+    async def extract_text(self, file_bytes: bytes, content_type: str) -> Dict[str, Any]:
+        """
+        Extract text from a PDF or image notice.
+        Results are cached by SHA-256 of the file bytes.
+        Returns: dict with text, pageCount, method and fileHash
+        """
+        file_hash = hashlib.sha256(file_bytes).hexdigest()
+
+        cached = self._cache_get(file_hash)
+        if cached is not None:
+            return {**cached, 'cached': True}
+
+        if content_type == 'application/pdf':
+            result = await self._extract_pdf(file_bytes)
+        elif content_type.startswith('image/'):
+            result = await self._extract_image(file_bytes)
+        else:
+            raise ValueError("Unsupported file type. Upload a PDF or an image.")
+
+        result['fileHash'] = file_hash
+        self._cache_put(file_hash, result)
+        print(f"✓ Extracted {len(result['text'])} chars from notice ({result['method']}, {result['pageCount']} pages)")
+
+        return {**result, 'cached': False}
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Create singleton instance
+notice_extraction_service = NoticeExtractionService()
@@ -0,0 +1,256 @@
+# backend/app/services/notice_rules.py
+
+"""
+Deterministic pre-extraction of deactivation notice fields.
+Pulls platform, appeal deadline, dates, partner IDs and reason keywords with
+regexes so analyze_notice can skip (or shorten) the Claude call.
+"""
+
+import re
+from typing import Dict, List, Any, Optional
+
+PLATFORM_PATTERNS = {
+    'DoorDash': re.compile(r'\bdoor\s?dash\b|\bdasher\b', re.IGNORECASE),
+    'Uber': re.compile(r'\buber(?:\s+eats)?\b', re.IGNORECASE),
+    'Lyft': re.compile(r'\blyft\b', re.IGNORECASE),
+    'Instacart': re.compile(r'\binstacart\b', re.IGNORECASE),
+    'Amazon Flex': re.compile(r'\bamazon\s+flex\b', re.IGNORECASE),
+    'Grubhub': re.compile(r'\bgrub\s?hub\b', re.IGNORECASE),
+    'Shipt': re.compile(r'\bshipt\b', re.IGNORECASE),
+    'Postmates': re.compile(r'\bpostmates\b', re.IGNORECASE),
+}
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'fourteen': 14, 'fifteen': 15,
+    'twenty': 20, 'thirty': 30, 'sixty': 60, 'ninety': 90,
+}
+
+_NUMBER = r'(\d{1,3}|' + '|'.join(NUMBER_WORDS) + r')'
+
+# "within 7-10 days", "within thirty (30) days", "10 business days to appeal"
+DEADLINE_PATTERN = re.compile(
+    r'\bwithin\s+' + _NUMBER + r'(?:\s*\(\d{1,3}\))?(?:\s*(?:-|to|–)\s*' + _NUMBER + r')?\s+(?:business\s+|calendar\s+)?days?\b'
+    r'|\b' + _NUMBER + r'(?:\s*\(\d{1,3}\))?\s+(?:business\s+|calendar\s+)?days?\s+to\s+(?:appeal|respond|submit|request)',
+    re.IGNORECASE
+)
+
+# Deadline sentences must be about the worker's appeal, not the platform's review time
+APPEAL_CONTEXT = re.compile(r'\bappeal|\brespond|\bdispute|\bsubmit|\brequest\s+(?:a\s+)?review', re.IGNORECASE)
+REVIEW_TIME_CONTEXT = re.compile(r'\b(?:reviewed|processed|respond\s+to\s+you|hear\s+back)\b', re.IGNORECASE)
+
+DATE_PATTERN = re.compile(
+    r'\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|'
+    r'sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}\b'
+    r'|\b\d{1,2}/\d{1,2}/\d{2,4}\b'
+    r'|\b\d{4}-\d{2}-\d{2}\b',
+    re.IGNORECASE
+)
+
+PARTNER_ID_PATTERN = re.compile(
+    r'\b(?:account|partner|dasher|driver|shopper|courier|worker)\s*(?:id|#|number|no\.?)\s*[:#]?\s*([A-Z0-9][A-Z0-9-]{3,})',
+    re.IGNORECASE
+)
+
+# Keyword -> reason category (same buckets as app.api.scoring.categorize_reason).
+# Whole words only, so "star" doesn't match "started"
+REASON_KEYWORDS = {
+    'safety': ['safety', 'unsafe', r'accidents?', r'incidents?', 'dangerous', 'harassment', 'assault'],
+    'fraud': ['fraud', 'fraudulent', r'scams?', 'theft', 'stolen', 'not delivered', 'undelivered',
+              'incomplete deliveries', 'never received', 'gps spoofing', 'misuse'],
+    'ratings': [r'ratings?', r'stars?', 'satisfaction', r'customer complaints?', 'feedback'],
+    'completion': ['completion rate', r'cancel(?:s|led|ed|ing|lations?)?', 'acceptance rate', r'late deliver(?:y|ies)'],
+    'background': [r'background checks?', 'criminal', 'driving record', 'mvr', r'licen[cs]es?'],
+}
+
+REASON_PATTERNS = {
+    category: re.compile(r'\b(?:' + '|'.join(words) + r')\b', re.IGNORECASE)
+    for category, words in REASON_KEYWORDS.items()
+}
+
+# The clause runs to the end of the sentence; a '.' followed by a digit
+# (e.g. "below 4.6") is a decimal point, not the end
+REASON_CLAUSE_PATTERN = re.compile(
+    r'\b(?:due\s+to|because\s+of|because|as\s+a\s+result\s+of|for\s+(?:violating|violation\s+of))\s+((?:[^.;\n]|\.(?=\d)){8,200})',
+    re.IGNORECASE
+)
+
+RISK_BY_CATEGORY = {
+    'safety': 'High',
+    'fraud': 'High',
+    'background': 'High',
+    'ratings': 'Medium',
+    'completion': 'Low',
+}
+
+RECOMMENDATIONS_BY_CATEGORY = {
+    'safety': [
+        "Request the specific incident report, date and time from the platform",
+        "Gather dashcam footage, photos or witness statements for the incident",
+        "Write a factual, calm timeline of the trip or delivery in question",
+    ],
+    'fraud': [
+        "Collect GPS logs, delivery photos and timestamps for the disputed orders",
+        "Request the order numbers and customer reports the decision was based on",
+        "Show your delivery history and track record of completed orders",
+    ],
+    'ratings': [
+        "Export your ratings history and highlight your long-term average",
+        "Note any ratings caused by factors outside your control (restaurant delays, app errors)",
+        "Ask the platform which specific feedback led to the decision",
+    ],
+    'completion': [
+        "Document the reasons for cancellations (unsafe locations, app errors, low pay)",
+        "Check whether your state protects declining or cancelling low-paying orders",
+        "Show recent improvement in your completion or acceptance rate",
+    ],
+    'background': [
+        "Request a copy of the background check report (FCRA right)",
+        "Dispute any inaccurate records directly with the reporting agency",
+        "Provide documentation showing resolved or expunged records",
+    ],
+}
+
+DEFAULT_RECOMMENDATIONS = [
+    "Gather all delivery/ride records",
+    "Document your account history",
+    "Review platform terms of service",
+]
+
+
+def _to_int(token: Optional[str]) -> Optional[int]:
+    if not token:
+        return None
+    token = token.lower()
+    return int(token) if token.isdigit() else NUMBER_WORDS.get(token)
+
+
+def _sentences(text: str) -> List[str]:
+    return [s.strip() for s in re.split(r'(?<=[.!?])\s+|\n{2,}', text) if s.strip()]
+
+
+def extract_platform(text: str) -> Optional[str]:
+    """Return the most frequently mentioned platform, if any"""
+    counts = {name: len(pattern.findall(text)) for name, pattern in PLATFORM_PATTERNS.items()}
+    best = max(counts, key=counts.get)
+    return best if counts[best] else None
+
+
+def extract_deadline_days(text: str) -> Optional[int]:
+    """
+    Appeal deadline in days. For ranges ("7-10 days") the lower bound is used
+    so the worker is never told they have more time than they do.
+    """
+    for sentence in _sentences(text):
+        if not APPEAL_CONTEXT.search(sentence) or REVIEW_TIME_CONTEXT.search(sentence):
+            continue
+        match = DEADLINE_PATTERN.search(sentence)
+        if match:
+            numbers = [n for n in (_to_int(g) for g in match.groups()) if n]
+            if numbers:
+                return min(numbers)
+    return None
+
+
+def extract_dates(text: str) -> List[str]:
+    return list(dict.fromkeys(m.group(0) for m in DATE_PATTERN.finditer(text)))
+
+
+def extract_partner_ids(text: str) -> List[str]:
+    return list(dict.fromkeys(m.group(1) for m in PARTNER_ID_PATTERN.finditer(text)))
+
+
+def extract_reason(text: str) -> Dict[str, Any]:
+    """Find the reason clause and keyword category"""
+    keywords = {}
+    for category, pattern in REASON_PATTERNS.items():
+        found = list(dict.fromkeys(m.group(0).lower() for m in pattern.finditer(text)))
+        if found:
+            keywords[category] = found
+
+    # Prefer a "due to ..." clause from a sentence that mentions deactivation
+    clause = None
+    for sentence in _sentences(text):
+        if 'deactivat' in sentence.lower():
+            match = REASON_CLAUSE_PATTERN.search(sentence)
+            if match:
+                clause = match.group(1).strip().rstrip(',')
+                break
+
+    category = None
+    in_clause = [c for c in keywords if clause and REASON_PATTERNS[c].search(clause)]
+    if keywords:
+        category = in_clause[0] if in_clause else max(keywords, key=lambda c: len(keywords[c]))
+
+    return {
+        'clause': clause,
+        'category': category,
+        # A category guessed from elsewhere in the notice isn't enough to skip the LLM
+        'category_in_clause': bool(in_clause),
+        'keywords': keywords
+    }
+
+
+def _urgency(deadline_days: Optional[int]) -> str:
+    if deadline_days is None:
+        return 'MODERATE'
+    if deadline_days <= 7:
+        return 'URGENT'
+    if deadline_days <= 14:
+        return 'MODERATE'
+    return 'LOW'
+
+
+def pre_extract_notice(text: str) -> Dict[str, Any]:
+    """
+    Run all local extractors over a notice.
+    Returns the extracted fields, a full analysis dict in the
+    NoticeAnalyzeResponse shape, and whether it is confident enough to
+    skip the LLM.
+    """
+    platform = extract_platform(text)
+    deadline_days = extract_deadline_days(text)
+    dates = extract_dates(text)
+    partner_ids = extract_partner_ids(text)
+    reason = extract_reason(text)
+    category = reason['category']
+
+    missing_info = []
+    if not dates:
+        missing_info.append("Date of the incident")
+    if not partner_ids:
+        missing_info.append("Your account / partner ID")
+    if category in ('fraud', 'safety', None):
+        missing_info.append("Specific order or trip details the decision is based on")
+    if deadline_days is None:
+        missing_info.append("Deadline to submit an appeal")
+    missing_info.append("Evidence supporting your side (screenshots, GPS logs, messages)")
+
+    analysis = {
+        'platform': platform or 'Unknown',
+        'reason': reason['clause'] or (f"{category.title()} related deactivation" if category else 'Unable to determine'),
+        'urgency_level': _urgency(deadline_days),
+        'deadline_days': deadline_days,
+        'risk_level': RISK_BY_CATEGORY.get(category, 'Medium'),
+        'missing_info': missing_info,
+        'recommendations': list(RECOMMENDATIONS_BY_CATEGORY.get(category, DEFAULT_RECOMMENDATIONS)),
+    }
+
+    return {
+        'fields': {
+            'platform': platform,
+            'deadline_days': deadline_days,
+            'dates': dates,
+            'partner_ids': partner_ids,
+            'reason_clause': reason['clause'],
+            'reason_category': category,
+            'reason_keywords': reason['keywords'],
+        },
+        'analysis': analysis,
+        # A clause that stops right after a digit may have been cut short
+        # (e.g. a decimal rating), so let the LLM read the notice
+        'confident': bool(
+            platform and deadline_days is not None and reason['clause'] and reason['category_in_clause']
+            and not reason['clause'][-1].isdigit()
+        ),
+    }
@@ -0,0 +1,118 @@
+# backend/app/services/passages.py
+
+"""
+Heading-aware chunking of knowledge base articles into passages.
+Each passage is one retrieval unit (one vector) and keeps a pointer to its
+parent article so results can still be cited by article title.
+"""
+
+import re
+from typing import Dict, List, Any
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces (~1000 characters of English)
+MAX_PASSAGE_CHARS = 900
+MIN_PASSAGE_CHARS = 200
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+
+
+def _sections(content: str) -> List[Dict[str, Any]]:
+    """
+    Split markdown into sections at headings.
+    Returns [{'path': [(level, heading), ...], 'text': body}] in document order.
+    """
+    sections = []
+    path: List[tuple] = []
+    lines: List[str] = []
+
+    def flush():
+        text = '\n'.join(lines).strip()
+        if text:
+            sections.append({'path': list(path), 'text': text})
+        lines.clear()
+
+    for line in content.splitlines():
+        match = HEADING_PATTERN.match(line.strip())
+        if match:
+            flush()
+            level = len(match.group(1))
+            path = [h for h in path if h[0] < level] + [(level, match.group(2))]
+        else:
+            lines.append(line)
+    flush()
+    return sections
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    """Split a section body at paragraph, then line, boundaries to fit max_chars"""
+    if len(text) <= max_chars:
+        return [text]
+
+    parts, current = [], ''
+    blocks = re.split(r'\n\s*\n', text)
+    if len(blocks) == 1:
+        blocks = text.split('\n')
+
+    for block in blocks:
+        block = block.strip()
+        if not block:
+            continue
+        if current and len(current) + len(block) + 2 > max_chars:
+            parts.append(current)
+            current = ''
+        if len(block) > max_chars:
+            # A single very long paragraph: hard-wrap on sentence ends
+            for sentence in re.split(r'(?<=[.!?])\s+', block):
+                if current and len(current) + len(sentence) + 1 > max_chars:
+                    parts.append(current)
+                    current = ''
+                current = f"{current} {sentence}".strip()
+        else:
+            current = f"{current}\n\n{block}".strip()
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_passages(doc: Dict[str, Any], max_chars: int = MAX_PASSAGE_CHARS) -> List[Dict[str, Any]]:
+    """
+    Chunk an article into passages.
+    Sections under a heading become passages (long ones are split, short
+    neighbours under the same parent heading are merged). Articles without
+    headings are split by paragraphs. Short articles stay one passage.
+    """
+    content = (doc.get('content') or '').strip()
+    sections = _sections(content) or [{'path': [], 'text': content}]
+
+    # Merge short sections into the previous one while they share a top heading
+    merged: List[Dict[str, Any]] = []
+    for section in sections:
+        previous = merged[-1] if merged else None
+        if (previous
+                and len(previous['text']) < MIN_PASSAGE_CHARS
+                and previous['path'][:1] == section['path'][:1]
+                and len(previous['text']) + len(section['text']) <= max_chars):
+            heading = section['path'][-1][1] if section['path'] else ''
+            previous['text'] += f"\n\n{heading}\n{section['text']}" if heading else f"\n\n{section['text']}"
+            continue
+        merged.append({'path': section['path'], 'text': section['text']})
+
+    passages = []
+    for section in merged:
+        # The article's H1 just restates its title - keep it only for the intro
+        path = [heading for level, heading in section['path'] if level > 1] \
+            or [heading for _, heading in section['path']]
+        heading = ' > '.join(path)
+
+        for text in _split_long(section['text'], max_chars):
+            passages.append({
+                'id': f"{doc['id']}#p{len(passages)}",
+                'doc_id': doc['id'],
+                'position': len(passages),
+                'heading': heading,
+                'text': text
+            })
+
+    if not passages:
+        passages.append({'id': f"{doc['id']}#p0", 'doc_id': doc['id'], 'position': 0, 'heading': '', 'text': content})
+    return passages
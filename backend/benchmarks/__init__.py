@@ -0,0 +1,6 @@
+# backend/benchmarks/__init__.py
+
+"""
+Offline benchmarks. Nothing here talks to Firebase, Pinecone or Anthropic:
+stand-ins from benchmarks.fakes are installed before the app is imported.
+"""
@@ -0,0 +1,82 @@
+# backend/benchmarks/corpus.py
+
+"""
+Benchmark data: the knowledge base articles from the migration scripts and
+a labelled set of appeal inputs with the articles a good answer cites.
+Import after install_fake_firebase() - the scripts import app.core.firebase.
+"""
+
+from typing import Dict, List, Any
+
+
+def migration_articles() -> List[Dict[str, Any]]:
+    """Raw article dicts from every migration script, de-duplicated by id"""
+    from app.scripts.migrate_knowledge_base import get_articles
+    from app.scripts.add_phase1_states import get_phase1_articles
+    from app.scripts.add_phase2_states import get_phase2_articles
+    from app.scripts.add_platform_policies import get_platform_articles
+
+    articles = {}
+    for get in (get_articles, get_phase1_articles, get_phase2_articles, get_platform_articles):
+        for article in get():
+            articles[article['id']] = article
+    return list(articles.values())
+
+
+# Appeal inputs as users enter them -> articles a good answer should cite
+LABELLED_QUERIES = [
+    {'platform': 'DoorDash', 'state': 'California', 'reason': 'Customer ratings dropped below 4.2',
+     'expected': ['doordash-deactivation', 'ca-prop22', 'rating-deactivation']},
+    {'platform': 'Uber', 'state': 'California', 'reason': 'Suspected fraud on trip fares',
+     'expected': ['uber-deactivation', 'ca-prop22', 'fraud-accusations']},
+    {'platform': 'Lyft', 'state': 'California', 'reason': 'Too many cancelled rides',
+     'expected': ['lyft-deactivation', 'ca-prop22']},
+    {'platform': 'Instacart', 'state': 'California', 'reason': 'Low customer satisfaction',
+     'expected': ['instacart-deactivation', 'ca-prop22', 'rating-deactivation']},
+    {'platform': 'Uber', 'state': 'Washington', 'reason': 'Safety complaint from a rider',
+     'expected': ['uber-deactivation', 'wa-seattle-gig']},
+    {'platform': 'DoorDash', 'state': 'New York', 'reason': 'Order marked as not delivered',
+     'expected': ['doordash-deactivation', 'ny-gig-rights', 'fraud-accusations']},
+    {'platform': 'Amazon Flex', 'state': 'Texas', 'reason': 'Late to blocks, low completion rate',
+     'expected': ['amazon-flex-deactivation', 'tx-gig-laws', 'tx-appeal-guide']},
+    {'platform': 'DoorDash', 'state': 'Texas', 'reason': 'Rating below threshold',
+     'expected': ['doordash-deactivation', 'tx-gig-laws', 'tx-platform-apps']},
+    {'platform': 'Uber', 'state': 'Florida', 'reason': 'Background check flagged a record',
+     'expected': ['uber-deactivation', 'fl-gig-laws', 'fl-platform-apps']},
+    {'platform': 'Lyft', 'state': 'Illinois', 'reason': 'Passenger reviews',
+     'expected': ['lyft-deactivation', 'il-gig-laws', 'il-chicago-appeals']},
+    {'platform': 'Uber', 'state': 'Massachusetts', 'reason': 'Community guidelines policy violation',
+     'expected': ['uber-deactivation', 'ma-gig-laws', 'ma-appeal-strategy']},
+    {'platform': 'DoorDash', 'state': 'Colorado', 'reason': 'Acceptance rate too low',
+     'expected': ['doordash-deactivation', 'co-gig-laws']},
+    {'platform': 'Instacart', 'state': 'Oregon', 'reason': 'Bad ratings from customers',
+     'expected': ['instacart-deactivation', 'or-gig-laws', 'or-portland-appeals']},
+    {'platform': 'Grubhub', 'state': 'Minnesota', 'reason': 'Missed scheduled blocks',
+     'expected': ['grubhub-deactivation', 'mn-gig-worker-laws', 'mn-appeal-guide']},
+    {'platform': 'Shipt', 'state': 'Connecticut', 'reason': 'Member ratings',
+     'expected': ['shipt-deactivation', 'ct-gig-worker-laws', 'ct-appeal-strategies']},
+    {'platform': 'DoorDash', 'state': 'Rhode Island', 'reason': 'Accident during delivery',
+     'expected': ['doordash-deactivation', 'ri-gig-worker-laws', 'ri-seasonal-delivery-tips']},
+    {'platform': 'Uber', 'state': 'New Jersey', 'reason': 'Account flagged for fraud',
+     'expected': ['uber-deactivation', 'nj-gig-worker-laws', 'fraud-accusations']},
+    {'platform': 'Lyft', 'state': 'Pennsylvania', 'reason': 'Unsafe driving report',
+     'expected': ['lyft-deactivation', 'pa-gig-worker-laws']},
+    {'platform': 'Grubhub', 'state': 'Michigan', 'reason': 'Customer rating',
+     'expected': ['grubhub-deactivation', 'mi-gig-worker-laws', 'rating-deactivation']},
+    {'platform': 'Amazon Flex', 'state': 'Arizona', 'reason': 'Safety incident in extreme heat',
+     'expected': ['amazon-flex-deactivation', 'az-gig-worker-laws']},
+    {'platform': 'Uber', 'state': 'Nevada', 'reason': 'Stolen item accusation',
+     'expected': ['uber-deactivation', 'nv-gig-worker-laws', 'fraud-accusations']},
+    {'platform': 'Instacart', 'state': 'Georgia', 'reason': 'Cancelled batches',
+     'expected': ['instacart-deactivation', 'ga-gig-worker-laws']},
+    {'platform': 'DoorDash', 'state': 'North Carolina', 'reason': 'Rating',
+     'expected': ['doordash-deactivation', 'nc-gig-worker-laws', 'rating-deactivation']},
+    {'platform': 'Shipt', 'state': 'Wisconsin', 'reason': 'Policy violation',
+     'expected': ['shipt-deactivation', 'wi-gig-worker-laws']},
+    {'platform': 'Uber', 'state': 'Vermont', 'reason': 'Criminal background check',
+     'expected': ['uber-deactivation', 'vt-gig-worker-laws']},
+    {'platform': 'DoorDash', 'state': 'Maryland', 'reason': 'Theft of an order',
+     'expected': ['doordash-deactivation', 'md-gig-worker-laws', 'fraud-accusations']},
+    {'platform': 'Lyft', 'state': 'Virginia', 'reason': 'Low driver rating',
+     'expected': ['lyft-deactivation', 'va-gig-worker-laws', 'rating-deactivation']},
+]
@@ -0,0 +1,198 @@
+# backend/benchmarks/fake_anthropic.py
+
+"""
+Local stand-in for the Anthropic Messages API (POST /v1/messages).
+Point the app at it with ANTHROPIC_BASE_URL. Responses are canned but
+shaped like the real ones: text or a forced tool_use block, usage counts
+(with prompt-cache reads for repeated cache_control prefixes), and SSE
+events when the request sets "stream": true.
+
+Latency is modelled as time-to-first-token plus output tokens at a fixed
+rate, so slow-model behaviour can be simulated without a network.
+
+Usage (from backend/):
+    python -m benchmarks.fake_anthropic --port 8090 --ttft-ms 600 --tokens-per-second 80
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LETTER_PARAGRAPH = (
+    "I am writing to respectfully appeal the deactivation of my account. I have completed "
+    "hundreds of deliveries with consistently high ratings and believe this decision was made "
+    "in error. Under the applicable state protections I request a written explanation and a "
+    "human review of my case, and I have attached evidence supporting my account of events."
+)
+
+NOTICE_ANALYSIS = {
+    'platform': 'DoorDash',
+    'reason': 'Customer reports of undelivered orders',
+    'urgency_level': 'URGENT',
+    'deadline_days': 10,
+    'risk_level': 'High',
+    'missing_info': ['Order IDs', 'Delivery photos', 'GPS history', 'Account tenure'],
+    'recommendations': [
+        'Collect delivery photos and GPS logs for the flagged orders',
+        'Submit the appeal before the deadline',
+        'Reference the platform deactivation policy in the appeal'
+    ]
+}
+
+
+@dataclass
+class FakeAnthropicConfig:
+    ttft_ms: float = 400.0           # time to first token
+    jitter_ms: float = 100.0         # uniform +/- noise on ttft
+    tokens_per_second: float = 100.0
+    output_tokens: int = 300         # text responses (capped by max_tokens)
+    error_rate: float = 0.0          # fraction of requests answered 529 overloaded
+
+
+def _estimate_tokens(value: Any) -> int:
+    return max(1, len(json.dumps(value)) // 4)
+
+
+class FakeAnthropic:
+    def __init__(self, config: FakeAnthropicConfig):
+        self.config = config
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def _usage(self, body: Dict[str, Any], output_tokens: int) -> Dict[str, int]:
+        """Input tokens, split into cache writes/reads for cache_control prefixes"""
+        system = body.get('system') or []
+        cached = [block for block in system if isinstance(block, dict) and block.get('cache_control')] \
+            if isinstance(system, list) else []
+        cache_tokens = _estimate_tokens(cached) if cached else 0
+        total = _estimate_tokens(body.get('messages', [])) + _estimate_tokens(system)
+
+        usage = {'input_tokens': total - cache_tokens, 'output_tokens': output_tokens,
+                 'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0}
+        if cached:
+            key = hashlib.sha256(json.dumps(cached, sort_keys=True).encode()).hexdigest()
+            with self._lock:
+                hit = key in self._cached_prefixes
+                self._cached_prefixes.add(key)
+            usage['cache_read_input_tokens' if hit else 'cache_creation_input_tokens'] = cache_tokens
+        return usage
+
+    def _content(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        tool_choice = body.get('tool_choice') or {}
+        if tool_choice.get('type') == 'tool':
+            return [{'type': 'tool_use', 'id': f"toolu_{uuid.uuid4().hex[:24]}",
+                     'name': tool_choice['name'], 'input': NOTICE_ANALYSIS}]
+
+        words = min(self.config.output_tokens, body.get('max_tokens', 1024)) * 3 // 4
+        paragraph = LETTER_PARAGRAPH.split()
+        text = ' '.join(paragraph[i % len(paragraph)] for i in range(words))
+        return [{'type': 'text', 'text': text}]
+
+    def _ttft(self) -> float:
+        jitter = random.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        return max(0.0, self.config.ttft_ms + jitter) / 1000
+
+    def message(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        content = self._content(body)
+        output_tokens = _estimate_tokens(content)
+        return {
+            'id': f"msg_{uuid.uuid4().hex[:24]}",
+            'type': 'message',
+            'role': 'assistant',
+            'model': body.get('model', 'claude-fake'),
+            'content': content,
+            'stop_reason': 'tool_use' if content[0]['type'] == 'tool_use' else 'end_turn',
+            'stop_sequence': None,
+            'usage': self._usage(body, output_tokens)
+        }
+
+    async def respond(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.requests += 1
+        message = self.message(body)
+        await asyncio.sleep(self._ttft() + message['usage']['output_tokens'] / self.config.tokens_per_second)
+        return message
+
+    async def stream(self, body: Dict[str, Any]):
+        """SSE events in the order the real API sends them"""
+        self.requests += 1
+        message = self.message(body)
+        content, usage = message['content'], message['usage']
+
+        def event(name: str, data: Dict[str, Any]) -> str:
+            return f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n"
+
+        await asyncio.sleep(self._ttft())
+        yield event('message_start', {'message': {**message, 'content': [], 'stop_reason': None,
+                                                   'usage': {**usage, 'output_tokens': 1}}})
+        for index, block in enumerate(content):
+            if block['type'] == 'tool_use':
+                yield event('content_block_start', {'index': index, 'content_block': {**block, 'input': {}}})
+                yield event('content_block_delta', {'index': index, 'delta': {
+                    'type': 'input_json_delta', 'partial_json': json.dumps(block['input'])}})
+            else:
+                yield event('content_block_start', {'index': index, 'content_block': {'type': 'text', 'text': ''}})
+                words = block['text'].split(' ')
+                chunk = 8  # words per delta
+                for i in range(0, len(words), chunk):
+                    text = ' '.join(words[i:i + chunk]) + (' ' if i + chunk < len(words) else '')
+                    await asyncio.sleep(chunk * 4 / 3 / self.config.tokens_per_second)
+                    yield event('content_block_delta', {'index': index, 'delta': {'type': 'text_delta', 'text': text}})
+            yield event('content_block_stop', {'index': index})
+        yield event('message_delta', {'delta': {'stop_reason': message['stop_reason'], 'stop_sequence': None},
+                                      'usage': {'output_tokens': usage['output_tokens']}})
+        yield event('message_stop', {})
+
+
+def create_app(config: Optional[FakeAnthropicConfig] = None) -> FastAPI:
+    fake = FakeAnthropic(config or FakeAnthropicConfig())
+    app = FastAPI(title="Fake Anthropic API")
+    app.state.fake = fake
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        if fake.config.error_rate and random.random() < fake.config.error_rate:
+            return JSONResponse(status_code=529, content={
+                'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded (fake)'}})
+        if body.get('stream'):
+            return StreamingResponse(fake.stream(body), media_type='text/event-stream')
+        return JSONResponse(await fake.respond(body))
+
+    return app
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 8090,
+                    config: Optional[FakeAnthropicConfig] = None) -> uvicorn.Server:
+    """Run the fake server on a daemon thread; returns once it accepts connections"""
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-anthropic", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--ttft-ms", type=float, default=FakeAnthropicConfig.ttft_ms)
+    parser.add_argument("--jitter-ms", type=float, default=FakeAnthropicConfig.jitter_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=FakeAnthropicConfig.tokens_per_second)
+    parser.add_argument("--output-tokens", type=int, default=FakeAnthropicConfig.output_tokens)
+    parser.add_argument("--error-rate", type=float, default=FakeAnthropicConfig.error_rate)
+    args = parser.parse_args()
+
+    config = FakeAnthropicConfig(args.ttft_ms, args.jitter_ms, args.tokens_per_second, args.output_tokens, args.error_rate)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,463 @@
+# backend/benchmarks/fakes.py
+
+"""
+In-process stand-ins for the external services, for offline benchmarks:
+  InMemoryFirestore   - the subset of the Firestore client the app uses
+  InMemoryBucket      - the subset of the Cloud Storage bucket the app uses
+  InMemoryVectorIndex - brute-force cosine index with Pinecone's query API
+install_fake_firebase() swaps the Firebase Admin SDK for these before the
+app is imported, so app.core.firebase and its helpers run unchanged.
+"""
+
+import functools
+import io
+import sys
+import threading
+import types
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Any, Optional
+
+import numpy as np
+
+# Bearer tokens accepted by the fake auth verifier: "loadtest-<uid>"
+FAKE_TOKEN_PREFIX = "loadtest-"
+
+SERVER_TIMESTAMP = object()
+
+
+try:
+    # Same exception types as the real clients (google-api-core ships with firebase-admin)
+    from google.api_core.exceptions import AlreadyExists, NotFound
+except ImportError:
+    class AlreadyExists(Exception):
+        pass
+
+    class NotFound(Exception):
+        pass
+
+
+class Increment:
+    def __init__(self, value: int):
+        self.value = value
+
+
+def _resolve(current: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply field updates, expanding Increment and SERVER_TIMESTAMP sentinels"""
+    merged = dict(current)
+    for field, value in updates.items():
+        if isinstance(value, Increment):
+            value = (merged.get(field) or 0) + value.value
+        elif value is SERVER_TIMESTAMP:
+            value = datetime.now(timezone.utc)
+        merged[field] = value
+    return merged
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocument", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+
+class FakeDocument:
+    def __init__(self, store: "InMemoryFirestore", collection: str, doc_id: str):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def collection(self, name: str) -> "FakeCollection":
+        return FakeCollection(self._store, f"{self.path}/{name}")
+
+    def _docs(self) -> Dict[str, Dict[str, Any]]:
+        return self._store.collections.setdefault(self._collection, {})
+
+    def get(self, transaction: Optional["FakeTransaction"] = None) -> FakeSnapshot:
+        with self._store.lock:
+            data = self._docs().get(self.id)
+            return FakeSnapshot(self, dict(data) if data is not None else None)
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        with self._store.lock:
+            docs = self._docs()
+            docs[self.id] = _resolve(docs.get(self.id, {}) if merge else {}, data)
+
+    def create(self, data: Dict[str, Any]) -> None:
+        with self._store.lock:
+            docs = self._docs()
+            if self.id in docs:
+                raise AlreadyExists(f"Document already exists: {self.path}")
+            docs[self.id] = _resolve({}, data)
+
+    def update(self, data: Dict[str, Any]) -> None:
+        with self._store.lock:
+            docs = self._docs()
+            if self.id not in docs:
+                raise NotFound(f"No document to update: {self.path}")
+            docs[self.id] = _resolve(docs[self.id], data)
+
+    def delete(self) -> None:
+        with self._store.lock:
+            self._docs().pop(self.id, None)
+
+
+class FakeQuery:
+    OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+        '==': lambda a, b: a == b,
+        '!=': lambda a, b: a != b,
+        '<': lambda a, b: a is not None and a < b,
+        '<=': lambda a, b: a is not None and a <= b,
+        '>': lambda a, b: a is not None and a > b,
+        '>=': lambda a, b: a is not None and a >= b,
+        'in': lambda a, b: a in b,
+        'array_contains': lambda a, b: b in (a or []),
+    }
+
+    def __init__(self, store: "InMemoryFirestore", collection: str, filters=(), order=(), limit=None):
+        self._store = store
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._order = tuple(order)
+        self._limit = limit
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        return FakeQuery(self._store, self._collection, self._filters + ((field, op, value),), self._order, self._limit)
+
+    def order_by(self, field: str, direction: str = 'ASCENDING') -> "FakeQuery":
+        return FakeQuery(self._store, self._collection, self._filters, self._order + ((field, direction),), self._limit)
+
+    def limit(self, count: int) -> "FakeQuery":
+        return FakeQuery(self._store, self._collection, self._filters, self._order, count)
+
+    def stream(self):
+        with self._store.lock:
+            docs = [(doc_id, dict(data)) for doc_id, data in self._store.collections.get(self._collection, {}).items()]
+
+        matched = [
+            (doc_id, data) for doc_id, data in docs
+            if all(self.OPERATORS[op](data.get(field), value) for field, op, value in self._filters)
+        ]
+        for field, direction in reversed(self._order):
+            matched.sort(key=lambda item: (item[1].get(field) is None, item[1].get(field)),
+                         reverse=direction == 'DESCENDING')
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        return iter([FakeSnapshot(FakeDocument(self._store, self._collection, doc_id), data) for doc_id, data in matched])
+
+    def get(self) -> List[FakeSnapshot]:
+        return list(self.stream())
+
+    def on_snapshot(self, callback: Callable) -> SimpleNamespace:
+        """Live listeners aren't simulated: returns a watch that never fires"""
+        return SimpleNamespace(unsubscribe=lambda: None)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, store: "InMemoryFirestore", name: str):
+        super().__init__(store, name)
+        self.id = name.rsplit('/', 1)[-1]
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocument:
+        return FakeDocument(self._store, self._collection, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: Dict[str, Any]):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+
+class FakeWriteBatch:
+    """Buffers writes and applies them together on commit"""
+
+    def __init__(self, store: "InMemoryFirestore"):
+        self._store = store
+        self._writes: List[Callable[[], None]] = []
+
+    def set(self, ref: FakeDocument, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(lambda: ref.set(data, merge=merge))
+
+    def create(self, ref: FakeDocument, data: Dict[str, Any]) -> None:
+        self._writes.append(lambda: ref.create(data))
+
+    def update(self, ref: FakeDocument, data: Dict[str, Any]) -> None:
+        self._writes.append(lambda: ref.update(data))
+
+    def delete(self, ref: FakeDocument) -> None:
+        self._writes.append(ref.delete)
+
+    def commit(self) -> None:
+        with self._store.lock:
+            for write in self._writes:
+                write()
+        self._writes = []
+
+
+class FakeTransaction(FakeWriteBatch):
+    pass
+
+
+def transactional(fn: Callable) -> Callable:
+    """Run the function and its buffered writes under the store lock (serialisable)"""
+    @functools.wraps(fn)
+    def run(transaction: FakeTransaction, *args, **kwargs):
+        with transaction._store.lock:
+            result = fn(transaction, *args, **kwargs)
+            transaction.commit()
+        return result
+    return run
+
+
+class InMemoryFirestore:
+    """Dict-backed Firestore client: collection path -> document id -> data"""
+
+    def __init__(self):
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.lock = threading.RLock()
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction(self)
+
+
+class FakeBlob:
+    def __init__(self, bucket: "InMemoryBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+        self.cache_control = None
+        self.size = None
+        self.time_created = None
+        self.metadata = {}
+
+    def upload_from_string(self, data, content_type: Optional[str] = None) -> None:
+        data = data.encode() if isinstance(data, str) else bytes(data)
+        self.content_type = content_type
+        self.size = len(data)
+        self.time_created = datetime.now(timezone.utc)
+        with self.bucket.lock:
+            self.bucket.blobs[self.name] = (self, data)
+
+    def download_as_bytes(self) -> bytes:
+        with self.bucket.lock:
+            if self.name not in self.bucket.blobs:
+                raise NotFound(f"No such object: {self.name}")
+            return self.bucket.blobs[self.name][1]
+
+    def open(self, mode: str = 'rb', chunk_size: Optional[int] = None):
+        return io.BytesIO(self.download_as_bytes())
+
+    def exists(self) -> bool:
+        return self.name in self.bucket.blobs
+
+    def delete(self) -> None:
+        with self.bucket.lock:
+            if self.bucket.blobs.pop(self.name, None) is None:
+                raise NotFound(f"No such object: {self.name}")
+
+    def generate_signed_url(self, **kwargs) -> str:
+        return f"https://storage.invalid/{self.bucket.name}/{self.name}?signature={uuid.uuid4().hex}"
+
+
+class InMemoryBucket:
+    """Dict-backed Cloud Storage bucket: object name -> (blob, bytes)"""
+
+    def __init__(self, name: str = 'loadtest-bucket'):
+        self.name = name
+        self.blobs: Dict[str, tuple] = {}
+        self.lock = threading.RLock()
+        self.client = SimpleNamespace(batch=lambda: _NullContext())
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+    def get_blob(self, name: str) -> Optional[FakeBlob]:
+        with self.lock:
+            entry = self.blobs.get(name)
+        return entry[0] if entry else None
+
+    def copy_blob(self, blob: FakeBlob, destination: "InMemoryBucket", new_name: str) -> FakeBlob:
+        copy = destination.blob(new_name)
+        copy.upload_from_string(blob.download_as_bytes(), content_type=blob.content_type)
+        return copy
+
+    def list_blobs(self, prefix: str = '', delimiter: Optional[str] = None, page_size: Optional[int] = None):
+        with self.lock:
+            names = sorted(name for name in self.blobs if name.startswith(prefix))
+        blobs, prefixes = [], set()
+        for name in names:
+            rest = name[len(prefix):]
+            if delimiter and delimiter in rest:
+                prefixes.add(prefix + rest.split(delimiter, 1)[0] + delimiter)
+            else:
+                blobs.append(self.blobs[name][0])
+        return _BlobIterator(blobs, sorted(prefixes))
+
+
+class _BlobPage(list):
+    def __init__(self, blobs: List[FakeBlob], prefixes: List[str]):
+        super().__init__(blobs)
+        self.prefixes = prefixes
+
+
+class _BlobIterator:
+    """list_blobs result: a single page, iterable directly or via .pages"""
+
+    def __init__(self, blobs: List[FakeBlob], prefixes: List[str]):
+        self._page = _BlobPage(blobs, prefixes)
+        self.prefixes = set(prefixes)
+
+    @property
+    def pages(self):
+        return iter([self._page])
+
+    def __iter__(self):
+        return iter(self._page)
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def verify_id_token(id_token: str, app=None, check_revoked: bool = False) -> Dict[str, Any]:
+    """Fake auth verifier: any "loadtest-<uid>" token is valid for that uid"""
+    if not id_token or not id_token.startswith(FAKE_TOKEN_PREFIX):
+        raise ValueError("Not a load-test token")
+    uid = id_token[len(FAKE_TOKEN_PREFIX):]
+    return {'uid': uid, 'email': f"{uid}@loadtest.invalid", 'name': f"Load Test {uid}"}
+
+
+def install_fake_firebase(db: Optional[InMemoryFirestore] = None, bucket: Optional[InMemoryBucket] = None) -> InMemoryFirestore:
+    """
+    Replace the firebase_admin package (app, credentials, auth, firestore,
+    storage) with in-memory stand-ins. Must run before anything imports
+    app.core.firebase. Returns the Firestore stand-in for seeding.
+    """
+    db = db or InMemoryFirestore()
+    bucket = bucket or InMemoryBucket()
+    app = SimpleNamespace(name='[DEFAULT]', project_id='loadtest')
+
+    sdk = types.ModuleType('firebase_admin')
+    sdk.get_app = lambda name='[DEFAULT]': app
+    sdk.initialize_app = lambda credential=None, options=None, name='[DEFAULT]': app
+
+    credentials = types.ModuleType('firebase_admin.credentials')
+    credentials.Certificate = lambda info: info
+
+    auth = types.ModuleType('firebase_admin.auth')
+    auth.verify_id_token = verify_id_token
+
+    firestore = types.ModuleType('firebase_admin.firestore')
+    firestore.client = lambda app=None: db
+    firestore.transactional = transactional
+    firestore.Increment = Increment
+    firestore.SERVER_TIMESTAMP = SERVER_TIMESTAMP
+    firestore.Query = SimpleNamespace(ASCENDING='ASCENDING', DESCENDING='DESCENDING')
+
+    storage = types.ModuleType('firebase_admin.storage')
+    storage.bucket = lambda name=None, app=None: bucket
+
+    for name, module in (('credentials', credentials), ('auth', auth), ('firestore', firestore), ('storage', storage)):
+        setattr(sdk, name, module)
+        sys.modules[f'firebase_admin.{name}'] = module
+    sys.modules['firebase_admin'] = sdk
+    return db
+
+
+class InMemoryVectorIndex:
+    """
+    Exact cosine search over numpy matrices, one per namespace. Implements
+    the parts of the Pinecone Index API KnowledgeBaseService calls
+    (upsert, query with a doc_id $in filter, delete, describe_index_stats).
+    """
+
+    def __init__(self):
+        self._namespaces: Dict[str, Dict[str, Any]] = {}
+
+    def _namespace(self, name: str) -> Dict[str, Any]:
+        return self._namespaces.setdefault(name, {'ids': [], 'rows': {}, 'metadata': [], 'vectors': [], 'matrix': None})
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = '') -> None:
+        ns = self._namespace(namespace)
+        for vector in vectors:
+            values = np.asarray(vector['values'], dtype=np.float32)
+            values /= np.linalg.norm(values) or 1.0
+            row = ns['rows'].get(vector['id'])
+            if row is None:
+                ns['rows'][vector['id']] = len(ns['ids'])
+                ns['ids'].append(vector['id'])
+                ns['metadata'].append(vector.get('metadata') or {})
+                ns['vectors'].append(values)
+            else:
+                ns['metadata'][row] = vector.get('metadata') or {}
+                ns['vectors'][row] = values
+        ns['matrix'] = None
+
+    def delete(self, ids: List[str], namespace: str = '') -> None:
+        ns = self._namespace(namespace)
+        drop = set(ids)
+        kept = [i for i, vector_id in enumerate(ns['ids']) if vector_id not in drop]
+        ns['ids'] = [ns['ids'][i] for i in kept]
+        ns['metadata'] = [ns['metadata'][i] for i in kept]
+        ns['vectors'] = [ns['vectors'][i] for i in kept]
+        ns['rows'] = {vector_id: i for i, vector_id in enumerate(ns['ids'])}
+        ns['matrix'] = None
+
+    def describe_index_stats(self):
+        return SimpleNamespace(namespaces={
+            name: SimpleNamespace(vector_count=len(ns['ids'])) for name, ns in self._namespaces.items()
+        })
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        include_metadata: bool = False,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: str = ''
+    ):
+        ns = self._namespace(namespace)
+        if not ns['ids']:
+            return SimpleNamespace(matches=[])
+        if ns['matrix'] is None:
+            ns['matrix'] = np.vstack(ns['vectors'])
+            ns['doc_ids'] = np.array([m.get('doc_id', '') for m in ns['metadata']])
+
+        query = np.asarray(vector, dtype=np.float32)
+        scores = ns['matrix'] @ (query / (np.linalg.norm(query) or 1.0))
+
+        if filter:
+            # Only the filter KnowledgeBaseService sends: {'doc_id': {'$in': [...]}}
+            allowed = np.isin(ns['doc_ids'], list(filter['doc_id']['$in']))
+            scores = np.where(allowed, scores, -np.inf)
+
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return SimpleNamespace(matches=[
+            SimpleNamespace(
+                id=ns['ids'][row],
+                score=float(scores[row]),
+                metadata=ns['metadata'][row] if include_metadata else None
+            )
+            for row in top
+            if scores[row] != -np.inf
+        ])
@@ -0,0 +1,304 @@
+# backend/benchmarks/loadtest.py
+
+"""
+End-to-end load test for the FastAPI app, fully offline.
+
+Stand-ins:
+  Anthropic - benchmarks.fake_anthropic on a local port (ANTHROPIC_BASE_URL)
+  Firebase  - benchmarks.fakes in-memory Firestore/Storage behind the real
+              app.core.firebase helpers, seeded with the migration-script
+              knowledge base and the load-test users
+  Auth      - any "Bearer loadtest-<uid>" token is accepted
+  Pinecone  - not configured, so retrieval uses the keyword engine
+
+The app runs under uvicorn on its own thread and event loop. A probe task
+on that loop measures event-loop lag (how late a 10ms sleep wakes up);
+scenarios run one after another, so each scenario's lag is its endpoint's.
+The per-IP rate limiter is disabled - all load comes from one address.
+With --loop-watchdog the app's event-loop watchdog is enabled and each
+scenario prints the call sites that blocked the loop.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --concurrency 20 --duration 30
+    python -m benchmarks.loadtest --scenarios chat --ttft-ms 1500 --json chat.json
+    python -m benchmarks.loadtest --scenarios generate-appeal --loop-watchdog
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Any, Optional
+
+import httpx
+import uvicorn
+
+from benchmarks.corpus import LABELLED_QUERIES, migration_articles
+from benchmarks.fake_anthropic import FakeAnthropicConfig, start_in_thread
+from benchmarks.fakes import FAKE_TOKEN_PREFIX, InMemoryFirestore, install_fake_firebase
+from benchmarks.report import percentile, print_table, write_json
+
+LAG_PROBE_INTERVAL = 0.01
+
+# Notices the local rule-based extractor isn't confident about, so each one
+# goes to the (fake) model
+NOTICES = [
+    "We have decided to deactivate your account following a review of recent activity. "
+    "If you believe this is a mistake, reply to this message.",
+    "Your access to the platform has been suspended because of multiple customer reports "
+    "regarding orders that were not received.",
+    "After investigating a safety report submitted after one of your recent trips we have "
+    "permanently removed your account.",
+]
+
+CHAT_MESSAGES = [
+    "My DoorDash account was deactivated for a low rating in California. What are my rights?",
+    "How long do I have to appeal an Uber fraud deactivation in New York?",
+    "What evidence should I include in my appeal?",
+    "Does Seattle require platforms to give written notice before deactivation?",
+]
+
+
+class LoopLagProbe:
+    """Samples how late the event loop runs a sleep(interval) callback"""
+
+    def __init__(self, interval: float = LAG_PROBE_INTERVAL):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def drain(self) -> List[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+class AppServer:
+    """The GigShield app under uvicorn on a background thread, with a lag probe on its loop"""
+
+    def __init__(self, app, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.probe = LoopLagProbe()
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), name="app-server", daemon=True)
+
+    async def _serve(self) -> None:
+        probe = asyncio.create_task(self.probe.run())
+        try:
+            await self.server.serve()
+        finally:
+            probe.cancel()
+
+    def start(self) -> None:
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+# Scenarios: setup(client, headers) -> per-worker state; send(client, headers, state, i) -> response
+
+async def _no_setup(client: httpx.AsyncClient, headers: Dict[str, str]) -> Dict[str, Any]:
+    return {}
+
+
+async def send_analyze_notice(client, headers, state, i):
+    return await client.post("/api/analyze-notice", headers=headers, json={'notice_text': NOTICES[i % len(NOTICES)]})
+
+
+async def send_generate_appeal(client, headers, state, i):
+    case = LABELLED_QUERIES[i % len(LABELLED_QUERIES)]
+    return await client.post("/api/generate-appeal", headers=headers, json={
+        'platform': case['platform'],
+        'user_state': case['state'],
+        'deactivation_reason': case['reason'],
+        'user_story': "I have worked on the platform for three years and was deactivated without warning.",
+        'account_tenure': '3 years',
+        'current_rating': '4.8',
+        'completion_rate': '96%',
+        'total_deliveries': '2400'
+    })
+
+
+async def setup_chat(client: httpx.AsyncClient, headers: Dict[str, str]) -> Dict[str, Any]:
+    response = await client.post("/api/chat/sessions", headers=headers)
+    response.raise_for_status()
+    return {'session_id': response.json()['session_id']}
+
+
+async def send_chat(client, headers, state, i):
+    return await client.post("/api/chat", headers=headers, json={
+        'message': CHAT_MESSAGES[i % len(CHAT_MESSAGES)],
+        'session_id': state['session_id']
+    })
+
+
+async def send_mixed(client, headers, state, i):
+    senders = (send_generate_appeal, send_chat, send_analyze_notice)
+    return await senders[i % len(senders)](client, headers, state, i // len(senders))
+
+
+SCENARIOS: Dict[str, tuple] = {
+    'analyze-notice': (_no_setup, send_analyze_notice),
+    'generate-appeal': (_no_setup, send_generate_appeal),
+    'chat': (setup_chat, send_chat),
+    'mixed': (setup_chat, send_mixed),
+}
+
+
+def seed_firestore(db: InMemoryFirestore, users: int) -> None:
+    for article in migration_articles():
+        db.collection('knowledge_base').document(article['id']).set(article)
+    for n in range(users):
+        db.collection('users').document(f"user{n}").set({
+            'email': f"user{n}@loadtest.invalid",
+            'displayName': f"Load Test {n}",
+            'phoneNumber': '555-0100'
+        })
+
+
+async def run_scenario(
+    name: str,
+    server: AppServer,
+    concurrency: int,
+    duration: float,
+    llm_requests: Callable[[], int]
+) -> Dict[str, Any]:
+    """Closed-loop load: `concurrency` users each sending back-to-back requests for `duration` seconds"""
+    setup, send = SCENARIOS[name]
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=120, limits=limits) as client:
+        headers = [{'Authorization': f"Bearer {FAKE_TOKEN_PREFIX}user{n}"} for n in range(concurrency)]
+        states = await asyncio.gather(*(setup(client, h) for h in headers))
+
+        server.probe.drain()
+        llm_before = llm_requests()
+        started = time.perf_counter()
+        deadline = started + duration
+
+        async def user(n: int) -> None:
+            nonlocal errors
+            i = 0
+            while time.perf_counter() < deadline:
+                sent = time.perf_counter()
+                try:
+                    response = await send(client, headers[n], states[n], i)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - sent) * 1000)
+                i += 1
+
+        await asyncio.gather(*(user(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    lag = [sample * 1000 for sample in server.probe.drain()]
+    return {
+        'scenario': name,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 2),
+        'p50Ms': round(percentile(latencies, 50), 1),
+        'p95Ms': round(percentile(latencies, 95), 1),
+        'p99Ms': round(percentile(latencies, 99), 1),
+        'maxMs': round(max(latencies, default=0), 1),
+        'lagP50Ms': round(percentile(lag, 50), 1),
+        'lagP99Ms': round(percentile(lag, 99), 1),
+        'lagMaxMs': round(max(lag, default=0), 1),
+        'llmCalls': llm_requests() - llm_before
+    }
+
+
+def print_blocking_sites(report: Dict[str, Any]) -> None:
+    for route in report['routes']:
+        print(f"  {route['route']}: {route['blockedMs']}ms blocked over {route['stalls']} stalls")
+        for site in route['sites']:
+            print(f"    {site['blockedMs']:>8}ms  {site['site']}  (in {site['blockedIn']})")
+
+
+def main(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    db = install_fake_firebase()
+    os.environ.update({
+        'ANTHROPIC_API_KEY': 'sk-ant-REDACTED',
+        'ANTHROPIC_BASE_URL': f"http://127.0.0.1:{args.anthropic_port}",
+        'FIREBASE_PROJECT_ID': 'loadtest',
+        'PINECONE_API_KEY': '',  # set (empty) so load_dotenv can't enable Pinecone
+        'KB_WATCH_CHANGES': 'false',
+        'KB_WARM_CONTEXT_CACHE': 'false',
+        'EVIDENCE_GC_INTERVAL_HOURS': '0',
+        'LOOP_WATCHDOG_ENABLED': 'true' if args.loop_watchdog else 'false',
+    })
+    seed_firestore(db, args.concurrency)
+
+    fake_llm = start_in_thread(port=args.anthropic_port, config=FakeAnthropicConfig(
+        ttft_ms=args.ttft_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens
+    ))
+
+    import app.main as app_main
+    from app.core.loop_watchdog import loop_watchdog
+    app_main.rate_limiter.is_rate_limited = lambda identifier, endpoint="general": False
+
+    server = AppServer(app_main.app, args.port)
+    server.start()
+    print(f"✓ App on {server.base_url}, fake Anthropic on :{args.anthropic_port}")
+
+    rows = []
+    try:
+        for name in args.scenarios:
+            row = asyncio.run(run_scenario(
+                name, server, args.concurrency, args.duration,
+                llm_requests=lambda: fake_llm.config.app.state.fake.requests
+            ))
+            rows.append(row)
+            print(f"✓ {name}: {row['rps']} rps, p99 {row['p99Ms']}ms, loop lag p99 {row['lagP99Ms']}ms, "
+                  f"{row['errors']} errors")
+            if args.loop_watchdog:
+                print_blocking_sites(loop_watchdog.report(top=3))
+                loop_watchdog.reset()
+    finally:
+        server.stop()
+        fake_llm.should_exit = True
+
+    from app.services.ai_service import ai_service
+    print(f"\nToken usage: {ai_service.usage_stats}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test")
+    parser.add_argument("--scenarios", choices=list(SCENARIOS), nargs="+",
+                        default=['analyze-notice', 'generate-appeal', 'chat'])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--anthropic-port", type=int, default=8766)
+    parser.add_argument("--ttft-ms", type=float, default=FakeAnthropicConfig.ttft_ms)
+    parser.add_argument("--jitter-ms", type=float, default=FakeAnthropicConfig.jitter_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=FakeAnthropicConfig.tokens_per_second)
+    parser.add_argument("--output-tokens", type=int, default=FakeAnthropicConfig.output_tokens)
+    parser.add_argument("--loop-watchdog", action="store_true", help="report call sites that block the event loop")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    rows = main(args)
+    print_table(rows, ['scenario', 'requests', 'errors', 'rps', 'p50Ms', 'p95Ms', 'p99Ms',
+                       'lagP50Ms', 'lagP99Ms', 'llmCalls'])
+    if args.json:
+        write_json(rows, args.json)
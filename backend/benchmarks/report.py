@@ -0,0 +1,28 @@
+# backend/benchmarks/report.py
+
+"""Percentiles and result output shared by the benchmark scripts"""
+
+import json
+from typing import Dict, List, Any
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (0 for no samples)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def print_table(rows: List[Dict[str, Any]], columns: List[str], width: int = 9) -> None:
+    print()
+    print(' | '.join(f"{c:>{width}}" for c in columns))
+    print('-+-'.join('-' * width for _ in columns))
+    for row in rows:
+        print(' | '.join(f"{row.get(c, ''):>{width}}" for c in columns))
+
+
+def write_json(rows: List[Dict[str, Any]], path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(rows, f, indent=2)
+    print(f"✓ Wrote {path}")
@@ -0,0 +1,176 @@
+# backend/benchmarks/retrieval.py
+
+"""
+Offline retrieval benchmark for KnowledgeBaseService.
+
+Runs a labelled set of (platform, state, reason) appeal inputs through the
+RAG retrieval path (context_passages, the same call get_relevant_context
+makes) and reports, per retrieval mode and corpus size:
+  recall@k  - share of the expected articles among the first k cited articles
+  MRR       - mean reciprocal rank of the first expected article
+  p50 / p99 - retrieval latency with cold embedding and fused-result caches
+
+The corpus is the articles from the migration scripts plus synthetic filler
+articles (built from shuffled sentences of the real ones, so they compete
+on vocabulary) up to each size. Vectors go into an in-memory exact index,
+so vector numbers measure the embedding and ranking, not Pinecone's network.
+
+Usage (from backend/):
+    python -m benchmarks.retrieval --sizes 100 10000 100000
+    python -m benchmarks.retrieval --modes keyword --sizes 100 --json results.json
+"""
+
+import argparse
+import os
+import random
+import re
+import time
+from typing import Dict, List, Any
+
+from benchmarks.corpus import LABELLED_QUERIES, migration_articles
+from benchmarks.fakes import InMemoryVectorIndex, install_fake_firebase
+from benchmarks.report import percentile, print_table, write_json
+
+# Keep the app offline: in-memory Firebase, no Pinecone (set empty so
+# load_dotenv can't fill it in from .env), no live listener
+install_fake_firebase()
+os.environ["PINECONE_API_KEY"] = ""
+os.environ["KB_WATCH_CHANGES"] = "false"
+
+from app.services.knowledge_base import KnowledgeBaseService  # noqa: E402
+
+MODES = ('keyword', 'vector', 'hybrid')
+DEFAULT_SIZES = (100, 10000, 100000)
+K_VALUES = (3, 5, 10)
+
+FILLER_TOPICS = [
+    'Driver FAQ', 'Earnings Update', 'Community Forum Thread', 'Support Transcript',
+    'Promotion Terms', 'Onboarding Checklist', 'Insurance Notes', 'Tax Season Tips'
+]
+
+
+def load_articles() -> List[Dict[str, Any]]:
+    """Articles from the migration scripts, as the service loads them from Firestore"""
+    return [KnowledgeBaseService._normalize_document(article) for article in migration_articles()]
+
+
+def synthetic_corpus(articles: List[Dict[str, Any]], size: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """The real articles plus filler articles up to `size` documents"""
+    rng = random.Random(seed)
+    sentences = [
+        s.strip() for article in articles
+        for s in re.split(r'(?<=[.!?])\s+|\n+', article['content'])
+        if 40 <= len(s.strip()) <= 250 and not s.strip().startswith('#')
+    ]
+    tags = sorted({tag for article in articles for tag in article['tags']})
+    categories = sorted({article['category'] for article in articles})
+    states = sorted({article['state'] for article in articles})
+    platforms = sorted({p.strip() for article in articles for p in article['platform'].split(',')})
+
+    corpus = list(articles)
+    for i in range(max(0, size - len(articles))):
+        platform = rng.choice(platforms)
+        state = rng.choice(states)
+        title = f"{platform if platform != 'All' else 'Gig Work'} {rng.choice(FILLER_TOPICS)} #{i}"
+        body = ' '.join(rng.sample(sentences, rng.randint(4, 7)))
+        corpus.append({
+            'id': f"synthetic-{i:06d}",
+            'title': title,
+            'category': rng.choice(categories),
+            'state': state,
+            'platform': platform,
+            'content': f"# {title}\n\n{body}",
+            'tags': rng.sample(tags, rng.randint(2, 4))
+        })
+    return corpus
+
+
+def set_mode(service: KnowledgeBaseService, mode: str, has_vectors: bool) -> None:
+    service.use_pinecone = has_vectors and mode != 'keyword'
+    service.retrieval_mode = mode
+
+
+def cited_articles(passages: List[Dict[str, Any]]) -> List[str]:
+    """Article ids in the order their first passage was retrieved"""
+    seen = []
+    for passage in passages:
+        if passage['id'] not in seen:
+            seen.append(passage['id'])
+    return seen
+
+
+def evaluate(service: KnowledgeBaseService, repeats: int) -> Dict[str, Any]:
+    """recall@k, MRR and latency percentiles over LABELLED_QUERIES"""
+    max_k = max(K_VALUES)
+    recalls = {k: [] for k in K_VALUES}
+    reciprocal_ranks, latencies = [], []
+
+    for case in LABELLED_QUERIES:
+        key = service._normalize_context_key(case['platform'], case['state'], case['reason'])
+        service.context_passages(*key, top_k=max_k, reason_text=case['reason'])  # warm up models and code paths
+
+        for _ in range(repeats):
+            service._fused_cache.clear()
+            service._embedding_cache.clear()
+            started = time.perf_counter()
+            passages = service.context_passages(*key, top_k=max_k, reason_text=case['reason'])
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        ranked = cited_articles(passages)
+        expected = set(case['expected'])
+        for k in K_VALUES:
+            recalls[k].append(len(expected & set(ranked[:k])) / len(expected))
+        first = next((rank for rank, doc_id in enumerate(ranked, 1) if doc_id in expected), None)
+        reciprocal_ranks.append(1 / first if first else 0.0)
+
+    return {
+        **{f"recall@{k}": round(sum(values) / len(values), 4) for k, values in recalls.items()},
+        'mrr': round(sum(reciprocal_ranks) / len(reciprocal_ranks), 4),
+        'p50Ms': round(percentile(latencies, 50), 2),
+        'p99Ms': round(percentile(latencies, 99), 2),
+        'queries': len(LABELLED_QUERIES),
+        'samples': len(latencies)
+    }
+
+
+def run(sizes: List[int], modes: List[str], repeats: int, seed: int) -> List[Dict[str, Any]]:
+    articles = load_articles()
+    needs_vectors = any(mode != 'keyword' for mode in modes)
+    rows = []
+
+    for size in sizes:
+        corpus = synthetic_corpus(articles, size, seed)
+        started = time.perf_counter()
+        service = KnowledgeBaseService(
+            documents=corpus,
+            index=InMemoryVectorIndex() if needs_vectors else None
+        )
+        build_seconds = round(time.perf_counter() - started, 2)
+        print(f"✓ Built {len(corpus)}-document knowledge base in {build_seconds}s")
+
+        try:
+            for mode in modes:
+                set_mode(service, mode, needs_vectors)
+                result = {'size': len(corpus), 'mode': mode, 'buildSeconds': build_seconds,
+                          **evaluate(service, repeats)}
+                rows.append(result)
+                print(f"✓ {mode:<7} @ {len(corpus):>6}: recall@3={result['recall@3']:.3f} "
+                      f"mrr={result['mrr']:.3f} p50={result['p50Ms']}ms p99={result['p99Ms']}ms")
+        finally:
+            service.shutdown()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Knowledge base retrieval benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--modes", choices=MODES, nargs="+", default=list(MODES))
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per query")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    rows = run(args.sizes, args.modes, args.repeats, args.seed)
+    print_table(rows, ['size', 'mode'] + [f"recall@{k}" for k in K_VALUES] + ['mrr', 'p50Ms', 'p99Ms'])
+    if args.json:
+        write_json(rows, args.json)
@@ -0,0 +1,47 @@
+"""
+Test script for the local notice pre-extraction (no API calls)
+"""
+
+import sys
+sys.path.append('.')
+
+from app.services.notice_rules import pre_extract_notice
+
+
+def test_decimal_rating_stays_in_reason_clause():
+    """A decimal point ("4.6") must not end the reason clause"""
+    result = pre_extract_notice(
+        "Your Uber account has been deactivated because your rating fell below 4.6 "
+        "over your last 500 trips. You may appeal within thirty (30) days."
+    )
+    assert result['fields']['reason_clause'] == "your rating fell below 4.6 over your last 500 trips"
+    assert result['fields']['reason_category'] == 'ratings'
+    assert result['confident']
+
+
+def test_clause_ending_in_a_digit_is_not_confident():
+    """A clause that stops right after a number may be cut short - leave it to the LLM"""
+    result = pre_extract_notice(
+        "Your Uber account has been deactivated because your rating fell below 4.6. "
+        "You may appeal within thirty (30) days."
+    )
+    assert result['fields']['reason_clause'] == "your rating fell below 4.6"
+    assert not result['confident']
+
+
+def test_review_boilerplate_is_not_a_ratings_keyword():
+    """"We will review your appeal" says nothing about ratings"""
+    result = pre_extract_notice(
+        "Your DoorDash account has been deactivated due to fraudulent activity on recent orders. "
+        "We will review your appeal within 10 days."
+    )
+    assert 'ratings' not in result['fields']['reason_keywords']
+    assert result['fields']['reason_category'] == 'fraud'
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
+    print("✓ Notice rules checks passed")
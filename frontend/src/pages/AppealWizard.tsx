@@ -1,6 +1,6 @@
 import { useState } from 'react';
 import { ArrowLeft, Check, Upload, Sparkles, AlertCircle, X, FileText, Image } from 'lucide-react';
-import { generateAppeal, uploadEvidence } from '../services/apiService';
+import { generateAppeal, uploadEvidenceDirect } from '../services/apiService';
 import { auth } from '../config/firebase';
 import jsPDF from 'jspdf';
 
@@ -517,13 +517,13 @@ const AppealWizard = ({ onNavigate, prefilledData }: AppealWizardProps) => {
       // Re-upload files with the actual case_id to attach them properly
       try {
         if (uploadedNoticeFile && uploadedNoticeFile.file) {
-          await uploadEvidence(uploadedNoticeFile.file, result.appeal_id);
+          await uploadEvidenceDirect(uploadedNoticeFile.file, result.appeal_id);
           console.log('✓ Attached notice file to case:', result.appeal_id);
         }
         
         for (const uploadedFile of uploadedFiles) {
           if (uploadedFile.file) {
-            await uploadEvidence(uploadedFile.file, result.appeal_id);
+            await uploadEvidenceDirect(uploadedFile.file, result.appeal_id);
             console.log('✓ Attached evidence file to case:', uploadedFile.filename);
           }
         }
@@ -597,7 +597,7 @@ const AppealWizard = ({ onNavigate, prefilledData }: AppealWizardProps) => {
       }
 
       // Upload file
-      const result = await uploadEvidence(file);
+      const result = await uploadEvidenceDirect(file);
       
       // Set uploaded notice file with original File object
       setUploadedNoticeFile({
@@ -649,7 +649,7 @@ const AppealWizard = ({ onNavigate, prefilledData }: AppealWizardProps) => {
       }
 
       // Upload file
-      const result = await uploadEvidence(file);
+      const result = await uploadEvidenceDirect(file);
       
       // Add to uploaded files list with original File object
       setUploadedFiles([...uploadedFiles, {
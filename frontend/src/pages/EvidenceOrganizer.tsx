@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Upload, FileText, Image, Trash2, Download, AlertCircle, ArrowLeft, CheckCircle, XCircle } from 'lucide-react';
 import { useAuth } from '../hooks/useAuths';
-import { getMyAppeals } from '../services/apiService';
+import { getMyAppeals, uploadEvidenceDirect } from '../services/apiService';
 
 interface EvidenceOrganizerProps {
   onNavigate: (page: string) => void;
@@ -15,6 +15,9 @@ interface Appeal {
   createdAt: string;
 }
 
+// Gallery URLs are guaranteed valid for 15 minutes; reuse them for 10 at most
+const DOWNLOAD_URL_REUSE_MS = 10 * 60 * 1000;
+
 interface EvidenceItem {
   id: string;
   filename: string;
@@ -24,6 +27,9 @@ interface EvidenceItem {
   uploadedAt: string;
   storagePath: string;
   caseId: string;
+  downloadUrl?: string | null;
+  thumbnailUrl?: string;
+  previewUrl?: string;
 }
 
 const EvidenceOrganizer = ({ onNavigate }: EvidenceOrganizerProps) => {
@@ -31,6 +37,7 @@ const EvidenceOrganizer = ({ onNavigate }: EvidenceOrganizerProps) => {
   const [appeals, setAppeals] = useState<Appeal[]>([]);
   const [selectedCase, setSelectedCase] = useState<Appeal | null>(null);
   const [evidenceItems, setEvidenceItems] = useState<EvidenceItem[]>([]);
+  const [evidenceLoadedAt, setEvidenceLoadedAt] = useState(0);
   const [isLoading, setIsLoading] = useState(true);
   const [isUploading, setIsUploading] = useState(false);
   const [uploadError, setUploadError] = useState('');
@@ -62,7 +69,7 @@ const EvidenceOrganizer = ({ onNavigate }: EvidenceOrganizerProps) => {
       
       try {
         const token = await user.getIdToken();
-        const response = await fetch(`http://localhost:8000/api/cases/${selectedCase.id}/evidence`, {
+        const response = await fetch(`http://localhost:8000/api/cases/${selectedCase.id}/evidence/download-urls`, {
           headers: {
             'Authorization': `Bearer ${token}`
           }
@@ -73,6 +80,7 @@ const EvidenceOrganizer = ({ onNavigate }: EvidenceOrganizerProps) => {
           // Ensure we only set valid evidence items
           if (data.evidence && Array.isArray(data.evidence)) {
             setEvidenceItems(data.evidence);
+            setEvidenceLoadedAt(Date.now());
           } else {
             console.error('Invalid evidence data format:', data);
             setEvidenceItems([]);
@@ -112,52 +120,13 @@ const EvidenceOrganizer = ({ onNavigate }: EvidenceOrganizerProps) => {
     setSuccessMessage('');
 
     try {
-      const token = await user.getIdToken();
-      const formData = new FormData();
-      formData.append('file', file);
-      formData.append('case_id', selectedCase.id);
-
-      // Debug logging
-      console.log('Uploading file:', {
-        fileName: file.name,
-        fileType: file.type,
-        fileSize: file.size,
-        caseId: selectedCase.id
-      });
-
-      const response = await fetch('http://localhost:8000/api/upload-evidence', {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`
-        },
-        body: formData
-      });
-
-      if (!response.ok) {
-        const errorText = await response.text();
-        let errorMessage = 'Failed to upload';
-        try {
-          const error = JSON.parse(errorText);
-          errorMessage = error.detail || errorMessage;
-        } catch {
-          errorMessage = errorText || errorMessage;
-        }
-        console.error('Upload error details:', {
-          status: response.status,
-          statusText: response.statusText,
-          error: errorMessage,
-          fileName: file.name,
-          fileType: file.type,
-          fileSize: file.size
-        });
-        throw new Error(errorMessage);
-      }
-
-      const result = await response.json();
+      // Upload straight to Storage via a signed URL (bytes skip the API server)
+      await uploadEvidenceDirect(file, selectedCase.id);
       setSuccessMessage('Evidence uploaded successfully!');
       
       // Reload evidence list
-      const evidenceResponse = await fetch(`http://localhost:8000/api/cases/${selectedCase.id}/evidence`, {
+      const token = await user.getIdToken();
+      const evidenceResponse = await fetch(`http://localhost:8000/api/cases/${selectedCase.id}/evidence/download-urls`, {
         headers: {
           'Authorization': `Bearer ${token}`
         }
@@ -166,6 +135,7 @@ const EvidenceOrganizer = ({ onNavigate }: EvidenceOrganizerProps) => {
       if (evidenceResponse.ok) {
         const data = await evidenceResponse.json();
         setEvidenceItems(data.evidence);
+        setEvidenceLoadedAt(Date.now());
       }
 
       // Clear the file input
@@ -206,6 +176,13 @@ const EvidenceOrganizer = ({ onNavigate }: EvidenceOrganizerProps) => {
   const handleDownload = async (evidenceId: string, filename: string) => {
     if (!user) return;
 
+    // Use the URL signed when the gallery was loaded, while it is still fresh
+    const cachedUrl = evidenceItems.find(item => item.id === evidenceId)?.downloadUrl;
+    if (cachedUrl && Date.now() - evidenceLoadedAt < DOWNLOAD_URL_REUSE_MS) {
+      window.open(cachedUrl, '_blank');
+      return;
+    }
+
     try {
       const token = await user.getIdToken();
       const response = await fetch(`http://localhost:8000/api/evidence/${evidenceId}/download`, {
@@ -417,7 +394,16 @@ const EvidenceOrganizer = ({ onNavigate }: EvidenceOrganizerProps) => {
                 >
                   <div className="flex items-center justify-between">
                     <div className="flex items-center gap-4 flex-1">
-                      {getFileIcon(item.contentType)}
+                      {item.thumbnailUrl || item.previewUrl ? (
+                        <img
+                          src={item.thumbnailUrl || item.previewUrl}
+                          alt={item.originalFilename || item.filename}
+                          loading="lazy"
+                          className="w-16 h-16 object-cover rounded border border-slate-200"
+                        />
+                      ) : (
+                        getFileIcon(item.contentType)
+                      )}
                       <div className="flex-1 min-w-0">
                         <p className="font-medium text-slate-800 truncate">
                           {item.originalFilename || item.filename || 'Unknown File'}
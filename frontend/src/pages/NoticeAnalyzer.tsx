@@ -1,11 +1,7 @@
 import { useState } from 'react';
 import { Upload, AlertCircle, CheckCircle, XCircle, AlertTriangle, Info, TrendingUp, ArrowRight, Sparkles, FileText, Shield, Clock } from 'lucide-react';
-import { analyzeNotice as analyzeNoticeAPI } from '../services/apiService';
-import * as pdfjsLib from 'pdfjs-dist/legacy/build/pdf.mjs';
-import pdfjsWorker from 'pdfjs-dist/legacy/build/pdf.worker.mjs?url';
-
-// Configure PDF.js worker
-pdfjsLib.GlobalWorkerOptions.workerSrc = pdfjsWorker;
+import { analyzeNotice as analyzeNoticeAPI, analyzeNoticeFile } from '../services/apiService';
+import type { NoticeAnalysisResult } from '../services/apiService';
 
 interface NoticeAnalyzerProps {
   onNavigate: (page: string) => void;
@@ -49,26 +45,12 @@ const NoticeAnalyzer = ({ onNavigate, onAnalysisComplete }: NoticeAnalyzerProps)
     setError('');
     
     try {
-      // Call real backend API
-      const result = await analyzeNoticeAPI(text);
-      
-      // Map API response to our component state
-      const mappedResult: AnalysisResult = {
-        platform: result.platform,
-        reason: result.reason,
-        category: result.urgency_level, // Using urgency as category for now
-        deactivationDate: new Date().toISOString().split('T')[0],
-        appealDeadline: result.deadline_days 
-          ? new Date(Date.now() + result.deadline_days * 24 * 60 * 60 * 1000).toISOString().split('T')[0]
-          : '',
-        daysRemaining: result.deadline_days || 30,
-        missingInfo: result.missing_info,
-        riskLevel: mapRiskLevel(result.risk_level),
-        successRate: 68, // Mock for now
-        extracted: true,
-      };
+      // Call real backend API (files without pasted text are extracted server-side)
+      const result = !text.trim() && uploadedFile
+        ? await analyzeNoticeFile(uploadedFile)
+        : await analyzeNoticeAPI(text);
       
-      setAnalysisResult(mappedResult);
+      applyAnalysisResult(result);
     } catch (err: any) {
       console.error('Analysis error:', err);
       setError(err.message || 'Failed to analyze notice. Please try again.');
@@ -77,6 +59,26 @@ const NoticeAnalyzer = ({ onNavigate, onAnalysisComplete }: NoticeAnalyzerProps)
     }
   };
 
+  // Map API response to our component state
+  const applyAnalysisResult = (result: NoticeAnalysisResult) => {
+    const mappedResult: AnalysisResult = {
+      platform: result.platform,
+      reason: result.reason,
+      category: result.urgency_level, // Using urgency as category for now
+      deactivationDate: new Date().toISOString().split('T')[0],
+      appealDeadline: result.deadline_days 
+        ? new Date(Date.now() + result.deadline_days * 24 * 60 * 60 * 1000).toISOString().split('T')[0]
+        : '',
+      daysRemaining: result.deadline_days || 30,
+      missingInfo: result.missing_info,
+      riskLevel: mapRiskLevel(result.risk_level),
+      successRate: 68, // Mock for now
+      extracted: true,
+    };
+    
+    setAnalysisResult(mappedResult);
+  };
+
   // Fetch case score from backend
   const fetchCaseScore = async (caseId: string) => {
     setIsLoadingScore(true);
@@ -249,48 +251,25 @@ const NoticeAnalyzer = ({ onNavigate, onAnalysisComplete }: NoticeAnalyzerProps)
       reader.readAsDataURL(file);
     } else if (file.type === 'application/pdf') {
       setFilePreview('');
-      // Try to extract text from PDF
-      await extractPDFText(file);
+      // Extract text from PDF on the server
+      await extractNoticeText(file);
     }
   };
 
-  // Extract text from PDF
-  const extractPDFText = async (file: File) => {
+  // Extract text from PDF/image on the server and analyze it
+  const extractNoticeText = async (file: File) => {
     setIsExtracting(true);
+    setIsAnalyzing(true);
     try {
-      const arrayBuffer = await file.arrayBuffer();
-      const loadingTask = pdfjsLib.getDocument({ data: arrayBuffer });
-      const pdf = await loadingTask.promise;
-      
-      let fullText = '';
-      
-      // Extract text from all pages
-      for (let i = 1; i <= pdf.numPages; i++) {
-        const page = await pdf.getPage(i);
-        const textContent = await page.getTextContent();
-        const pageText = textContent.items
-          .map((item: any) => item.str)
-          .join(' ');
-        fullText += pageText + '\n';
-      }
-      
-      // Set extracted text
-      const extractedText = fullText.trim();
-      if (!extractedText) {
-        setError('PDF appears to be empty or contains only images. Please paste the text manually.');
-        return;
-      }
-      
-      console.log('PDF text extracted successfully, length:', extractedText.length);
-      
-      // Automatically analyze the extracted text (without showing it in the textarea)
-      await analyzeNotice(extractedText);
+      const result = await analyzeNoticeFile(file);
+      console.log(`Notice text extracted on server (${result.extraction_method}), length:`, result.extracted_text.length);
+      applyAnalysisResult(result);
     } catch (err: any) {
-      console.error('PDF extraction error:', err);
-      console.error('Error details:', err?.message, err?.name);
-      setError(`Failed to extract text from PDF: ${err?.message || 'Unknown error'}. Please paste the text manually.`);
+      console.error('Notice extraction error:', err);
+      setError(`Failed to extract text from file: ${err?.message || 'Unknown error'}. Please paste the text manually.`);
     } finally {
       setIsExtracting(false);
+      setIsAnalyzing(false);
     }
   };
 
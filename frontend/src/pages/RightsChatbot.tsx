@@ -25,6 +25,7 @@ const RightsChatbot = ({ onNavigate }: RightsChatbotProps) => {
   ]);
   const [input, setInput] = useState('');
   const [isTyping, setIsTyping] = useState(false);
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   const scrollToBottom = () => {
@@ -67,10 +68,11 @@ const RightsChatbot = ({ onNavigate }: RightsChatbotProps) => {
 
     try {
       // Call RAG-powered backend
-      const response = await chatWithBot(currentInput, messages.map(m => ({
-        role: m.type === 'user' ? 'user' : 'assistant',
-        content: m.text
-      })));
+      // History lives on the server; only the new message is sent
+      const response = await chatWithBot(currentInput, sessionId);
+      if (response.session_id) {
+        setSessionId(response.session_id);
+      }
 
       const botMessage: Message = {
         id: messages.length + 2,
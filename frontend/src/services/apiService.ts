@@ -101,6 +101,38 @@ export const analyzeNotice = async (noticeText: string): Promise<NoticeAnalysisR
   return await response.json();
 };
 
+export interface NoticeFileAnalysisResult extends NoticeAnalysisResult {
+  extracted_text: string;
+  extraction_method: string;
+  page_count: number;
+}
+
+/**
+ * Analyze a deactivation notice file (PDF or image).
+ * Text extraction and OCR happen on the server.
+ */
+export const analyzeNoticeFile = async (file: File): Promise<NoticeFileAnalysisResult> => {
+  const token = await getAuthToken();
+  
+  const formData = new FormData();
+  formData.append('file', file);
+  
+  const response = await fetch(`${API_BASE_URL}/api/analyze-notice-file`, {
+    method: 'POST',
+    headers: {
+      'Authorization': `Bearer ${token}`
+    },
+    body: formData
+  });
+  
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || 'Failed to analyze notice file');
+  }
+  
+  return await response.json();
+};
+
 /**
  * Generate an appeal letter
  */
@@ -154,12 +186,15 @@ export const deleteAppeal = async (appealId: string): Promise<void> => {
  */
 export const searchKnowledgeBase = async (
   query: string,
-  filters?: { category?: string; state?: string; platform?: string }
+  filters?: { category?: string; state?: string; platform?: string },
+  page?: { topK?: number; offset?: number }
 ): Promise<any> => {
   const params = new URLSearchParams({ query });
   if (filters?.category) params.append('category', filters.category);
   if (filters?.state) params.append('state', filters.state);
   if (filters?.platform) params.append('platform', filters.platform);
+  if (page?.topK) params.append('top_k', String(page.topK));
+  if (page?.offset) params.append('offset', String(page.offset));
   
   const response = await fetch(`${API_BASE_URL}/api/knowledge-base/search?${params}`);
   
@@ -207,17 +242,19 @@ export const getKnowledgeBasePlatforms = async (): Promise<string[]> => {
 };
 
 /**
- * Send a chat message
+ * Send a chat message.
+ * History is kept server-side: pass the session_id from the previous
+ * response (or nothing to start a new session).
  */
 export const chatWithBot = async (
   message: string, 
-  history: any[] = []
-): Promise<{ response: string; suggested_actions: any[] }> => {
+  sessionId: string | null = null
+): Promise<{ response: string; suggested_actions: any[]; session_id: string | null }> => {
   const response = await authenticatedFetch('/api/chat', {
     method: 'POST',
     body: JSON.stringify({
       message,
-      conversation_history: history
+      session_id: sessionId
     })
   });
   
@@ -238,7 +275,8 @@ export const checkHealth = async () => {
 };
 
 /**
- * Upload evidence file (image, PDF, document)
+ * Upload evidence file (image, PDF, document) through the API server.
+ * Prefer uploadEvidenceDirect, which sends the bytes straight to Storage.
  */
 export const uploadEvidence = async (file: File, caseId?: string): Promise<{ url: string; filename: string; contentType: string }> => {
   const token = await getAuthToken();
@@ -264,4 +302,65 @@ export const uploadEvidence = async (file: File, caseId?: string): Promise<{ url
   }
   
   return await response.json();
-};
\ No newline at end of file
+};
+
+/**
+ * Upload evidence directly to Firebase Storage using a signed upload URL.
+ * The file bytes never pass through the API server.
+ * If the PUT to Storage fails (e.g. the bucket has no CORS config, see
+ * storage.cors.json), the file is sent through uploadEvidence instead.
+ */
+export const uploadEvidenceDirect = async (file: File, caseId?: string): Promise<{ url: string; filename: string; contentType: string; evidenceId: string | null }> => {
+  // 1. Ask the backend for a short-lived signed upload URL
+  const urlResponse = await authenticatedFetch('/api/evidence/upload-url', {
+    method: 'POST',
+    body: JSON.stringify({
+      filename: file.name,
+      content_type: file.type,
+      size: file.size,
+      case_id: caseId || null
+    })
+  });
+  
+  if (!urlResponse.ok) {
+    const error = await urlResponse.json();
+    throw new Error(error.detail || 'Failed to get upload URL');
+  }
+  
+  const upload = await urlResponse.json();
+  
+  // 2. PUT the file straight to Storage with the signed headers
+  let putResponse: Response | null = null;
+  try {
+    putResponse = await fetch(upload.uploadUrl, {
+      method: 'PUT',
+      headers: upload.headers,
+      body: file
+    });
+  } catch (err) {
+    // A blocked CORS preflight surfaces as a network error
+    console.warn('Direct upload failed, falling back to API upload:', err);
+  }
+  
+  if (!putResponse || !putResponse.ok) {
+    const fallback = await uploadEvidence(file, caseId);
+    return { ...fallback, evidenceId: (fallback as { evidenceId?: string | null }).evidenceId ?? null };
+  }
+  
+  // 3. Let the backend validate the object and record its metadata
+  const completeResponse = await authenticatedFetch('/api/evidence/complete-upload', {
+    method: 'POST',
+    body: JSON.stringify({
+      storage_path: upload.storagePath,
+      filename: file.name,
+      case_id: caseId || null
+    })
+  });
+  
+  if (!completeResponse.ok) {
+    const error = await completeResponse.json();
+    throw new Error(error.detail || 'Failed to complete upload');
+  }
+  
+  return await completeResponse.json();
+};